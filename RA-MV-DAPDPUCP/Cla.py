@@ -2,6 +2,7 @@ import numpy as np
 import matplotlib.pyplot as plt     # 导入matplotlib库的pyplot模块，用于绘图
 from typing import List, Dict
 from copy import deepcopy
+import weakref
 
 def place_holder(*args):
     """此函数不执行任何操作。它只是一个占位符，用于填充代码中的 “漏洞”。它唯一的目的是使代码看起来不错（从语法上讲）"""
@@ -51,6 +52,8 @@ class Drone:
         self.max_battery = max_battery                   #无人机最大续航
         self.location = 0                                #无人机位置
         self.route=[]                                    #无人机行程
+        self.launch_map = {}                             #起飞节点 -> 以该节点起飞的行程列表（按行程顺序）
+        self.retrieval_map = {}                          #回收节点 -> 在该节点回收的行程列表（按行程顺序）
 
     def add_trip(self, launch_node, retrieval_node, path, total_energy):
         """记录一个新的行程"""
@@ -68,6 +71,50 @@ class Drone:
             'initial_load_pickup': 0                     # 无人机初始取件载重
         }
         self.route.append(trip)  # 将行程添加到列表中
+        self._register_trip(trip)
+
+    def _register_trip(self, trip):
+        """将行程登记到起飞/回收节点映射"""
+        self.launch_map.setdefault(trip['launch_node'], []).append(trip)
+        self.retrieval_map.setdefault(trip['retrieval_node'], []).append(trip)
+
+    def _unregister_trip(self, trip):
+        """从起飞/回收节点映射中注销行程"""
+        for node_map, node in ((self.launch_map, trip['launch_node']), (self.retrieval_map, trip['retrieval_node'])):
+            trips = node_map.get(node)
+            if trips is None:
+                continue
+            trips[:] = [t for t in trips if t is not trip]
+            if not trips:
+                del node_map[node]
+
+    def remove_trip(self, trip_index):
+        """删除指定行程并同步起飞/回收节点映射"""
+        trip = self.route.pop(trip_index)
+        self._unregister_trip(trip)
+        return trip
+
+    def set_route(self, route):
+        """整体替换行程列表（如从备份还原）并重建节点映射"""
+        self.route = route
+        self.rebuild_node_maps()
+
+    def rebuild_node_maps(self):
+        """根据当前行程列表重建起飞/回收节点映射"""
+        self.launch_map = {}
+        self.retrieval_map = {}
+        for trip in self.route:
+            self._register_trip(trip)
+
+    def validate_node_maps(self):
+        """检查节点映射与行程列表是否一致"""
+        expected_launch, expected_retrieval = {}, {}
+        for trip in self.route:
+            expected_launch.setdefault(trip['launch_node'], []).append(id(trip))
+            expected_retrieval.setdefault(trip['retrieval_node'], []).append(id(trip))
+        actual_launch = {node: [id(t) for t in trips] for node, trips in self.launch_map.items()}
+        actual_retrieval = {node: [id(t) for t in trips] for node, trips in self.retrieval_map.items()}
+        return expected_launch == actual_launch and expected_retrieval == actual_retrieval
 
     def get_trip(self, trip_index):
         """获取特定行程的信息"""
@@ -220,47 +267,234 @@ class Problem:
         # 显示图像
         plt.show()
 
+# ==================== 紧凑解快照 ====================
+# 快照中的数组均为只读，内容相同的数组在不同快照之间共享同一份内存
+_SHARED_ARRAYS = weakref.WeakValueDictionary()
+
+# 无人机行程中按数值存储的字段（path单独以扁平数组+偏移量存储）
+TRIP_FIELDS = ('launch_node', 'retrieval_node', 'energy', 'current_remain_battery',
+               'current_load', 'current_load_delivery', 'current_load_pickup',
+               'initial_load', 'initial_load_delivery', 'initial_load_pickup')
+# 客户时间字段（None以NaN存储）
+CUSTOMER_TIMING_FIELDS = ('arrive_truck', 'departure_truck', 'arrive_drone', 'departure_drone',
+                          'service_begin', 'wait')
+
+
+def _shared_array(values, dtype):
+    """构造只读数组，内容相同时复用已有数组"""
+    array = np.asarray(values, dtype=dtype)
+    key = (array.dtype.str, array.shape, array.tobytes())
+    shared = _SHARED_ARRAYS.get(key)
+    if shared is None:
+        array.flags.writeable = False
+        _SHARED_ARRAYS[key] = array
+        shared = array
+    return shared
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+
+
+def _restore_number(value, keep_float=False):
+    """还原数值：整数值还原为int，NaN还原为None"""
+    value = float(value)
+    if np.isnan(value):
+        return None
+    if not keep_float and value.is_integer():
+        return int(value)
+    return value
+
+
+def _freeze_attrs(obj, skip):
+    """对象的其余属性存为不可变元组（列表转为元组并记录，便于还原）"""
+    return tuple((name, tuple(value) if isinstance(value, list) else value, isinstance(value, list))
+                 for name, value in vars(obj).items() if name not in skip)
+
+
+def _thaw_attrs(obj, attrs):
+    for name, value, was_list in attrs:
+        setattr(obj, name, list(value) if was_list else value)
+    return obj
+
+
+class TruckSnapshot:
+    """卡车快照：路径为只读int数组，其余属性为不可变元组"""
+    __slots__ = ('vehicle_id', 'route', 'attrs')
+
+    def __init__(self, truck_obj):
+        self.vehicle_id = truck_obj.vehicle_id
+        self.route = _shared_array(truck_obj.Troute, np.int64)
+        self.attrs = _freeze_attrs(truck_obj, ('Troute',))
+
+    def restore(self):
+        """重建独立的Truck对象"""
+        truck = _thaw_attrs(Truck.__new__(Truck), self.attrs)
+        truck.Troute = self.route.tolist()
+        return truck
+
+
+class DroneSnapshot:
+    """无人机快照：所有行程路径拼接为扁平int数组并以偏移量分段，数值字段为float矩阵"""
+    __slots__ = ('vehicle_id', 'trip_nodes', 'trip_offsets', 'trip_values', 'trip_extras', 'attrs')
+
+    def __init__(self, drone_obj):
+        self.vehicle_id = drone_obj.vehicle_id
+        nodes, offsets, values, extras = [], [0], [], []
+        for trip in drone_obj.route:
+            nodes.extend(trip['path'])
+            offsets.append(len(nodes))
+            values.append([trip[name] if _is_number(trip.get(name)) else np.nan for name in TRIP_FIELDS])
+            # 非数值字段或额外字段单独保存（通常为空）
+            extra = {name: deepcopy(value) for name, value in trip.items()
+                     if name != 'path' and (name not in TRIP_FIELDS or not _is_number(value))}
+            extras.append(extra or None)
+        self.trip_nodes = _shared_array(nodes, np.int64)
+        self.trip_offsets = _shared_array(offsets, np.int64)
+        self.trip_values = _shared_array(np.reshape(values, (len(values), len(TRIP_FIELDS))), np.float64)
+        self.trip_extras = tuple(extras)
+        self.attrs = _freeze_attrs(drone_obj, ('route', 'launch_map', 'retrieval_map'))
+
+    def __len__(self):
+        return len(self.trip_offsets) - 1
+
+    def trip_path(self, trip_index):
+        start, end = self.trip_offsets[trip_index], self.trip_offsets[trip_index + 1]
+        return self.trip_nodes[start:end].tolist()
+
+    def trip_energy(self, trip_index):
+        return self.trip_values[trip_index][TRIP_FIELDS.index('energy')]
+
+    def trips(self):
+        """重建行程字典列表"""
+        trips = []
+        for trip_index in range(len(self)):
+            trip = {}
+            for name, value in zip(TRIP_FIELDS, self.trip_values[trip_index]):
+                trip[name] = _restore_number(value, keep_float=(name == 'energy'))
+                if name == 'retrieval_node':
+                    trip['path'] = self.trip_path(trip_index)  # 与add_trip的字段顺序一致
+            extra = self.trip_extras[trip_index]
+            if extra:
+                trip.update(deepcopy(extra))
+            trips.append(trip)
+        return trips
+
+    def restore(self):
+        """重建独立的Drone对象（同时重建起飞/回收节点映射）"""
+        drone = _thaw_attrs(Drone.__new__(Drone), self.attrs)
+        drone.set_route(self.trips())
+        return drone
+
+
+class CustomerSnapshot:
+    """客户快照：编号与时间字段为只读数组，其余属性按客户存为不可变元组"""
+    __slots__ = ('customer_ids', 'timing', 'attrs')
+
+    def __init__(self, customers):
+        ids = sorted(customers)
+        self.customer_ids = _shared_array(ids, np.int64)
+        self.timing = _shared_array(
+            np.reshape([[customers[c].__dict__.get(name) if _is_number(customers[c].__dict__.get(name)) else np.nan
+                         for name in CUSTOMER_TIMING_FIELDS] for c in ids],
+                       (len(ids), len(CUSTOMER_TIMING_FIELDS))), np.float64)
+        self.attrs = tuple(_freeze_attrs(customers[c], CUSTOMER_TIMING_FIELDS) for c in ids)
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    def restore(self):
+        """重建 {客户ID: Customer对象}"""
+        customers = {}
+        for row, customer_id in enumerate(self.customer_ids.tolist()):
+            customer = _thaw_attrs(Customer.__new__(Customer), self.attrs[row])
+            for name, value in zip(CUSTOMER_TIMING_FIELDS, self.timing[row]):
+                setattr(customer, name, _restore_number(value, keep_float=True))
+            customers[customer_id] = customer
+        return customers
+
+
 class Solution:
     def __init__(self):
         """无参构造函数，通过方法逐步构建解决方案"""
-        self.trucks: List[Dict] = []  # 存储卡车信息（含独立副本和成本）
-        self.drones: List[Dict] = []  # 存储无人机信息
-        self.customers: Dict[int, object] = {}  # {客户ID: 客户对象副本}
+        self.truck_snapshots: List[TruckSnapshot] = []  # 卡车快照（只读，可在解之间共享）
+        self.drone_snapshots: List[DroneSnapshot] = []  # 无人机快照
+        self._customer_snapshot = None  # 客户快照（首次读取时由待封存客户生成）
+        self._pending_customers: Dict[int, object] = {}  # 逐个添加、尚未封存的客户
         self.total_cost: float = 0  # 总成本
         self.truck_costs: List[float] = []  # 每辆卡车的单独成本（含无人机协同成本）
         self.drone_costs: List[float] = []  # 每架无人机的单独成本
+        self._views = {}  # 按需重建的对象视图缓存
 
     def add_truck(self, truck_obj, cost: float = 0):
-        """添加卡车副本并记录其成本
+        """添加卡车快照并记录其成本
         Args:
             truck_obj: 卡车对象
             cost: 该卡车及其关联无人机的总成本
         """
-        self.trucks.append({
-            'obj': deepcopy(truck_obj),
-            'cost': cost,
-            'route': deepcopy(truck_obj.Troute)  # 保存路径快照
-        })
+        self.truck_snapshots.append(TruckSnapshot(truck_obj))
         self.truck_costs.append(cost)
+        self._views.pop('trucks', None)
         self._update_total_cost()
         return self
 
     def add_drone(self, drone_obj, cost: float = 0):
-        """添加无人机副本并记录其成本"""
-        self.drones.append({
-            'obj': deepcopy(drone_obj),
-            'cost': cost,
-            'trips': deepcopy(drone_obj.route)  # 保存任务快照
-        })
+        """添加无人机快照并记录其成本"""
+        self.drone_snapshots.append(DroneSnapshot(drone_obj))
         self.drone_costs.append(cost)
+        self._views.pop('drones', None)
         self._update_total_cost()
         return self
 
     def add_customer(self, customer_id: int, customer_obj):
-        """添加客户副本"""
-        self.customers[customer_id] = deepcopy(customer_obj)
+        """添加客户（与已封存的客户一起在下次读取时生成新的客户快照）"""
+        if self._customer_snapshot is not None:
+            self._pending_customers = {**self._customer_snapshot.restore(), **self._pending_customers}
+            self._customer_snapshot = None
+        self._pending_customers[customer_id] = _thaw_attrs(Customer.__new__(Customer),
+                                                           _freeze_attrs(customer_obj, ()))
+        self._views.pop('customers', None)
         return self
 
+    @property
+    def customer_snapshot(self) -> CustomerSnapshot:
+        """封存待添加客户并返回客户快照"""
+        if self._customer_snapshot is None:
+            self._customer_snapshot = CustomerSnapshot(self._pending_customers)
+            self._pending_customers = {}
+        return self._customer_snapshot
+
+    @property
+    def trucks(self) -> List[Dict]:
+        """兼容旧格式的卡车视图（按需重建Truck对象）"""
+        if 'trucks' not in self._views:
+            self._views['trucks'] = [{'obj': snapshot.restore(), 'cost': cost, 'route': snapshot.route.tolist()}
+                                     for snapshot, cost in zip(self.truck_snapshots, self.truck_costs)]
+        return self._views['trucks']
+
+    @property
+    def drones(self) -> List[Dict]:
+        """兼容旧格式的无人机视图（按需重建Drone对象）"""
+        if 'drones' not in self._views:
+            self._views['drones'] = [{'obj': snapshot.restore(), 'cost': cost, 'trips': snapshot.trips()}
+                                     for snapshot, cost in zip(self.drone_snapshots, self.drone_costs)]
+        return self._views['drones']
+
+    @property
+    def customers(self) -> Dict[int, object]:
+        """兼容旧格式的客户视图 {客户ID: 客户对象}"""
+        if 'customers' not in self._views:
+            self._views['customers'] = self.customer_snapshot.restore()
+        return self._views['customers']
+
+    def restore_trucks(self) -> List[Truck]:
+        """从快照重建独立的卡车对象列表"""
+        return [snapshot.restore() for snapshot in self.truck_snapshots]
+
+    def restore_drones(self) -> List[Drone]:
+        """从快照重建独立的无人机对象列表"""
+        return [snapshot.restore() for snapshot in self.drone_snapshots]
+
     def set_cost(self, cost: float):
         """手动设置总成本（通常用calculate_cost自动计算更安全）"""
         self.total_cost = cost
@@ -277,52 +511,52 @@ class Solution:
 
         # 输出卡车信息
         print("\n【卡车配送方案】")
-        for i, truck in enumerate(self.trucks, 1):
+        for i, (truck, cost) in enumerate(zip(self.truck_snapshots, self.truck_costs), 1):
             print(f" 卡车{i}:")
-            print(f"   - 路径: {truck['route']}")
-            print(f"   - 成本: {truck['cost']:.2f}")
+            print(f"   - 路径: {truck.route.tolist()}")
+            print(f"   - 成本: {cost:.2f}")
 
         # 输出无人机信息
         print("\n【无人机配送方案】")
-        for j, drone in enumerate(self.drones, 1):
+        for j, (drone, cost) in enumerate(zip(self.drone_snapshots, self.drone_costs), 1):
             print(f" 无人机{j}:")
-            print(f"   - 任务数: {len(drone['trips'])}")
-            print(f"   - 总能耗: {sum(t['energy'] for t in drone['trips']):.2f}")
-            print(f"   - 成本: {drone['cost']:.2f}")
+            print(f"   - 任务数: {len(drone)}")
+            print(f"   - 总能耗: {sum(drone.trip_energy(k) for k in range(len(drone))):.2f}")
+            print(f"   - 成本: {cost:.2f}")
 
         # 输出客户服务情况
         print("\n【客户服务统计】")
         served = set()
-        for truck in self.trucks:
-            served.update(truck['route'][1:-1])  # 去掉仓库节点
-        for drone in self.drones:
-            for trip in drone['trips']:
-                served.update(trip['path'][1:-1])
-        print(f" 已服务客户数: {len(served)}/{len(self.customers)}")
+        for truck in self.truck_snapshots:
+            served.update(truck.route[1:-1].tolist())  # 去掉仓库节点
+        for drone in self.drone_snapshots:
+            for k in range(len(drone)):
+                served.update(drone.trip_path(k)[1:-1])
+        print(f" 已服务客户数: {len(served)}/{len(self.customer_snapshot)}")
 
     def to_dict(self) -> Dict:
         """将解决方案转为字典（便于JSON序列化）"""
         return {
             'total_cost': self.total_cost,
             'trucks': [{
-                'id': t['obj'].vehicle_id,
-                'route': t['route'],
-                'cost': t['cost']
-            } for t in self.trucks],
+                'id': t.vehicle_id,
+                'route': t.route.tolist(),
+                'cost': cost
+            } for t, cost in zip(self.truck_snapshots, self.truck_costs)],
             'drones': [{
-                'id': d['obj'].vehicle_id,
-                'trips': d['trips'],
-                'cost': d['cost']
-            } for d in self.drones]
+                'id': d.vehicle_id,
+                'trips': d.trips(),
+                'cost': cost
+            } for d, cost in zip(self.drone_snapshots, self.drone_costs)]
         }
 
     def copy(self):
-        """创建解决方案的深拷贝"""
+        """复制解决方案：快照只读，直接共享，不再深拷贝"""
         new_solution = Solution()
-        new_solution.trucks = deepcopy(self.trucks)
-        new_solution.drones = deepcopy(self.drones)
-        new_solution.customers = deepcopy(self.customers)
+        new_solution.truck_snapshots = list(self.truck_snapshots)
+        new_solution.drone_snapshots = list(self.drone_snapshots)
+        new_solution._customer_snapshot = self.customer_snapshot
         new_solution.total_cost = self.total_cost
-        new_solution.truck_costs = deepcopy(self.truck_costs)
-        new_solution.drone_costs = deepcopy(self.drone_costs)
+        new_solution.truck_costs = list(self.truck_costs)
+        new_solution.drone_costs = list(self.drone_costs)
         return new_solution
\ No newline at end of file
@@ -65,8 +65,8 @@ class AddDroneRoute:
     def Update_T(self, index_customer):
         if index_customer==len(self.truck.Troute)-1:                                #如果传入节点为路径中的最后一个节点 则不用更新 直接返回
             return
-        launch_node=[trip['launch_node'] for trip in self.drone.route]              #起飞节点集合
-        retrieval_node=[trip['retrieval_node'] for trip in self.drone.route]        #回收节点集合
+        launch_node=self.drone.launch_map                                           #起飞节点 -> 行程
+        retrieval_node=self.drone.retrieval_map                                     #回收节点 -> 行程
         for j in range(index_customer, len(self.truck.Troute)-1):                     #从传入节点开始更新时间
             if j-1==0:                                                              #假设 是第一个客户节点
                 j_index=np.where(self.customers[:, 0] == self.truck.Troute[j])[0][0]-1
@@ -76,18 +76,17 @@ class AddDroneRoute:
                 if self.truck.Troute[j] in launch_node :                                        #假设 当前节点仅为起飞节点时
                     self.T[j_index][3] = self.T[j_index][1]                                     #无人机
                     self.T[j_index][4] = self.T[j_index][1]
-                    for trip in self.drone.route:                                           #更新以当前节点为起飞节点的无人机路径
-                        if trip['launch_node'] == self.truck.Troute[j]:
-                            trip=trip['path']
-                            for i in range(1, len(trip)):
-                                prev_indices = np.where(self.customers[:, 0] == trip[i - 1])[0][0]-1
-                                current_indices = np.where(self.customers[:, 0] == trip[i])[0][0]-1
-                                distance = self.distanceDmatrix[prev_indices+1][current_indices+1]
-                                self.T[current_indices][3] = self.T[prev_indices][4]+distance/self.drone_speed
-                                self.T[current_indices][4] = max(self.T[current_indices][3], self.allcustomers[self.T[current_indices][0]-1].start_time)+self.service_time
-                                if trip[i] not in retrieval_node:
-                                    self.T[current_indices][1] = 0
-                                    self.T[current_indices][2] = 0
+                    for trip in launch_node[self.truck.Troute[j]]:                          #更新以当前节点为起飞节点的无人机路径
+                        trip=trip['path']
+                        for i in range(1, len(trip)):
+                            prev_indices = np.where(self.customers[:, 0] == trip[i - 1])[0][0]-1
+                            current_indices = np.where(self.customers[:, 0] == trip[i])[0][0]-1
+                            distance = self.distanceDmatrix[prev_indices+1][current_indices+1]
+                            self.T[current_indices][3] = self.T[prev_indices][4]+distance/self.drone_speed
+                            self.T[current_indices][4] = max(self.T[current_indices][3], self.allcustomers[self.T[current_indices][0]-1].start_time)+self.service_time
+                            if trip[i] not in retrieval_node:
+                                self.T[current_indices][1] = 0
+                                self.T[current_indices][2] = 0
                 else:
                     self.T[j_index][3] = self.T[j_index][1]
                     self.T[j_index][4] = self.T[j_index][2]
@@ -107,36 +106,34 @@ class AddDroneRoute:
                     if self.truck.Troute[j] in launch_node and self.truck.Troute[j] not in retrieval_node:           #当前节点仅为起飞节点时
                         self.T[j_index][3] = self.T[j_index][1]
                         self.T[j_index][4] = self.T[j_index][1]
-                        for trip in self.drone.route:
-                            if trip['launch_node'] == self.truck.Troute[j]:
-                                trip = trip['path']
-                                for i in range(1, len(trip)):
-                                    prev_indices = np.where(self.customers[:, 0] == trip[i - 1])[0][0]-1
-                                    current_indices = np.where(self.customers[:, 0] == trip[i])[0][0]-1
-                                    distance = self.distanceDmatrix[prev_indices+1][current_indices+1]
-                                    self.T[current_indices][3] = self.T[prev_indices][4] + distance / self.drone_speed
-                                    self.T[current_indices][4] = max(self.T[current_indices][3],
-                                                       self.allcustomers[self.T[current_indices][0] - 1].start_time) + self.service_time
-                                    if trip[i] not in retrieval_node:
-                                        self.T[current_indices][1] = 0
-                                        self.T[current_indices][2] = 0
+                        for trip in launch_node[self.truck.Troute[j]]:
+                            trip = trip['path']
+                            for i in range(1, len(trip)):
+                                prev_indices = np.where(self.customers[:, 0] == trip[i - 1])[0][0]-1
+                                current_indices = np.where(self.customers[:, 0] == trip[i])[0][0]-1
+                                distance = self.distanceDmatrix[prev_indices+1][current_indices+1]
+                                self.T[current_indices][3] = self.T[prev_indices][4] + distance / self.drone_speed
+                                self.T[current_indices][4] = max(self.T[current_indices][3],
+                                                   self.allcustomers[self.T[current_indices][0] - 1].start_time) + self.service_time
+                                if trip[i] not in retrieval_node:
+                                    self.T[current_indices][1] = 0
+                                    self.T[current_indices][2] = 0
                     if self.truck.Troute[j] in launch_node and self.truck.Troute[j] in retrieval_node:               #当前节点既为起飞节点又为回收节点时
                         max_time=max(self.T[j_index][2], self.T[j_index][3])
                         self.T[j_index][2] = max_time
                         self.T[j_index][4] = self.T[j_index][3]
-                        for trip in self.drone.route:
-                            if trip['launch_node'] == self.truck.Troute[j]:
-                                trip = trip['path']
-                                for i in range(1, len(trip)):
-                                    prev_indices = np.where(self.customers[:, 0] == trip[i - 1])[0][0]-1
-                                    current_indices = np.where(self.customers[:, 0] == trip[i])[0][0]-1
-                                    distance = self.distanceDmatrix[prev_indices+1][current_indices+1]
-                                    self.T[current_indices][3] = self.T[i - 1][4] + distance / self.drone_speed
-                                    self.T[current_indices][4] = max(self.T[current_indices][3],
-                                                       self.allcustomers[self.T[current_indices][0] - 1].start_time) + self.service_time
-                                    if trip[i] not in retrieval_node:
-                                        self.T[current_indices][1] = 0
-                                        self.T[current_indices][2] = 0
+                        for trip in launch_node[self.truck.Troute[j]]:
+                            trip = trip['path']
+                            for i in range(1, len(trip)):
+                                prev_indices = np.where(self.customers[:, 0] == trip[i - 1])[0][0]-1
+                                current_indices = np.where(self.customers[:, 0] == trip[i])[0][0]-1
+                                distance = self.distanceDmatrix[prev_indices+1][current_indices+1]
+                                self.T[current_indices][3] = self.T[i - 1][4] + distance / self.drone_speed
+                                self.T[current_indices][4] = max(self.T[current_indices][3],
+                                                   self.allcustomers[self.T[current_indices][0] - 1].start_time) + self.service_time
+                                if trip[i] not in retrieval_node:
+                                    self.T[current_indices][1] = 0
+                                    self.T[current_indices][2] = 0
                     if self.truck.Troute[j] not in launch_node and self.truck.Troute[j] in retrieval_node:  # 当前节点仅为回收节点时
                         max_time = max(self.T[j_index][2], self.T[j_index][3])
                         self.T[j_index][2] = max_time
@@ -219,7 +216,7 @@ class AddDroneRoute:
                                                                     # 如果找不到合适的路径插入客户，则跳过该客户
             if not route and not modify:                            # 如果无法插入 则还原卡车路径余时间矩阵
                 self.truck.Troute = truck_route_copy                # 还原卡车路径
-                self.drone.route =  drone_route_copy                # 还原无人机路径
+                self.drone.set_route(drone_route_copy)              # 还原无人机路径（同步重建节点映射）
                 self.T = T_copy                                     # 还原时间矩阵
             if route and not modify:                                # 如果插入新的无人机路径中 则更新行程以及客户信息
                 self.drone.add_trip(route[0],route[2], route, energy)
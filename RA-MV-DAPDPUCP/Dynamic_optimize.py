@@ -1,13 +1,118 @@
 import csv
+import json
+import os
+import time
 import numpy as np
 import random
 import copy
 import math
+import heapq
+import bisect
 import traceback
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
 
+# ==================== 自适应算子选择 ====================
+class AdaptiveOperatorSelection:
+    """
+    摧毁/修复算子共用的时间感知自适应选择（ALNS分段权重更新）
+    每segment_length次调用为一段，段内按结果累计奖励与算子调用耗时，段末按
+    w = (1 - r)·w + r·(段内奖励 / 段内耗时(ms)) × 段内平均单次耗时(ms) 更新权重：
+    奖励按耗时归一化，慢而略好的算子不会压过快而有效的算子；乘以平均耗时使权重保持在奖励分值的量级
+    子类需先定义operator_weights与operator_stats，再调用_init_adaptive_selection
+    """
+    def _init_adaptive_selection(self):
+        self.segment_length = 10  # 每段的算子调用次数
+        self.reaction_factor = 0.2  # 权重反应因子r
+        self.min_operator_weight = 0.1  # 权重下限，保证每个算子都有被选中的机会
+        # 各结果的奖励分值：新全局最优/改进当前解/接受较差解/拒绝
+        self.outcome_rewards = {'best': 33.0, 'improved': 9.0, 'accepted': 13.0, 'rejected': 0.0}
+        self._segment_calls = 0
+        for stats in self.operator_stats.values():
+            stats.setdefault('success_rate', 0.0)
+            stats.update({'time': 0.0, 'avg_time_ms': 0.0,
+                          'segment_calls': 0, 'segment_reward': 0.0, 'segment_time': 0.0})
+
+    def _select_operator(self) -> str:
+        """基于轮盘赌选择算子"""
+        operators = list(self.operator_weights.keys())
+        weights = list(self.operator_weights.values())
+        total_weight = sum(weights)
+        if total_weight == 0:
+            return random.choice(operators)
+        probabilities = [w / total_weight for w in weights]
+        return str(np.random.choice(operators, p=probabilities))
+
+    def update_operator_performance(self, operator_name: str, improved: bool,
+                                    elapsed: float = 0.0, outcome: Optional[str] = None):
+        """
+        更新算子性能统计
+        Args:
+            operator_name: 算子名称
+            improved: 是否改进
+            elapsed: 本次算子调用的耗时（秒）
+            outcome: 'best'/'improved'/'accepted'/'rejected'，None时按improved取'improved'或'rejected'
+        """
+        if outcome is None:
+            outcome = 'improved' if improved else 'rejected'
+        stats = self.operator_stats[operator_name]
+        stats['calls'] += 1
+        if improved:
+            stats['improvements'] += 1
+        stats['success_rate'] = stats['improvements'] / stats['calls']
+        stats['time'] += elapsed
+        stats['avg_time_ms'] = stats['time'] / stats['calls'] * 1000
+        stats['segment_calls'] += 1
+        stats['segment_reward'] += self.outcome_rewards[outcome]
+        stats['segment_time'] += elapsed
+        self._segment_calls += 1
+        if self._segment_calls % self.segment_length == 0:
+            self._update_operator_weights()
+
+    def _update_operator_weights(self):
+        """段末按单位耗时奖励更新本段被调用算子的权重，并清空段内累计"""
+        active = {name: stats for name, stats in self.operator_stats.items() if stats['segment_calls'] > 0}
+        total_calls = sum(stats['segment_calls'] for stats in active.values())
+        total_time_ms = sum(stats['segment_time'] for stats in active.values()) * 1000
+        mean_time_ms = max(total_time_ms / total_calls, 1e-3) if total_calls > 0 else 1e-3
+        for name, stats in active.items():
+            time_ms = max(stats['segment_time'] * 1000, 1e-3 * stats['segment_calls'])
+            target = stats['segment_reward'] / time_ms * mean_time_ms
+            weight = (1 - self.reaction_factor) * self.operator_weights[name] + self.reaction_factor * target
+            self.operator_weights[name] = max(self.min_operator_weight, weight)
+            stats.update({'segment_calls': 0, 'segment_reward': 0.0, 'segment_time': 0.0})
+
+    def get_operator_state(self) -> Dict:
+        """可持久化的算子权重与累计统计（不含段内累计）"""
+        return {
+            'weights': dict(self.operator_weights),
+            'stats': {name: {key: stats[key] for key in ('calls', 'improvements', 'time')}
+                      for name, stats in self.operator_stats.items()}
+        }
+
+    def set_operator_state(self, state: Dict):
+        """恢复get_operator_state保存的权重与统计，忽略当前不存在的算子"""
+        for name, weight in state.get('weights', {}).items():
+            if name in self.operator_weights:
+                self.operator_weights[name] = float(weight)
+        for name, saved in state.get('stats', {}).items():
+            stats = self.operator_stats.get(name)
+            if stats is None:
+                continue
+            stats.update({key: saved[key] for key in ('calls', 'improvements', 'time') if key in saved})
+            stats['success_rate'] = stats['improvements'] / stats['calls'] if stats['calls'] > 0 else 0.0
+            stats['avg_time_ms'] = stats['time'] / stats['calls'] * 1000 if stats['calls'] > 0 else 0.0
+
+    def print_operator_stats(self, title: str):
+        """打印各算子的调用次数、改进次数、平均耗时与当前权重"""
+        print(f"{title}:")
+        for name, stats in self.operator_stats.items():
+            print(f"   {name}: {stats['calls']}次调用, {stats['improvements']}次改进, "
+                  f"平均耗时{stats['avg_time_ms']:.2f}ms, 权重{self.operator_weights[name]:.3f}")
+
+
 # ==================== 完整摧毁算子实现 ====================
-class DestroyOperators:
+class DestroyOperators(AdaptiveOperatorSelection):
     """约束版摧毁算子集合类 - 严格限制在车辆对内操作"""
     def __init__(self, dynamic_opt_instance):
         self.dyn_opt = dynamic_opt_instance
@@ -18,7 +123,8 @@ class DestroyOperators:
             'worst_time': 1.0,
             'drone_worst_energy': 1.0,
             'shaw': 1.0,
-            'route': 1.0
+            'route': 1.0,
+            'string': 1.0
         }
         # 算子性能统计
         self.operator_stats = {
@@ -27,8 +133,14 @@ class DestroyOperators:
             'worst_time': {'calls': 0, 'improvements': 0},
             'drone_worst_energy': {'calls': 0, 'improvements': 0},
             'shaw': {'calls': 0, 'improvements': 0},
-            'route': {'calls': 0, 'improvements': 0}
+            'route': {'calls': 0, 'improvements': 0},
+            'string': {'calls': 0, 'improvements': 0}
         }
+        self._init_adaptive_selection()
+        # 串移除（SISR）参数
+        self.string_max_length = 10     # 单条串的最大长度
+        self.string_split_rate = 0.5    # 采用分裂串（保留串中一段客户）的概率
+        self.string_split_depth = 0.01  # 分裂串中保留段继续增长的终止概率
 
     def random_removal(self, truck_id, customer_id):
         """约束版随机移除算子 - 只在指定车辆对内删除客户"""
@@ -41,11 +153,8 @@ class DestroyOperators:
             print(f"    车辆对{truck_id}没有分配的客户")
             return []
         # 获取无人机节点信息（仅限当前车辆对）
-        launch_node = []
-        retrieval_node = []
-        if self.dyn_opt.DRONE_Routes[truck_id].route:
-            launch_node = [trip['launch_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
-            retrieval_node = [trip['retrieval_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
+        launch_node = self.dyn_opt.DRONE_Routes[truck_id].launch_map          # 起飞节点映射（随删除实时同步）
+        retrieval_node = self.dyn_opt.DRONE_Routes[truck_id].retrieval_map    # 回收节点映射
         #  确定删除范围（仅限车辆对内）
         if customer_id == -1:  # 更新全部路径
             remain_list = list(vehicle_customers)
@@ -105,11 +214,8 @@ class DestroyOperators:
         if not vehicle_customers:
             return []
         # 获取无人机节点信息
-        launch_node = []
-        retrieval_node = []
-        if self.dyn_opt.DRONE_Routes[truck_id].route:
-            launch_node = [trip['launch_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
-            retrieval_node = [trip['retrieval_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
+        launch_node = self.dyn_opt.DRONE_Routes[truck_id].launch_map          # 起飞节点映射（随删除实时同步）
+        retrieval_node = self.dyn_opt.DRONE_Routes[truck_id].retrieval_map    # 回收节点映射
         # 确定考虑范围（仅限车辆对内）
         if customer_id == -1:
             remain_list = list(vehicle_customers)
@@ -128,22 +234,12 @@ class DestroyOperators:
         min_remove = max(math.floor(length * self.dyn_opt.min_delete), 1)
         max_remove = max(math.floor(length * self.dyn_opt.max_delete), min_remove)
         remove_count = random.randint(min_remove, max_remove)
-        # 计算每个客户的旅行成本（绕行距离）
-        customer_costs = []
-        for cust in remain_list:
-            if cust in delete_list:
-                continue
-            travel_cost = self._calculate_detour_cost(truck_id, cust)
-            customer_costs.append((cust, travel_cost))
-        # 按旅行成本降序排序
-        customer_costs.sort(key=lambda x: x[1], reverse=True)
-        # 选择成本最高的客户进行删除
-        candidates = [item[0] for item in customer_costs[:min(len(customer_costs), remove_count * 2)]]
-        while len(delete_list) < remove_count and candidates:
-            selected_customer = random.choice(candidates[:max(1, len(candidates) // 2)])
-            candidates.remove(selected_customer)
-            if selected_customer not in delete_list:
-                self._safe_remove_customer(truck_id, selected_customer, delete_list, launch_node, retrieval_node)
+        # 一次计算所有客户的移除收益（绕行成本），删除后只更新前后邻居的收益
+        candidates = [c for c in remain_list if c not in delete_list]
+        self._randomized_worst_removal(truck_id, candidates, self._removal_gains(truck_id, candidates),
+                                       remove_count, delete_list, launch_node, retrieval_node,
+                                       neighbours_of=self._route_neighbours,
+                                       update_gains=self._removal_gains)
         # 最终验证
         validated_delete_list = [c for c in delete_list if c in vehicle_customers]
         print(f"    车辆对{truck_id}最差距离删除完成: {len(validated_delete_list)}个高成本客户")
@@ -158,11 +254,8 @@ class DestroyOperators:
         vehicle_customers = self.dyn_opt.get_vehicle_customers(truck_id)
         if not vehicle_customers:
             return []
-        launch_node = []
-        retrieval_node = []
-        if self.dyn_opt.DRONE_Routes[truck_id].route:
-            launch_node = [trip['launch_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
-            retrieval_node = [trip['retrieval_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
+        launch_node = self.dyn_opt.DRONE_Routes[truck_id].launch_map          # 起飞节点映射（随删除实时同步）
+        retrieval_node = self.dyn_opt.DRONE_Routes[truck_id].retrieval_map    # 回收节点映射
         # 确定考虑范围
         if customer_id == -1:
             remain_list = list(vehicle_customers)
@@ -178,26 +271,18 @@ class DestroyOperators:
         min_remove = max(math.floor(length * self.dyn_opt.min_delete), 1)
         max_remove = max(math.floor(length * self.dyn_opt.max_delete), min_remove)
         remove_count = random.randint(min_remove, max_remove)
-        # 计算每个客户的时间窗偏差
-        time_deviations = []
-        for cust in remain_list:
-            if cust in delete_list:
-                continue
-            customer_obj = self.dyn_opt.customers[cust - 1]
-            service_start = customer_obj.service_begin if customer_obj.service_begin else customer_obj.start_time
-            # 计算与理想服务时间的偏差
-            ideal_time = (customer_obj.start_time + customer_obj.end_time) / 2
-            deviation = abs(service_start - ideal_time) if service_start else 0
-            time_deviations.append((cust, deviation))
-        # 按时间偏差降序排序
-        time_deviations.sort(key=lambda x: x[1], reverse=True)
-        # 选择偏差最大的客户
-        candidates = [item[0] for item in time_deviations[:min(len(time_deviations), remove_count * 2)]]
-        while len(delete_list) < remove_count and candidates:
-            selected_customer = random.choice(candidates[:max(1, len(candidates) // 2)])
-            candidates.remove(selected_customer)
-            if selected_customer not in delete_list:
-                self._safe_remove_customer(truck_id, selected_customer, delete_list, launch_node, retrieval_node)
+        # 计算每个客户的时间窗偏差（与其他客户无关，删除后无需更新）
+        candidates = [c for c in remain_list if c not in delete_list]
+        customer_objs = [self.dyn_opt.customers[c - 1] for c in candidates]
+        start_time = np.array([obj.start_time for obj in customer_objs], dtype=float)
+        end_time = np.array([obj.end_time for obj in customer_objs], dtype=float)
+        service_start = np.array([obj.service_begin if obj.service_begin else obj.start_time
+                                  for obj in customer_objs], dtype=float)
+        # 与理想服务时间（时间窗中点）的偏差
+        deviation = np.nan_to_num(np.where(service_start != 0,
+                                           np.abs(service_start - (start_time + end_time) / 2), 0.0))
+        self._randomized_worst_removal(truck_id, candidates, deviation, remove_count, delete_list,
+                                       launch_node, retrieval_node)
         validated_delete_list = [c for c in delete_list if c in vehicle_customers]
         print(f"    车辆对{truck_id}最差时间删除完成: {len(validated_delete_list)}个时间偏差大的客户")
         return validated_delete_list
@@ -215,8 +300,8 @@ class DestroyOperators:
         vehicle_customers = self.dyn_opt.get_vehicle_customers(truck_id)
         if not vehicle_customers:
             return []
-        launch_node = [trip['launch_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
-        retrieval_node = [trip['retrieval_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
+        launch_node = self.dyn_opt.DRONE_Routes[truck_id].launch_map          # 起飞节点映射（随删除实时同步）
+        retrieval_node = self.dyn_opt.DRONE_Routes[truck_id].retrieval_map    # 回收节点映射
         # 确定范围
         if customer_id == -1:
             remain_list = list(vehicle_customers)
@@ -234,10 +319,9 @@ class DestroyOperators:
                     self.dyn_opt.customers[customer - 1].service_by[0] == "de" and
                     self.dyn_opt.customers[customer - 1].service_by[1] == truck_id):  # 确保由当前车辆对的无人机服务
                 # 再次确认客户在当前车辆对的无人机路径中
-                for trip in self.dyn_opt.DRONE_Routes[truck_id].route:
-                    if customer in trip['path']:
-                        drone_customers.append(customer)
-                        break
+                entry = self.dyn_opt.locate_customer(customer, truck_id)
+                if entry is not None and entry['trip_idx'] is not None:
+                    drone_customers.append(customer)
         if not drone_customers:
             print(f"   ️ 车辆对{truck_id}没有无人机服务的客户，回退到随机移除")
             return self.random_removal(truck_id, customer_id)
@@ -246,24 +330,13 @@ class DestroyOperators:
         min_remove = max(math.floor(length * self.dyn_opt.min_delete), 1)
         max_remove = max(math.floor(length * self.dyn_opt.max_delete), min_remove)
         remove_count = random.randint(min_remove, max_remove)
-        # 计算每个无人机服务客户的等待能耗
-        energy_costs = []
-        for cust in drone_customers:
-            if cust in delete_list:
-                continue
-            waiting_energy = self._calculate_drone_waiting_energy(truck_id, cust)
-            energy_costs.append((cust, waiting_energy))
-        if not energy_costs:
+        # 计算每个无人机服务客户的等待能耗（与其他客户无关，删除后无需更新）
+        candidates = [c for c in drone_customers if c not in delete_list]
+        if not candidates:
             return self.random_removal(truck_id, customer_id)
-        # 按等待能耗降序排序
-        energy_costs.sort(key=lambda x: x[1], reverse=True)
-        # 选择能耗最高的客户
-        candidates = [item[0] for item in energy_costs[:min(len(energy_costs), remove_count * 2)]]
-        while len(delete_list) < remove_count and candidates:
-            selected_customer = random.choice(candidates[:max(1, len(candidates) // 2)])
-            candidates.remove(selected_customer)
-            if selected_customer not in delete_list:
-                self._safe_remove_customer(truck_id, selected_customer, delete_list, launch_node, retrieval_node)
+        waiting_energy = self._drone_waiting_energy(candidates)
+        self._randomized_worst_removal(truck_id, candidates, waiting_energy, remove_count, delete_list,
+                                       launch_node, retrieval_node)
         validated_delete_list = [c for c in delete_list if c in vehicle_customers]
         print(f"    车辆对{truck_id}最差能耗删除完成: {len(validated_delete_list)}个高能耗客户")
         return validated_delete_list
@@ -277,11 +350,8 @@ class DestroyOperators:
         vehicle_customers = self.dyn_opt.get_vehicle_customers(truck_id)
         if not vehicle_customers:
             return []
-        launch_node = []
-        retrieval_node = []
-        if self.dyn_opt.DRONE_Routes[truck_id].route:
-            launch_node = [trip['launch_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
-            retrieval_node = [trip['retrieval_node'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
+        launch_node = self.dyn_opt.DRONE_Routes[truck_id].launch_map          # 起飞节点映射（随删除实时同步）
+        retrieval_node = self.dyn_opt.DRONE_Routes[truck_id].retrieval_map    # 回收节点映射
         # 确定范围
         if customer_id == -1:
             remain_list = list(vehicle_customers)
@@ -302,33 +372,101 @@ class DestroyOperators:
         # 确保种子客户被删除
         if self._safe_remove_customer(truck_id, seed_customer, delete_list, launch_node, retrieval_node):
             remain_list.remove(seed_customer)
-        # 计算相似性权重
-        phi_1, phi_2, phi_3 = 0.4, 0.3, 0.3  # 距离、时间、服务类型权重
-        # 迭代添加最相似的客户
-        while len(delete_list) < remove_count and len(remain_list) > 0:
-            if not remain_list:
+        # 沿种子客户的相关客户排序表依次删除（相关度越高越靠前）
+        remain_set = set(remain_list)
+        ranked = self.dyn_opt.get_shaw_relatedness()['ranked']
+        related_customers = ranked[seed_customer] if seed_customer < len(ranked) else []
+        for candidate in related_customers:
+            if len(delete_list) >= remove_count:
                 break
-            similarities = []
-            for candidate in remain_list:
-                if candidate in delete_list:
-                    continue
-                try:
-                    similarity = self._calculate_shaw_similarity(seed_customer, candidate, phi_1, phi_2, phi_3)
-                    similarities.append((candidate, similarity))
-                except (AttributeError, IndexError, KeyError):
-                    similarities.append((candidate, random.random()))
-            if not similarities:
-                break
-            # 按相似性降序排序
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            # 选择最相似的客户
-            next_customer = similarities[0][0]
-            if self._safe_remove_customer(truck_id, next_customer, delete_list, launch_node, retrieval_node):
-                remain_list.remove(next_customer)
+            candidate = int(candidate)
+            if candidate not in remain_set or candidate in delete_list:
+                continue
+            if self._safe_remove_customer(truck_id, candidate, delete_list, launch_node, retrieval_node):
+                remain_set.discard(candidate)
         validated_delete_list = [c for c in delete_list if c in vehicle_customers]
         print(f"    车辆对{truck_id}Shaw相似性删除完成: {len(validated_delete_list)}个相似客户")
         return validated_delete_list
 
+    def string_removal(self, truck_id, customer_id):
+        """
+        串移除算子（SISR）：从随机种子客户出发沿最近邻表扩展，
+        在邻居所在的卡车路径或无人机行程中各删除一段相邻客户串（每条路径至多一段）
+        """
+        print(f" 使用约束版串移除算子（车辆对{truck_id}）")
+        delete_list = []
+        vehicle_customers = self.dyn_opt.get_vehicle_customers(truck_id)
+        if not vehicle_customers:
+            return []
+        launch_node = self.dyn_opt.DRONE_Routes[truck_id].launch_map          # 起飞节点映射（随删除实时同步）
+        retrieval_node = self.dyn_opt.DRONE_Routes[truck_id].retrieval_map    # 回收节点映射
+        # 确定范围
+        if customer_id == -1:
+            remain_list = list(vehicle_customers)
+        else:
+            if customer_id not in vehicle_customers:
+                return []
+            remain_list = self._get_remaining_customers_in_vehicle(truck_id, customer_id)
+        remain_set = set(c for c in remain_list if c in vehicle_customers)
+        if not remain_set:
+            return []
+        # 计算删除数量
+        length = len(remain_set)
+        min_remove = max(math.floor(length * self.dyn_opt.min_delete), 1)
+        max_remove = max(math.floor(length * self.dyn_opt.max_delete), min_remove)
+        remove_count = random.randint(min_remove, max_remove)
+        # 串长度上限不超过车辆对内路径（卡车路径及各无人机行程）的平均客户数
+        tours = [self.dyn_opt.TRUCK_Routes[truck_id].Troute] + \
+                [trip['path'] for trip in self.dyn_opt.DRONE_Routes[truck_id].route]
+        tour_sizes = [len(tour) - 2 for tour in tours if len(tour) > 2]
+        max_length = max(1, min(self.string_max_length, sum(tour_sizes) // max(len(tour_sizes), 1)))
+
+        seed_customer = random.choice(sorted(remain_set))
+        neighbours = self.dyn_opt.get_nearest_neighbours()
+        related = neighbours[seed_customer] if seed_customer < len(neighbours) else []
+        destroyed_tours = set()
+        for candidate in [seed_customer] + [int(c) for c in related]:
+            if len(delete_list) >= remove_count:
+                break
+            if candidate not in remain_set or candidate in delete_list:
+                continue
+            entry = self.dyn_opt.locate_customer(candidate, truck_id)
+            if entry is None:
+                continue
+            if entry['truck_pos'] is not None:
+                tour, position = self.dyn_opt.TRUCK_Routes[truck_id].Troute, entry['truck_pos']
+            else:
+                tour, position = self.dyn_opt.DRONE_Routes[truck_id].route[entry['trip_idx']]['path'], entry['path_pos']
+            if id(tour) in destroyed_tours:
+                continue
+            destroyed_tours.add(id(tour))
+            string = self._select_string(tour[1:-1], position - 1,
+                                         min(max_length, remove_count - len(delete_list)))
+            for customer in string:
+                if customer in remain_set and customer not in delete_list:
+                    self._safe_remove_customer(truck_id, customer, delete_list, launch_node, retrieval_node)
+        validated_delete_list = [c for c in delete_list if c in vehicle_customers]
+        print(f"    车辆对{truck_id}串删除完成: {len(validated_delete_list)}个客户，涉及{len(destroyed_tours)}条路径")
+        return validated_delete_list
+
+    def _select_string(self, customers, index, max_length):
+        """
+        在路径客户序列中选择一段包含customers[index]的相邻客户串
+        以string_split_rate的概率采用分裂串：选出更长的串后保留其中连续的一段不删除
+        """
+        string_length = random.randint(1, max(1, min(len(customers), max_length)))
+        kept_length = 0
+        if random.random() < self.string_split_rate:
+            while kept_length < len(customers) - string_length and random.random() > self.string_split_depth:
+                kept_length += 1
+        total_length = string_length + kept_length
+        start = random.randint(max(0, index - total_length + 1), min(index, len(customers) - total_length))
+        string = customers[start:start + total_length]
+        if kept_length:
+            kept_start = random.randint(0, string_length)
+            string = string[:kept_start] + string[kept_start + kept_length:]
+        return list(string)
+
     def route_removal(self, truck_id, customer_id):
         """路径移除算子"""
         print(f"️ 使用约束版路径移除算子（车辆对{truck_id}）")
@@ -372,8 +510,10 @@ class DestroyOperators:
                 if customer in vehicle_customers:  # 确保属于当前车辆对
                     delete_list.append(customer)
             # 删除该无人机行程
-            del self.dyn_opt.DRONE_Routes[truck_id].route[target_route_index]
+            self.dyn_opt.DRONE_Routes[truck_id].remove_trip(target_route_index)
             print(f"    删除车辆对{truck_id}的无人机路径{target_route_index}")
+        if delete_list:
+            self.dyn_opt._notify_route_mutation(truck_id)
         # 如果没有找到合适路径，回退到随机移除
         if not delete_list:
             print(f"    车辆对{truck_id}没有合适的路径删除，回退到随机移除")
@@ -384,32 +524,8 @@ class DestroyOperators:
         return validated_delete_list
 
     def select_destroy_operator(self):
-        """基于轮盘赌选择摧毁算子"""
-        operators = list(self.operator_weights.keys())
-        weights = list(self.operator_weights.values())
-        # 归一化权重
-        total_weight = sum(weights)
-        probabilities = [w / total_weight for w in weights]
-        # 轮盘赌选择
-        selected = np.random.choice(operators, p=probabilities)
-        return selected
-
-    def update_operator_performance(self, operator_name, improved):
-        """更新算子性能统计"""
-        self.operator_stats[operator_name]['calls'] += 1
-        if improved:
-            self.operator_stats[operator_name]['improvements'] += 1
-        # 每50次调用更新一次权重
-        if self.operator_stats[operator_name]['calls'] % 50 == 0:
-            self._update_operator_weights()
-
-    def _update_operator_weights(self):
-        """基于性能统计更新算子权重"""
-        for op_name, stats in self.operator_stats.items():
-            if stats['calls'] > 0:
-                success_rate = stats['improvements'] / stats['calls']
-                # 权重调整：成功率越高权重越大
-                self.operator_weights[op_name] = 0.1 + success_rate * 0.9
+        """基于轮盘赌选择摧毁算子（权重见AdaptiveOperatorSelection）"""
+        return self._select_operator()
 
     # 辅助方法
     def _get_remaining_customers_in_vehicle(self, truck_id: int, current_customer_id: int) -> list:
@@ -420,8 +536,9 @@ class DestroyOperators:
         vehicle_customers = self.dyn_opt.get_vehicle_customers(truck_id)
         # 从卡车路径中收集
         truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
-        if current_customer_id in truck_route:
-            current_idx = truck_route.index(current_customer_id)
+        entry = self.dyn_opt.locate_customer(current_customer_id, truck_id)
+        if entry is not None and entry['truck_pos'] is not None:
+            current_idx = entry['truck_pos']
             # 只收集后续的客户，且确保属于当前车辆对
             for i in range(current_idx + 1, len(truck_route) - 1):  # 排除终点
                 customer = truck_route[i]
@@ -431,8 +548,8 @@ class DestroyOperators:
         for trip in self.dyn_opt.DRONE_Routes[truck_id].route:
             if current_customer_id in trip['path']:
                 retrieval_node = trip['retrieval_node']
-                if retrieval_node in truck_route:
-                    retrieval_idx = truck_route.index(retrieval_node)
+                retrieval_idx = self.dyn_opt.get_truck_position(truck_id, retrieval_node)
+                if retrieval_idx is not None:
                     # 收集回收节点之后的卡车路径客户
                     for i in range(retrieval_idx + 1, len(truck_route) - 1):
                         customer = truck_route[i]
@@ -459,9 +576,12 @@ class DestroyOperators:
             return False
         customer_actually_removed = False
         try:
+            entry = self.dyn_opt.locate_customer(selected_customer, truck_id)
             # 1. 从指定车辆对的卡车路径中删除
-            if selected_customer in self.dyn_opt.TRUCK_Routes[truck_id].Troute:
-                self.dyn_opt.TRUCK_Routes[truck_id].Troute.remove(selected_customer)
+            if entry is not None and entry['truck_pos'] is not None:
+                truck_pos = entry['truck_pos']
+                self.dyn_opt.TRUCK_Routes[truck_id].Troute.pop(truck_pos)
+                self.dyn_opt._notify_truck_remove(truck_id, truck_pos, selected_customer)
                 delete_list.append(selected_customer)
                 customer_actually_removed = True
                 # 处理起飞/回收节点的依赖关系（仅限当前车辆对）
@@ -478,34 +598,32 @@ class DestroyOperators:
                             trips_to_remove.append(i)
                     # 逆序删除trip以避免索引问题
                     for i in reversed(trips_to_remove):
-                        del self.dyn_opt.DRONE_Routes[truck_id].route[i]
+                        removed_trip = self.dyn_opt.DRONE_Routes[truck_id].remove_trip(i)
+                        self.dyn_opt._notify_trip_removed(truck_id, i, removed_trip)
             # 2. 从指定车辆对的无人机路径中删除
-            else:
-                trips_to_update = []
-                for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
-                    if selected_customer in trip['path']:
-                        trip['path'].remove(selected_customer)
-                        delete_list.append(selected_customer)
-                        customer_actually_removed = True
-                        # 如果路径只剩起终点，标记删除整个trip
-                        if len(trip['path']) <= 2:
-                            trips_to_update.append(trip_idx)
-                        else:
-                            # 重新计算载重（只考虑当前车辆对的客户）
-                            trip['current_load'] = sum(
-                                self.dyn_opt.customers[c - 1].demand
-                                for c in trip['path'][1:-1]
-                                if (c <= len(self.dyn_opt.customers) and
-                                    self.dyn_opt.customers[c - 1].demand > 0 and
-                                    self.dyn_opt.validate_customer_assignment(truck_id, c))
-                            )
-                            trip['current_load_delivery'] = trip['current_load']
-                            trip['initial_load'] = trip['current_load']
-                            trip['initial_load_delivery'] = trip['current_load']
-                        break
-                # 删除空的trips
-                for trip_idx in reversed(trips_to_update):
-                    del self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]
+            elif entry is not None and entry['trip_idx'] is not None:
+                trip_idx, path_pos = entry['trip_idx'], entry['path_pos']
+                trip = self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]
+                trip['path'].pop(path_pos)
+                self.dyn_opt._notify_drone_remove(truck_id, trip_idx, path_pos, selected_customer)
+                delete_list.append(selected_customer)
+                customer_actually_removed = True
+                # 如果路径只剩起终点，删除整个trip
+                if len(trip['path']) <= 2:
+                    removed_trip = self.dyn_opt.DRONE_Routes[truck_id].remove_trip(trip_idx)
+                    self.dyn_opt._notify_trip_removed(truck_id, trip_idx, removed_trip)
+                else:
+                    # 重新计算载重（只考虑当前车辆对的客户）
+                    trip['current_load'] = sum(
+                        self.dyn_opt.customers[c - 1].demand
+                        for c in trip['path'][1:-1]
+                        if (c <= len(self.dyn_opt.customers) and
+                            self.dyn_opt.customers[c - 1].demand > 0 and
+                            self.dyn_opt.validate_customer_assignment(truck_id, c))
+                    )
+                    trip['current_load_delivery'] = trip['current_load']
+                    trip['initial_load'] = trip['current_load']
+                    trip['initial_load_delivery'] = trip['current_load']
             return customer_actually_removed
         except (ValueError, IndexError, KeyError) as e:
             print(f"     ️ 移除客户{selected_customer}时出现错误: {e}")
@@ -514,65 +632,93 @@ class DestroyOperators:
                 delete_list.append(selected_customer)
             return False
 
-    def _calculate_detour_cost(self, truck_id, customer):
-        """计算指定车辆对内客户的绕行成本"""
-        try:
-            # 只在指定车辆对的卡车路径中查找
-            if customer in self.dyn_opt.TRUCK_Routes[truck_id].Troute:
-                route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
-                idx = route.index(customer)
-                if idx == 0 or idx == len(route) - 1:
-                    return 0
-                prev_node = route[idx - 1]
-                next_node = route[idx + 1]
-                # 计算绕行距离
-                original_dist = self.dyn_opt.ALLdistanceTmatrix[prev_node][next_node]
-                detour_dist = (self.dyn_opt.ALLdistanceTmatrix[prev_node][customer] +
-                               self.dyn_opt.ALLdistanceTmatrix[customer][next_node])
-                return detour_dist - original_dist
-            return 1.0
-        except (IndexError, KeyError, ValueError):
-            return 1.0
-
-    def _calculate_drone_waiting_energy(self, truck_id, customer):
-        """计算指定车辆对内无人机在客户处的等待能耗"""
-        try:
-            customer_obj = self.dyn_opt.customers[customer - 1]
-            # 验证客户属于指定车辆对且由无人机服务
-            if (self.dyn_opt.validate_customer_assignment(truck_id, customer) and
-                    customer_obj.service_by[0] == "de" and
-                    customer_obj.service_by[1] == truck_id and
-                    hasattr(customer_obj, 'arrive_drone') and
-                    hasattr(customer_obj, 'start_time')):
-                arrive_time = customer_obj.arrive_drone
-                start_time = customer_obj.start_time
-                if arrive_time and start_time and arrive_time < start_time:
-                    wait_time = start_time - arrive_time
-                    # 简化的等待能耗计算
-                    return wait_time * self.dyn_opt.energy_hover * self.dyn_opt.drone_weight
-            return 0.0
-        except (AttributeError, IndexError, KeyError):
-            return 0.0
-
-    def _calculate_shaw_similarity(self, customer1, customer2, phi_1, phi_2, phi_3):
-        """计算同一车辆对内两个客户之间的Shaw相似性"""
-        try:
-            cust1_obj = self.dyn_opt.customers[customer1 - 1]
-            cust2_obj = self.dyn_opt.customers[customer2 - 1]
-            # 距离相似性
-            dist_similarity = self.dyn_opt.ALLdistanceTmatrix[customer1][customer2]
-            # 时间窗相似性
-            time_similarity = abs(cust1_obj.start_time - cust2_obj.start_time)
-            # 服务类型相似性（同一车辆对服务为1，否则为0）
-            service_similarity = 1 if (cust1_obj.service_by[1] == cust2_obj.service_by[1]) else 0
-            # 综合相似性得分（越大越相似）
-            similarity = phi_1 * dist_similarity + phi_2 * time_similarity + phi_3 * service_similarity
-            return similarity
-        except (AttributeError, IndexError, KeyError):
-            return 0.0
+    def _removal_gains(self, truck_id, customers):
+        """
+        车辆对内各客户的移除收益（删除该客户可节省的成本）
+        卡车客户按路径下标数组一次向量化计算；无人机客户按行程能耗变化计算
+        """
+        gains = np.ones(len(customers))  # 无法定位的客户与原实现一致记为1.0
+        truck_slots, truck_positions = [], []
+        for slot, customer in enumerate(customers):
+            entry = self.dyn_opt.locate_customer(customer, truck_id)
+            if entry is None:
+                continue
+            if entry['truck_pos'] is not None:
+                truck_slots.append(slot)
+                truck_positions.append(entry['truck_pos'])
+            else:
+                try:
+                    gains[slot] = -self.dyn_opt.delta_remove(truck_id, customer)
+                except (IndexError, KeyError, ValueError):
+                    pass
+        if truck_slots:
+            gains[truck_slots] = self.dyn_opt.truck_removal_gains(truck_id, truck_positions)
+        return gains
+
+    def _route_neighbours(self, truck_id, customer):
+        """客户在卡车路径或无人机行程中的前后客户（不含仓库及行程起终点）"""
+        entry = self.dyn_opt.locate_customer(customer, truck_id)
+        if entry is None:
+            return []
+        if entry['truck_pos'] is not None:
+            route, pos = self.dyn_opt.TRUCK_Routes[truck_id].Troute, entry['truck_pos']
+        else:
+            route = self.dyn_opt.DRONE_Routes[truck_id].route[entry['trip_idx']]['path']
+            pos = entry['path_pos']
+        return [route[i] for i in (pos - 1, pos + 1) if 1 <= i <= len(route) - 2]
+
+    def _drone_waiting_energy(self, customers):
+        """无人机在各客户处等待时间窗开启的悬停能耗（向量化计算）"""
+        customer_objs = [self.dyn_opt.customers[c - 1] for c in customers]
+        arrive_time = np.array([getattr(obj, 'arrive_drone', None) or 0 for obj in customer_objs], dtype=float)
+        start_time = np.array([obj.start_time or 0 for obj in customer_objs], dtype=float)
+        wait_time = np.where((arrive_time > 0) & (start_time > 0), np.maximum(start_time - arrive_time, 0), 0)
+        # 简化的等待能耗计算
+        return wait_time * self.dyn_opt.energy_hover * self.dyn_opt.drone_weight
+
+    def _randomized_worst_removal(self, truck_id, customers, gains, remove_count, delete_list,
+                                  launch_node, retrieval_node, neighbours_of=None, update_gains=None):
+        """
+        按收益随机化选择最差客户删除：每次在收益最高的若干客户中随机选一个，
+        候选窗口随删除逐步缩小（与排序后取前2*remove_count个、每次在前一半中随机选择一致）
+        收益用最大堆维护，删除后只更新前后邻居的收益（收益已变化的旧堆项在弹出时惰性丢弃）
+        """
+        current_gain = {}
+        heap = []
+        for customer, gain in zip(customers, gains):
+            customer, gain = int(customer), float(gain)
+            current_gain[customer] = gain
+            heap.append((-gain, customer))
+        heapq.heapify(heap)
+        pool = min(len(customers), remove_count * 2)
+        while len(delete_list) < remove_count and pool > 0 and heap:
+            window = []
+            while heap and len(window) < max(1, pool // 2):
+                neg_gain, customer = heapq.heappop(heap)
+                if customer in delete_list or current_gain.get(customer) != -neg_gain:
+                    continue  # 已删除或收益已更新的旧堆项
+                window.append((neg_gain, customer))
+            if not window:
+                break
+            selected = random.choice(window)
+            for item in window:
+                if item is not selected:
+                    heapq.heappush(heap, item)
+            pool -= 1
+            selected_customer = selected[1]
+            del current_gain[selected_customer]
+            neighbours = neighbours_of(truck_id, selected_customer) if neighbours_of else []
+            self._safe_remove_customer(truck_id, selected_customer, delete_list, launch_node, retrieval_node)
+            # 只重新计算仍在候选中的邻居收益
+            neighbours = [c for c in neighbours if c in current_gain and c not in delete_list]
+            if neighbours and update_gains:
+                for customer, gain in zip(neighbours, update_gains(truck_id, neighbours)):
+                    current_gain[customer] = float(gain)
+                    heapq.heappush(heap, (-float(gain), customer))
+        return delete_list
 
 # ==================== 完整修复算子实现 ====================
-class RepairOperators:
+class RepairOperators(AdaptiveOperatorSelection):
     """修复算子集合类 - 严格限制在车辆对内修复"""
     def __init__(self, dynamic_opt_instance):
         self.dyn_opt = dynamic_opt_instance
@@ -594,14 +740,24 @@ class RepairOperators:
             'drone_priority': {'calls': 0, 'improvements': 0, 'success_rate': 0.0},
             'drone_newroute': {'calls': 0, 'improvements': 0, 'success_rate': 0.0}
         }
+        self._init_adaptive_selection()
         # 插入策略选择参数
         self.insertion_attempts_limit = 50
         self.feasibility_check_enabled = True
+        self.debug_insertion_table = False  # 开启后每次插入表更新都与完整枚举结果对比
+        self.regret_k = 2  # 后悔插入考虑的前k个插入选项
+        self.granular_k = None  # 粒度邻域大小：只评估前驱或后继为客户k近邻的位置（None表示评估全部位置）
+        self.granular_source = 'distance'  # 粒度邻域来源：'distance'为距离k近邻，'pheromone'为信息素候选后继表
+        self.insertion_bound_pruning = True  # 无人机插入选项先按能耗下界入表，排到前面时才完整计算
+        self.insertion_bound_stats = {'bounded': 0, 'evaluated': 0}
+        self.last_repair = None  # 最近一次repair_solution选择的(算子, 耗时秒)
 
-    def repair_solution(self, truck_id: int, delete_list: List[int]) -> bool:
+    def repair_solution(self, truck_id: int, delete_list: List[int], record_performance: bool = True) -> bool:
         """
         严格限制在指定车辆对内修复
+        record_performance=False时不更新算子统计，由调用方按last_repair与ALNS接受结果更新
         """
+        self.last_repair = None
         if not delete_list:
             return True
         delete_list = self._enforce_package_constraints(truck_id, delete_list)
@@ -622,8 +778,9 @@ class RepairOperators:
         print(f"🔧 选择修复算子: {selected_operator} (仅限车辆对{truck_id}内)")
         # 记录修复前的成本
         cost_before = self.dyn_opt.cost()
-        # 执行约束版修复算子
+        # 执行约束版修复算子（计时用于按耗时归一化算子奖励）
         success = False
+        start_time = time.perf_counter()
         try:
             if selected_operator == 'random_order':
                 success = self.random_order_insertion(truck_id, delete_list)
@@ -642,6 +799,7 @@ class RepairOperators:
         except Exception as e:
             print(f"    修复算子执行失败: {e}")
             success = self.emergency_repair(truck_id, delete_list)
+        elapsed = time.perf_counter() - start_time
         if success:
             print(f"    执行车辆对{truck_id}的可行性检查...")
             feasibility_success = self.dyn_opt.feasibility_repair_ops.check_and_repair_feasibility(truck_id)
@@ -655,12 +813,15 @@ class RepairOperators:
         if success:
             cost_after = self.dyn_opt.cost()
             improved = cost_after < cost_before
-            self.update_operator_performance(selected_operator, improved)
+            if record_performance:
+                self.update_operator_performance(selected_operator, improved, elapsed)
             print(f"    车辆对{truck_id}修复成功，成本变化: {cost_before:.2f} → {cost_after:.2f}")
         else:
             print(f"    车辆对{truck_id}修复失败，使用应急策略")
             success = self.emergency_repair(truck_id, delete_list)
-            self.update_operator_performance(selected_operator, False)
+            if record_performance:
+                self.update_operator_performance(selected_operator, False, elapsed)
+        self.last_repair = (selected_operator, elapsed)
         return success
 
     def random_order_insertion(self, truck_id: int, delete_list: List[int]) -> bool:
@@ -689,13 +850,16 @@ class RepairOperators:
         print(f"    执行最便宜距离插入（车辆对{truck_id}）...")
         remaining_customers = delete_list.copy()
         inserted_count = 0
+        # 本次修复的插入表：插入一个客户后只重算受影响位置的选项
+        insertion_table = self._build_insertion_table(truck_id, remaining_customers)
         while remaining_customers:
             best_insertion = None
             best_cost = float('inf')
             #  为每个剩余客户在指定车辆对内找到最便宜的插入位置
             for customer_id in remaining_customers:
-                insertion_options = self._get_vehicle_insertion_options(truck_id, customer_id)
-                for option in insertion_options:
+                # 成本不低于当前最优的选项不会被采用，无需完整计算
+                for option in self._best_table_options(insertion_table, truck_id, customer_id, 1,
+                                                       cost_limit=best_cost):
                     if option['cost'] < best_cost:
                         best_cost = option['cost']
                         best_insertion = {
@@ -706,6 +870,7 @@ class RepairOperators:
             if best_insertion and self._execute_insertion(truck_id, best_insertion):
                 remaining_customers.remove(best_insertion['customer_id'])
                 inserted_count += 1
+                self._update_insertion_table(insertion_table, truck_id, best_insertion)
                 print(f"       客户{best_insertion['customer_id']}插入，成本增加: {best_cost:.2f}")
             else:
                 # 应急处理
@@ -713,6 +878,7 @@ class RepairOperators:
                     customer_id = remaining_customers.pop(0)
                     if self._insert_customer_to_specific_vehicle(truck_id, customer_id):
                         inserted_count += 1
+                        insertion_table = self._build_insertion_table(truck_id, remaining_customers)
                     else:
                         print(f"       客户{customer_id}无法插入车辆对{truck_id}")
                         break
@@ -722,49 +888,72 @@ class RepairOperators:
 
     def regret_distance_insertion(self, truck_id: int, delete_list: List[int]) -> bool:
         """
-        约束版后悔距离插入：在指定车辆对内优先插入"后悔值"最大的客户
+        约束版后悔距离插入（regret-k）：在指定车辆对内优先插入"后悔值"最大的客户
+        后悔值 = 前k个可行选项与最优选项的成本差之和（成本为信息素指导评分），只有一个选项时为无穷大
+        客户按后悔值放入最大堆：每次插入后按插入表复核所有剩余客户的前k个选项
+        （插入既可能使缓存选项不可行，也可能因等待时间吸收延迟使更优位置变为可行），
+        只有前k个选项成本变化的客户更新后悔值并重新入堆，其余堆项保持有效
         """
-        print(f"执行后悔距离插入（车辆对{truck_id}）...")
+        print(f"执行后悔距离插入（车辆对{truck_id}，k={self.regret_k}）...")
         remaining_customers = delete_list.copy()
         inserted_count = 0
+        # 客户在待修复列表中的顺序，后悔值相同时先出现的客户优先
+        order = {customer_id: index for index, customer_id in enumerate(delete_list)}
+        # 本次修复的插入表：插入一个客户后只重算受影响位置的选项
+        insertion_table = self._build_insertion_table(truck_id, remaining_customers)
+        heap = []
+        regret_state = {}  # {客户: (版本号, 后悔值, 前k个选项)}
+
+        def _refresh(customer_id, options=None):
+            if options is None:
+                options = self._best_table_options(insertion_table, truck_id, customer_id, self.regret_k)
+            version = regret_state[customer_id][0] + 1 if customer_id in regret_state else 0
+            regret = self._regret_value(options)
+            regret_state[customer_id] = (version, regret, options)
+            if options:
+                heapq.heappush(heap, (-regret, order[customer_id], version, customer_id))
+
+        for customer_id in remaining_customers:
+            _refresh(customer_id)
         while remaining_customers:
             best_insertion = None
-            max_regret = -1
-            # 为每个客户在指定车辆对内计算后悔值
-            for customer_id in remaining_customers:
-                insertion_options = self._get_vehicle_insertion_options(truck_id, customer_id)
-                if len(insertion_options) >= 2:
-                    # 按成本排序
-                    insertion_options.sort(key=lambda x: x['cost'])
-                    # 计算后悔值：次优成本 - 最优成本
-                    regret = insertion_options[1]['cost'] - insertion_options[0]['cost']
-                    if regret > max_regret:
-                        max_regret = regret
-                        best_insertion = {
-                            'customer_id': customer_id,
-                            'option': insertion_options[0],  # 选择最优位置
-                            'regret': regret
-                        }
-                elif len(insertion_options) == 1:
-                    # 只有一个选择时，后悔值设为无穷大
-                    if max_regret < float('inf'):
-                        max_regret = float('inf')
-                        best_insertion = {
-                            'customer_id': customer_id,
-                            'option': insertion_options[0],
-                            'regret': float('inf')
-                        }
+            while heap:
+                neg_regret, _, version, customer_id = heapq.heappop(heap)
+                if customer_id not in regret_state or regret_state[customer_id][0] != version:
+                    continue  # 已插入或已更新的旧堆项
+                # 缓存选项的位置可能已随其他插入移动，按当前路径重新取选项
+                _, regret, options = regret_state[customer_id]
+                current = self._best_table_options(insertion_table, truck_id, customer_id, self.regret_k)
+                if [o['cost'] for o in current] != [o['cost'] for o in options] or not current:
+                    _refresh(customer_id)
+                    continue
+                best_insertion = {'customer_id': customer_id, 'option': current[0], 'regret': regret}
+                break
             # 执行最大后悔值的插入
             if best_insertion and self._execute_insertion(truck_id, best_insertion):
-                remaining_customers.remove(best_insertion['customer_id'])
+                customer_id = best_insertion['customer_id']
+                remaining_customers.remove(customer_id)
+                del regret_state[customer_id]
                 inserted_count += 1
-                print(f"       客户{best_insertion['customer_id']}插入，后悔值: {best_insertion['regret']:.2f}")
+                self._update_insertion_table(insertion_table, truck_id, best_insertion)
+                # 复核所有剩余客户，只更新前k个选项成本变化的客户
+                for other_id in remaining_customers:
+                    current = self._best_table_options(insertion_table, truck_id, other_id, self.regret_k)
+                    if [o['cost'] for o in current] != [o['cost'] for o in regret_state[other_id][2]]:
+                        _refresh(other_id, current)
+                print(f"       客户{customer_id}插入，后悔值: {best_insertion['regret']:.2f}")
             else:
                 # 应急处理
                 if remaining_customers:
                     customer_id = remaining_customers.pop(0)
+                    regret_state.pop(customer_id, None)
                     if self._insert_customer_to_specific_vehicle(truck_id, customer_id):
                         inserted_count += 1
+                        insertion_table = self._build_insertion_table(truck_id, remaining_customers)
+                        heap.clear()
+                        regret_state.clear()
+                        for other_id in remaining_customers:
+                            _refresh(other_id)
                     else:
                         print(f"       客户{customer_id}无法插入车辆对{truck_id}")
                         break
@@ -772,6 +961,20 @@ class RepairOperators:
         print(f"    车辆对{truck_id}后悔插入完成: {inserted_count}/{len(delete_list)} ({success_rate:.1f}%)")
         return inserted_count == len(delete_list)
 
+    @staticmethod
+    def _regret_value(options: List[Dict]) -> float:
+        """regret-k后悔值：前k个选项与最优选项的成本差之和，只有一个选项时为无穷大"""
+        if len(options) == 1:
+            return float('inf')
+        return sum(option['cost'] - options[0]['cost'] for option in options[1:])
+
+    @staticmethod
+    def _table_key(option: Dict) -> Tuple:
+        """插入选项对应的插入表边标识（无人机选项需带行程对象标识，见_resolve_table_option）"""
+        if option['type'] == 'truck':
+            return ('truck', option['prev_customer'], option['next_customer'])
+        return ('drone', option['trip_id'], option['prev_customer'], option['next_customer'])
+
     def greedy_feasibility_insertion(self, truck_id: int, delete_list: List[int]) -> bool:
         """
         贪婪可行性插入：在指定车辆对内快速插入到第一个可行位置
@@ -882,38 +1085,8 @@ class RepairOperators:
         return inserted_count == len(delete_list)
 
     def select_repair_operator(self):
-        """基于轮盘赌选择修复算子"""
-        operators = list(self.operator_weights.keys())
-        weights = list(self.operator_weights.values())
-        total_weight = sum(weights)
-        if total_weight == 0:
-            return random.choice(operators)
-        probabilities = [w / total_weight for w in weights]
-        selected = np.random.choice(operators, p=probabilities)
-        return selected
-
-    def update_operator_performance(self, operator_name: str, improved: bool):
-        """更新算子性能统计"""
-        self.operator_stats[operator_name]['calls'] += 1
-        if improved:
-            self.operator_stats[operator_name]['improvements'] += 1
-        # 更新成功率
-        calls = self.operator_stats[operator_name]['calls']
-        improvements = self.operator_stats[operator_name]['improvements']
-        self.operator_stats[operator_name]['success_rate'] = improvements / calls if calls > 0 else 0.0
-        # 每50次调用更新一次权重
-        if calls % 50 == 0:
-            self._update_operator_weights()
-
-    def _update_operator_weights(self):
-        """基于性能统计更新算子权重"""
-        for op_name, stats in self.operator_stats.items():
-            if stats['calls'] > 10:
-                success_rate = stats['success_rate']
-                base_weight = 0.1
-                performance_weight = success_rate * 0.8
-                exploration_weight = 0.1
-                self.operator_weights[op_name] = base_weight + performance_weight + exploration_weight
+        """基于轮盘赌选择修复算子（权重见AdaptiveOperatorSelection）"""
+        return self._select_operator()
 
     # 辅助方法
     def _insert_customer_to_specific_vehicle(self, truck_id: int, customer_id: int) -> bool:
@@ -935,10 +1108,11 @@ class RepairOperators:
     def _try_insert_to_vehicle_truck(self, truck_id: int, customer_id: int) -> bool:
         """尝试将客户插入到指定车辆对的卡车路径中"""
         truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
-        # 尝试每个位置
-        for pos in range(1, len(truck_route)):
-            if self._is_truck_insertion_feasible(truck_id, customer_id, pos):
-                return self._insert_customer_to_truck_at_position(truck_id, customer_id, pos)
+        # 优先选择满足时间窗的位置，没有时退化为仅满足载重的位置（由可行性修复处理）
+        for check_time_window in (True, False):
+            for pos in range(1, len(truck_route)):
+                if self._is_truck_insertion_feasible(truck_id, customer_id, pos, check_time_window):
+                    return self._insert_customer_to_truck_at_position(truck_id, customer_id, pos)
         return False
 
     def _try_insert_to_vehicle_drone(self, truck_id: int, customer_id: int) -> bool:
@@ -948,19 +1122,26 @@ class RepairOperators:
         if (customer.drone_eligible != 1 or
                 abs(customer.demand) > self.dyn_opt.drone_max_capacity):
             return False
-        # 尝试插入现有无人机路径
-        for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
-            path = trip['path']
-            for pos in range(1, len(path)):
-                if self._is_drone_insertion_feasible(truck_id, trip_idx, customer_id, pos):
-                    return self._insert_customer_to_drone_at_position(
-                        truck_id, customer_id, trip_idx, pos)
+        # 尝试插入现有无人机路径（优先满足时间窗的位置）
+        for check_time_window in (True, False):
+            for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
+                path = trip['path']
+                for pos in range(1, len(path)):
+                    if self._is_drone_insertion_feasible(truck_id, trip_idx, customer_id, pos, check_time_window):
+                        return self._insert_customer_to_drone_at_position(
+                            truck_id, customer_id, trip_idx, pos)
         return False
 
-    def _get_vehicle_insertion_options(self, truck_id: int, customer_id: int) -> List[Dict]:
+    def _get_vehicle_insertion_options(self, truck_id: int, customer_id: int, granular: bool = True) -> List[Dict]:
         """
         获取客户在指定车辆对内的所有可行插入选项
+        启用粒度邻域（granular_k）时先只评估邻域内位置，没有可行位置时自动退回全部位置
         """
+        if granular and self.granular_k:
+            options = (self._get_truck_insertion_options(truck_id, customer_id, granular=True) +
+                       self._get_drone_insertion_options(truck_id, customer_id, granular=True))
+            if options:
+                return options
         options = []
         # 1. 指定车辆对的卡车路径插入选项
         truck_options = self._get_truck_insertion_options(truck_id, customer_id)
@@ -968,27 +1149,50 @@ class RepairOperators:
         # 2. 指定车辆对的无人机路径插入选项
         drone_options = self._get_drone_insertion_options(truck_id, customer_id)
         options.extend(drone_options)
+        if not options:
+            # 没有满足时间窗的位置时退化为仅满足载重的选项，时间窗违反由可行性修复处理
+            options.extend(self._get_truck_insertion_options(truck_id, customer_id, check_time_window=False))
+            options.extend(self._get_drone_insertion_options(truck_id, customer_id, check_time_window=False))
         return options
 
-    def _get_truck_insertion_options(self, truck_id: int, customer_id: int) -> List[Dict]:
+    def _granular_positions(self, customer_id: int, route: List[int], vehicle_type: str) -> List[int]:
+        """
+        路径中前驱或后继属于客户粒度邻域的插入位置；未启用粒度邻域时返回全部位置
+        granular_source为'pheromone'时，只保留新增边(前驱, 客户)或(客户, 后继)在信息素候选后继表中的位置
+        """
+        if not self.granular_k:
+            return list(range(1, len(route)))
+        if self.granular_source == 'pheromone':
+            candidate_sets = self.dyn_opt.get_pheromone_candidate_sets(vehicle_type, self.granular_k)
+            successors = candidate_sets[customer_id]
+            return [pos for pos in range(1, len(route))
+                    if route[pos - 1] == 0 or route[pos] == 0 or
+                    customer_id in candidate_sets[route[pos - 1]] or route[pos] in successors]
+        neighbour_set = self.dyn_opt.get_granular_neighbour_sets(vehicle_type, self.granular_k)[customer_id]
+        return [pos for pos in range(1, len(route))
+                if route[pos - 1] in neighbour_set or route[pos] in neighbour_set]
+
+    def _get_truck_insertion_options(self, truck_id: int, customer_id: int,
+                                     check_time_window: bool = True, granular: bool = False) -> List[Dict]:
         """获取指定车辆对卡车路径的插入选项"""
         options = []
         truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
-        customer = self.dyn_opt.customers[customer_id - 1]
-        # 尝试每个可能的插入位置
-        for pos in range(1, len(truck_route)):
-            if self._is_truck_insertion_feasible(truck_id, customer_id, pos):
-                cost = self._calculate_truck_insertion_cost(truck_id, customer_id, pos)
+        positions = self._granular_positions(customer_id, truck_route, 'truck') if granular else range(1, len(truck_route))
+        # 所有位置的插入成本一次批量计算
+        costs = self._truck_insertion_costs(truck_id, customer_id, positions)
+        for pos, cost in zip(positions, costs):
+            if self._is_truck_insertion_feasible(truck_id, customer_id, pos, check_time_window):
                 options.append({
                     'type': 'truck',
                     'position': pos,
-                    'cost': cost,
+                    'cost': float(cost),
                     'prev_customer': truck_route[pos - 1] if pos > 0 else 0,
                     'next_customer': truck_route[pos] if pos < len(truck_route) else 0
                 })
         return options
 
-    def _get_drone_insertion_options(self, truck_id: int, customer_id: int) -> List[Dict]:
+    def _get_drone_insertion_options(self, truck_id: int, customer_id: int,
+                                     check_time_window: bool = True, granular: bool = False) -> List[Dict]:
         """获取指定车辆对无人机路径的插入选项"""
         options = []
         customer = self.dyn_opt.customers[customer_id - 1]
@@ -999,20 +1203,283 @@ class RepairOperators:
         # 遍历指定车辆对的无人机路径
         for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
             path = trip['path']
-            # 尝试每个可能的插入位置
-            for pos in range(1, len(path)):
-                if self._is_drone_insertion_feasible(truck_id, trip_idx, customer_id, pos):
-                    cost = self._calculate_drone_insertion_cost(truck_id, trip_idx, customer_id, pos)
-                    options.append({
-                        'type': 'drone',
-                        'trip_index': trip_idx,
-                        'position': pos,
-                        'cost': cost,
-                        'prev_customer': path[pos - 1],
-                        'next_customer': path[pos]
-                    })
+            candidates = self._granular_positions(customer_id, path, 'drone') if granular else range(1, len(path))
+            # 先做O(1)可行性筛选，只为可行位置计算（能耗）插入成本
+            positions = [pos for pos in candidates
+                         if self._is_drone_insertion_feasible(truck_id, trip_idx, customer_id, pos, check_time_window)]
+            costs = self._drone_insertion_costs(truck_id, trip_idx, customer_id, positions)
+            for pos, cost in zip(positions, costs):
+                options.append({
+                    'type': 'drone',
+                    'trip_index': trip_idx,
+                    'trip_id': id(trip),
+                    'position': pos,
+                    'cost': float(cost),
+                    'prev_customer': path[pos - 1],
+                    'next_customer': path[pos]
+                })
         return options
 
+    def _truck_insertion_costs(self, truck_id: int, customer_id: int, positions) -> np.ndarray:
+        """
+        批量计算卡车路径多个位置的插入成本（与_calculate_truck_insertion_cost逐位置计算一致）
+        距离增量与信息素均按路径下标数组在矩阵上批量取值
+        """
+        positions = np.asarray(positions, dtype=int)
+        if positions.size == 0:
+            return np.empty(0)
+        if not hasattr(self.dyn_opt, 'get_pheromone_guided_insertion_scores'):
+            return np.array([self._calculate_truck_insertion_cost(truck_id, customer_id, pos) for pos in positions])
+        truck_route = np.asarray(self.dyn_opt.TRUCK_Routes[truck_id].Troute)
+        base_costs = self.dyn_opt.truck_insertion_deltas(truck_id, customer_id, positions)
+        scores = self.dyn_opt.get_pheromone_guided_insertion_scores(
+            customer_id, truck_route[positions - 1], truck_route[positions], base_costs)
+        return -scores  # 负值，因为我们要最小化成本
+
+    def _drone_insertion_costs(self, truck_id: int, trip_idx: int, customer_id: int, positions) -> np.ndarray:
+        """
+        批量计算无人机行程多个位置的插入成本（与_calculate_drone_insertion_cost逐位置计算一致）
+        行程能耗增量依赖时间与载重的逐点递推，仍逐位置计算；信息素评分批量计算
+        """
+        positions = np.asarray(positions, dtype=int)
+        if positions.size == 0:
+            return np.empty(0)
+        if not hasattr(self.dyn_opt, 'get_pheromone_guided_insertion_scores'):
+            return np.array([self._calculate_drone_insertion_cost(truck_id, trip_idx, customer_id, pos)
+                             for pos in positions])
+        path = np.asarray(self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]['path'])
+        base_costs = np.array([self.dyn_opt.delta_insert(truck_id, customer_id, int(pos), trip_idx=trip_idx)
+                               for pos in positions], dtype=float)
+        scores = self.dyn_opt.get_pheromone_guided_insertion_scores(
+            customer_id, path[positions - 1], path[positions], base_costs)
+        return -scores
+
+    def _drone_insertion_bound_costs(self, truck_id: int, trip_idx: int, customer_id: int, positions) -> np.ndarray:
+        """
+        无人机行程多个位置插入成本的下界：以能耗成本下界代替完整能耗增量计算信息素评分
+        评分随插入成本单调不增，因此所得成本不大于_drone_insertion_costs的结果
+        """
+        positions = np.asarray(positions, dtype=int)
+        if positions.size == 0:
+            return np.empty(0)
+        path = np.asarray(self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]['path'])
+        base_bounds = self.dyn_opt.drone_insertion_energy_bounds(truck_id, trip_idx, customer_id, positions)
+        scores = self.dyn_opt.get_pheromone_guided_insertion_scores(
+            customer_id, path[positions - 1], path[positions], base_bounds)
+        return -scores
+
+    # ==================== 修复过程插入表 ====================
+    def _build_insertion_table(self, truck_id: int, customers: List[int]) -> Dict:
+        """
+        构建本次修复的插入表：{客户: 按成本升序的[(cost, seq, key, exact)]}
+        key按插入边标识（卡车: ('truck', prev, next)；无人机: ('drone', id(trip), prev, next)），
+        路径变化后只需替换被拆开的边及能耗受影响的行程，可行性在取用时按当前状态O(1)检查；
+        exact为False的无人机选项cost只是下界，排到前面时才完整计算
+        """
+        table = {'entries': {customer_id: [] for customer_id in customers}, 'seq': 0,
+                 'granular': bool(self.granular_k)}
+        truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
+        for customer_id in customers:
+            self._add_truck_table_options(table, truck_id, customer_id,
+                                          self._granular_positions(customer_id, truck_route, 'truck'))
+            for trip_idx in range(len(self.dyn_opt.DRONE_Routes[truck_id].route)):
+                self._add_drone_table_options(table, truck_id, customer_id, trip_idx)
+        return table
+
+    def _add_truck_table_options(self, table: Dict, truck_id: int, customer_id: int, positions):
+        """把卡车路径positions处的插入选项加入插入表"""
+        truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
+        entries = table['entries'][customer_id]
+        for pos, cost in zip(positions, self._truck_insertion_costs(truck_id, customer_id, positions)):
+            cost = float(cost)
+            table['seq'] += 1
+            bisect.insort(entries, (cost, table['seq'], ('truck', truck_route[pos - 1], truck_route[pos]), True))
+
+    def _add_drone_table_options(self, table: Dict, truck_id: int, customer_id: int, trip_idx: int):
+        """把无人机行程trip_idx各位置的插入选项加入插入表"""
+        customer = self.dyn_opt.customers[customer_id - 1]
+        if (customer.drone_eligible != 1 or
+                abs(customer.demand) > self.dyn_opt.drone_max_capacity):
+            return
+        trip = self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]
+        path = trip['path']
+        entries = table['entries'][customer_id]
+        positions = self._granular_positions(customer_id, path, 'drone')
+        exact = not (self.insertion_bound_pruning and hasattr(self.dyn_opt, 'drone_insertion_energy_bounds'))
+        if exact:
+            costs = self._drone_insertion_costs(truck_id, trip_idx, customer_id, positions)
+        else:
+            costs = self._drone_insertion_bound_costs(truck_id, trip_idx, customer_id, positions)
+            self.insertion_bound_stats['bounded'] += len(positions)
+        for pos, cost in zip(positions, costs):
+            cost = float(cost)
+            table['seq'] += 1
+            bisect.insort(entries, (cost, table['seq'], ('drone', id(trip), path[pos - 1], path[pos]), exact))
+
+    def _resolve_table_option(self, truck_id: int, key: Tuple, cost: float) -> Optional[Dict]:
+        """把插入表中的边标识还原为当前路径中的插入选项，边已不存在时返回None"""
+        if key[0] == 'truck':
+            _, prev_node, next_node = key
+            truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
+            if len(truck_route) >= 2 and truck_route[-2] == prev_node and truck_route[-1] == next_node:
+                position = len(truck_route) - 1
+            else:
+                position = self.dyn_opt.get_truck_position(truck_id, next_node)
+                if not position or truck_route[position - 1] != prev_node:
+                    return None
+            return {'type': 'truck', 'position': position, 'cost': cost,
+                    'prev_customer': prev_node, 'next_customer': next_node}
+        _, trip_id, prev_node, next_node = key
+        for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
+            if id(trip) != trip_id:
+                continue
+            path = trip['path']
+            for position in range(1, len(path)):
+                if path[position - 1] == prev_node and path[position] == next_node:
+                    return {'type': 'drone', 'trip_index': trip_idx, 'trip_id': trip_id, 'position': position,
+                            'cost': cost, 'prev_customer': prev_node, 'next_customer': next_node}
+        return None
+
+    def _best_table_options(self, table: Dict, truck_id: int, customer_id: int, count: int,
+                            cost_limit: float = float('inf')) -> List[Dict]:
+        """
+        按成本顺序取客户前count个可行插入选项（与_get_vehicle_insertion_options排序后的前count个一致）
+        没有满足时间窗的位置时退化为仅满足载重的选项，时间窗违反由可行性修复处理；
+        粒度邻域插入表中没有满足时间窗的位置时退回完整枚举
+        只按下界入表的选项排到最前面时才完整计算并按精确成本重新入表；
+        cost_limit: 只保证成本低于该值的选项与完整枚举一致，剩余选项的下界都不低于它时停止
+        """
+        entries = table['entries'].get(customer_id, [])
+        for check_time_window in ((True,) if table.get('granular') else (True, False)):
+            options = []
+            start = 0
+            while start < len(entries):
+                if entries[start][0] >= cost_limit:
+                    # 存在可行选项时不会退化到下一轮，结果中已无成本低于cost_limit的选项
+                    for entry in entries[start:]:
+                        option = self._resolve_table_option(truck_id, entry[2], entry[0])
+                        if option is not None and self._is_table_option_feasible(
+                                truck_id, customer_id, option, check_time_window):
+                            return options
+                    break
+                # 成本相同的一组选项按完整枚举的顺序（卡车位置在前，无人机按行程、位置）排列
+                end = start
+                group = []
+                while end < len(entries) and entries[end][0] == entries[start][0]:
+                    option = self._resolve_table_option(truck_id, entries[end][2], entries[end][0])
+                    if option is not None and self._is_table_option_feasible(
+                            truck_id, customer_id, option, check_time_window):
+                        group.append((end, option))
+                    end += 1
+                pending = [(index, option) for index, option in group if not entries[index][3]]
+                if pending:
+                    # 下界排到最前面：完整计算后重新入表，精确成本不低于下界，仍从start继续
+                    if self._evaluate_table_entries(entries, truck_id, customer_id, pending) < start:
+                        options = []
+                        start = 0
+                    continue
+                group = [option for _, option in group]
+                group.sort(key=lambda o: (o['type'] == 'drone', o.get('trip_index', -1), o['position']))
+                for option in group:
+                    options.append(option)
+                    if len(options) >= count:
+                        return options
+                start = end
+            if options:
+                return options
+        if table.get('granular'):
+            options = self._get_vehicle_insertion_options(truck_id, customer_id, granular=False)
+            options.sort(key=lambda o: o['cost'])
+            return options[:count]
+        return []
+
+    def _is_table_option_feasible(self, truck_id: int, customer_id: int, option: Dict,
+                                  check_time_window: bool) -> bool:
+        """按当前状态检查插入表选项的可行性"""
+        if option['type'] == 'truck':
+            return self._is_truck_insertion_feasible(truck_id, customer_id, option['position'], check_time_window)
+        return self._is_drone_insertion_feasible(
+            truck_id, option['trip_index'], customer_id, option['position'], check_time_window)
+
+    def _evaluate_table_entries(self, entries: List[Tuple], truck_id: int, customer_id: int,
+                                pending: List[Tuple[int, Dict]]) -> int:
+        """
+        完整计算按下界入表的选项，以精确成本替换原表项（保留seq），返回重新入表的最小下标
+        """
+        evaluated = []
+        for index, option in sorted(pending, key=lambda item: item[0], reverse=True):
+            _, seq, key, _ = entries.pop(index)
+            cost = float(self._drone_insertion_costs(
+                truck_id, option['trip_index'], customer_id, [option['position']])[0])
+            evaluated.append((cost, seq, key, True))
+        self.insertion_bound_stats['evaluated'] += len(evaluated)
+        first_index = len(entries)
+        for entry in evaluated:
+            position = bisect.bisect_left(entries, entry)
+            entries.insert(position, entry)
+            first_index = min(first_index, position)
+        return first_index
+
+    def print_insertion_bound_stats(self):
+        """打印插入选项下界剪枝统计"""
+        bounded = self.insertion_bound_stats['bounded']
+        evaluated = self.insertion_bound_stats['evaluated']
+        avoided_rate = ((bounded - evaluated) / bounded * 100) if bounded > 0 else 0
+        print(f"插入下界剪枝: {bounded}个无人机选项按下界入表, 完整计算{evaluated}个, "
+              f"避免{bounded - evaluated}次完整计算 ({avoided_rate:.1f}%)")
+
+    def _update_insertion_table(self, table: Dict, truck_id: int, insertion_info: Dict):
+        """
+        插入一个客户后局部更新插入表：
+        卡车插入只拆开一条边，并改变插入位置之后的时间，回收节点在其后的行程能耗需重算；
+        无人机插入只影响该行程
+        """
+        inserted_customer = insertion_info['customer_id']
+        option = insertion_info['option']
+        table['entries'].pop(inserted_customer, None)
+        trips = self.dyn_opt.DRONE_Routes[truck_id].route
+        if option['type'] == 'truck':
+            position = option['position']
+            broken_edge = ('truck', option['prev_customer'], option['next_customer'])
+            stale_trips = []
+            for trip_idx, trip in enumerate(trips):
+                retrieval_pos = self.dyn_opt.get_truck_position(truck_id, trip['retrieval_node'])
+                if (trip['launch_node'] == 0 or trip['retrieval_node'] == 0 or
+                        retrieval_pos is None or retrieval_pos >= position):
+                    stale_trips.append(trip_idx)
+            new_positions = (position, position + 1)
+        else:
+            broken_edge = None
+            stale_trips = [option['trip_index']]
+            new_positions = ()
+        stale_trip_ids = {id(trips[trip_idx]) for trip_idx in stale_trips}
+        for customer_id, entries in table['entries'].items():
+            entries[:] = [entry for entry in entries
+                          if entry[2] != broken_edge and not (entry[2][0] == 'drone' and entry[2][1] in stale_trip_ids)]
+            if new_positions and table['granular']:
+                granular_positions = self._granular_positions(customer_id, self.dyn_opt.TRUCK_Routes[truck_id].Troute, 'truck')
+                positions = [pos for pos in new_positions if pos in granular_positions]
+            else:
+                positions = new_positions
+            self._add_truck_table_options(table, truck_id, customer_id, positions)
+            for trip_idx in stale_trips:
+                self._add_drone_table_options(table, truck_id, customer_id, trip_idx)
+        if self.debug_insertion_table:
+            self.validate_insertion_table(table, truck_id)
+
+    def validate_insertion_table(self, table: Dict, truck_id: int) -> bool:
+        """
+        一致性检查：插入表给出的最优/次优选项成本与完整枚举结果对比
+        """
+        consistent = True
+        for customer_id in table['entries']:
+            expected = sorted(option['cost'] for option in self._get_vehicle_insertion_options(truck_id, customer_id))[:2]
+            actual = [option['cost'] for option in self._best_table_options(table, truck_id, customer_id, 2)]
+            if len(expected) != len(actual) or any(abs(a - b) > 1e-6 for a, b in zip(expected, actual)):
+                print(f"      ⚠️ 插入表不一致：客户{customer_id} 完整枚举{expected} 插入表{actual}")
+                consistent = False
+        return consistent
+
     def _execute_insertion(self, truck_id: int, insertion_info: Dict) -> bool:
         """执行约束版插入操作"""
         try:
@@ -1029,18 +1496,19 @@ class RepairOperators:
             print(f"       插入执行失败: {e}")
             return False
 
-    def _is_truck_insertion_feasible(self, truck_id: int, customer_id: int, position: int) -> bool:
+    def _is_truck_insertion_feasible(self, truck_id: int, customer_id: int, position: int,
+                                     check_time_window: bool = True) -> bool:
         """检查在指定车辆对的卡车中插入的可行性"""
-        customer = self.dyn_opt.customers[customer_id - 1]
-        truck = self.dyn_opt.TRUCK_Routes[truck_id]
-        # 1. 载重约束检查
-        if customer.demand > 0:
-            if truck.current_load + customer.demand > truck.max_capacity:
-                return False
-        # 2. 时间窗约束检查（简化）
+        # 1. 载重约束检查（载重剖面区间最大值，O(1)）
+        if not self.dyn_opt.is_truck_insertion_load_feasible(truck_id, customer_id, position):
+            return False
+        # 2. 时间窗约束检查（前向松弛量，O(1)）
+        if check_time_window:
+            return self.dyn_opt.is_truck_insertion_time_feasible(truck_id, customer_id, position)
         return True
 
-    def _is_drone_insertion_feasible(self, truck_id: int, trip_idx: int, customer_id: int, position: int) -> bool:
+    def _is_drone_insertion_feasible(self, truck_id: int, trip_idx: int, customer_id: int, position: int,
+                                     check_time_window: bool = True) -> bool:
         """检查在指定车辆对的无人机中插入的可行性"""
         customer = self.dyn_opt.customers[customer_id - 1]
         trip = self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]
@@ -1048,13 +1516,18 @@ class RepairOperators:
         current_load = trip.get('current_load', 0)
         if current_load + abs(customer.demand) > self.dyn_opt.drone_max_capacity:
             return False
-        # 2. 能耗约束检查（简化）
+        # 2. 时间窗约束检查（前向松弛量，O(1)）
+        if check_time_window and not self.dyn_opt.is_drone_insertion_time_feasible(
+                truck_id, trip_idx, customer_id, position):
+            return False
+        # 3. 能耗约束检查（简化）
         return True
 
     def _insert_customer_to_truck_at_position(self, truck_id: int, customer_id: int, position: int) -> bool:
         """在指定车辆对的卡车路径指定位置插入客户"""
         try:
             self.dyn_opt.TRUCK_Routes[truck_id].Troute.insert(position, customer_id)
+            self.dyn_opt._notify_truck_insert(truck_id, position)
             # 更新客户信息
             self.dyn_opt.customers[customer_id - 1].service_by = ["tk", truck_id]
             # 更新时间矩阵
@@ -1069,6 +1542,7 @@ class RepairOperators:
         try:
             trip = self.dyn_opt.DRONE_Routes[truck_id].route[trip_idx]
             trip['path'].insert(position, customer_id)
+            self.dyn_opt._notify_drone_insert(truck_id, trip_idx, position)
 
             # 更新载重
             customer = self.dyn_opt.customers[customer_id - 1]
@@ -1098,21 +1572,8 @@ class RepairOperators:
         next_node = truck_route[position] if position < len(truck_route) else 0
         # 使用信息素指导评分（如果可用）
         if hasattr(self.dyn_opt, 'get_pheromone_guided_insertion_score'):
-            # 计算基础距离成本
-            if prev_node == 0:
-                old_distance = self.dyn_opt.ALLdistanceTmatrix[0][next_node]
-                new_distance = (self.dyn_opt.ALLdistanceTmatrix[0][customer_id] +
-                                self.dyn_opt.ALLdistanceTmatrix[customer_id][next_node])
-            elif next_node == 0:
-                old_distance = self.dyn_opt.ALLdistanceTmatrix[prev_node][0]
-                new_distance = (self.dyn_opt.ALLdistanceTmatrix[prev_node][customer_id] +
-                                self.dyn_opt.ALLdistanceTmatrix[customer_id][0])
-            else:
-                old_distance = self.dyn_opt.ALLdistanceTmatrix[prev_node][next_node]
-                new_distance = (self.dyn_opt.ALLdistanceTmatrix[prev_node][customer_id] +
-                                self.dyn_opt.ALLdistanceTmatrix[customer_id][next_node])
-
-            base_cost = (new_distance - old_distance) * self.dyn_opt.cost_truck
+            # 基础成本：不修改路径的增量成本评估
+            base_cost = self.dyn_opt.delta_insert(truck_id, customer_id, position)
             score = self.dyn_opt.get_pheromone_guided_insertion_score(customer_id, prev_node, next_node, base_cost)
             return -score  # 负值，因为我们要最小化成本
         else:
@@ -1129,10 +1590,8 @@ class RepairOperators:
         next_node = path[position]
         # 使用信息素指导评分
         if hasattr(self.dyn_opt, 'get_pheromone_guided_insertion_score'):
-            old_distance = self.dyn_opt.ALLdistanceDmatrix[prev_node][next_node]
-            new_distance = (self.dyn_opt.ALLdistanceDmatrix[prev_node][customer_id] +
-                            self.dyn_opt.ALLdistanceDmatrix[customer_id][next_node])
-            base_cost = (new_distance - old_distance) * self.dyn_opt.cost_drone
+            # 基础成本：行程能耗的增量变化
+            base_cost = self.dyn_opt.delta_insert(truck_id, customer_id, position, trip_idx=trip_idx)
             score = self.dyn_opt.get_pheromone_guided_insertion_score(customer_id, prev_node, next_node, base_cost)
             return -score
         else:
@@ -1275,6 +1734,7 @@ class RepairOperators:
         energy = self._calculate_drone_route_energy(path, total_load)
         # 添加到指定车辆对的无人机路径
         self.dyn_opt.DRONE_Routes[truck_id].add_trip(launch_node, retrieval_node, path, energy)
+        self.dyn_opt._notify_trip_added(truck_id)
         # 更新客户服务信息（确保指向正确的车辆对）
         for customer_id in customers:
             if self.dyn_opt.validate_customer_assignment(truck_id, customer_id):
@@ -1302,6 +1762,7 @@ class RepairOperators:
                 # 验证插入位置的合理性
                 if insert_pos > 0:
                     truck_route.insert(insert_pos, customer_id)
+                    self.dyn_opt._notify_truck_insert(truck_id, insert_pos)
                     # 更新客户服务信息（确保指向正确的车辆对）
                     self.dyn_opt.customers[customer_id - 1].service_by = ["tk", truck_id]
                     # 更新时间矩阵
@@ -1358,6 +1819,8 @@ class FeasibilityRepairOperators:
         self.violation_tolerance = 0.1  # 违反容忍度
         self.enable_aggressive_repair = True  # 启用激进修复模式
         self.debug_mode = False  # 调试模式开关
+        # 增量检查统计：每次修复后只重新检查变化区段
+        self.incremental_check_stats = {'checks': 0, 'positions': 0, 'rechecked': 0}
 
     def check_and_repair_feasibility(self, truck_id: int) -> bool:
         """
@@ -1374,20 +1837,23 @@ class FeasibilityRepairOperators:
         processed_violations = set()
         consecutive_same_violations = 0
         last_violation_signature = None
+        constraint_arrays = None
 
         while repair_attempts < max_attempts:
             violations_found = False
 
-            #  一次性检查所有违反类型
-            violation_summary = self._comprehensive_violation_check(truck_id)
+            #  一次性检查所有违反类型（单次向量化检查，得到各类违反掩码）
+            #  修复后只重新检查卡车路径变化位置之后的区段和路径变化的无人机任务
+            constraint_arrays = self.check_constraint_arrays(truck_id, constraint_arrays)
+            violation_counts = self._count_violations(constraint_arrays)
 
-            if not violation_summary:
+            if not any(violation_counts.values()):
                 if self.debug_mode:
                     print(f"    车辆对{truck_id}所有约束都已满足")
                 break
 
             #  生成违反签名，检测是否陷入循环
-            current_signature = self._generate_violation_signature(violation_summary)
+            current_signature = self._generate_violation_signature(violation_counts)
             if current_signature == last_violation_signature:
                 consecutive_same_violations += 1
                 if consecutive_same_violations >= 2:  # 连续2次相同违反就跳出
@@ -1404,15 +1870,15 @@ class FeasibilityRepairOperators:
 
             repair_performed = False
             for violation_type in repair_priority:
-                if violation_type in violation_summary:
+                if violation_counts[violation_type]:
                     violation_key = f"{violation_type}_{truck_id}_{repair_attempts}"
 
                     if self.debug_mode:
                         print(f"   处理{violation_type}违反（轮次{repair_attempts + 1}）...")
 
-                    # 执行修复
+                    # 执行修复（只为当前处理的违反类型生成违反明细）
                     success = self._repair_violation_by_type(
-                        truck_id, violation_type, violation_summary[violation_type])
+                        truck_id, violation_type, self._violation_list(constraint_arrays, violation_type))
 
                     processed_violations.add(violation_key)
                     violations_found = True
@@ -1454,214 +1920,295 @@ class FeasibilityRepairOperators:
 
         return overall_success
 
-    def _generate_violation_signature(self, violation_summary: Dict) -> str:
+    def _generate_violation_signature(self, violation_counts: Dict) -> str:
         """ 生成违反签名，用于检测循环"""
         signature_parts = []
-        for violation_type, violations in violation_summary.items():
-            if violations:
-                signature_parts.append(f"{violation_type}:{len(violations)}")
+        for violation_type, count in violation_counts.items():
+            if count:
+                signature_parts.append(f"{violation_type}:{count}")
         return "|".join(sorted(signature_parts))
 
-    def _comprehensive_violation_check(self, truck_id: int) -> Dict:
-        """ 全面的违反检查 - 一次性检查所有类型"""
-        violations = {}
-
-        try:
-            # 1. 检查卡车载重违反
-            truck_violations = self._check_truck_load_violations_detailed(truck_id)
-            if truck_violations:
-                violations['truck_load'] = truck_violations
-
-            # 2. 检查无人机载重违反
-            drone_load_violations = self._check_drone_load_violations_detailed(truck_id)
-            if drone_load_violations:
-                violations['drone_load'] = drone_load_violations
-
-            # 3. 检查无人机能耗违反
-            energy_violations = self._check_drone_energy_violations_detailed(truck_id)
-            if energy_violations:
-                violations['drone_energy'] = energy_violations
-
-            # 4. 检查时间窗口违反
-            time_violations = self._check_time_window_violations_detailed(truck_id)
-            if time_violations:
-                violations['time_window'] = time_violations
-
-        except Exception as e:
-            if self.debug_mode:
-                print(f"      违反检查出错: {e}")
-
-        return violations
-
-    def _check_truck_load_violations_detailed(self, truck_id: int) -> List[Dict]:
-        """ 详细的卡车载重检查"""
-        violations = []
-        try:
-            truck_route = self.dyn_opt.TRUCK_Routes[truck_id].Troute
-            current_load = self.dyn_opt.TRUCK_Routes[truck_id].current_load
-
-            for i, customer_id in enumerate(truck_route[1:-1], 1):
-                if customer_id <= len(self.dyn_opt.customers):
-                    customer = self.dyn_opt.customers[customer_id - 1]
-
-                    # 取货操作检查
-                    if customer.demand < 0:
-                        projected_load = current_load + abs(customer.demand)
-                        if projected_load > self.dyn_opt.truck_max_capacity:
-                            violations.append({
-                                'customer_id': customer_id,
-                                'position': i,
-                                'current_load': current_load,
-                                'projected_load': projected_load,
-                                'excess': projected_load - self.dyn_opt.truck_max_capacity
-                            })
-
-                    current_load -= customer.demand
-
-        except Exception as e:
-            if self.debug_mode:
-                print(f"     卡车载重检查出错: {e}")
+    def check_constraint_arrays(self, truck_id: int, previous: Optional[Dict] = None) -> Dict:
+        """
+        单次向量化约束检查：在车辆对的路径数组上同时计算四类约束
+        previous为同一车辆对上一次的检查结果（修复循环内使用）：卡车路径只重新检查
+        第一个变化位置之后的区段（载重向后传递），无人机任务只重新检查路径变化的任务
+        Returns:
+            Dict: {
+                'truck_load': 卡车路径客户的取货超载掩码及超载量,
+                'drone_launch': 各无人机任务的起飞超载掩码及超载量,
+                'drone_flight': 所有无人机任务客户（拼接）的飞行超载掩码及超载量,
+                'drone_energy': 各无人机任务的能耗超限掩码及超出量,
+                'time_window': 卡车与无人机客户（拼接）的早到/晚到掩码及偏差,
+                'segments': 可供下一次增量检查复用的卡车区段与各任务区段
+            }
+        """
+        dyn_opt = self.dyn_opt
+        customer_arrays = dyn_opt.get_customer_arrays()
+        truck = dyn_opt.TRUCK_Routes[truck_id]
+        trips = dyn_opt.DRONE_Routes[truck_id].route
+        previous_segments = None
+        if previous is not None and previous['truck_id'] == truck_id:
+            previous_segments = previous['segments']
+
+        # 1. 卡车路径区段：与上次检查的公共前缀直接复用
+        truck_ids = np.asarray(truck.Troute[1:-1], dtype=int)
+        start = 0
+        previous_truck = None
+        if previous_segments is not None and previous_segments['truck_current_load'] == truck.current_load:
+            previous_truck = previous_segments['truck']
+            start = self._common_prefix_length(previous_truck['customer_id'], truck_ids)
+        truck_segment = self._truck_segment_arrays(truck_ids, start, previous_truck, truck.current_load)
+
+        # 2. 无人机任务区段：路径未变化的任务直接复用
+        trip_segments = []
+        rechecked = len(truck_ids) - start
+        for trip_idx, trip in enumerate(trips):
+            path_ids = np.asarray(trip['path'][1:-1], dtype=int)
+            if (previous_segments is not None and trip_idx < len(previous_segments['trips']) and
+                    np.array_equal(previous_segments['trips'][trip_idx]['customer_id'], path_ids)):
+                trip_segments.append(previous_segments['trips'][trip_idx])
+            else:
+                trip_segments.append(self._trip_segment_arrays(path_ids))
+                rechecked += len(path_ids)
+
+        # 3. 拼接各区段并计算违反掩码
+        trip_count = len(trips)
+        lengths = np.array([len(segment['customer_id']) for segment in trip_segments], dtype=int)
+        flight_ids = np.concatenate([segment['customer_id'] for segment in trip_segments] or
+                                    [np.zeros(0, dtype=int)])
+        flight_valid = np.concatenate([segment['valid'] for segment in trip_segments] or [np.zeros(0, dtype=bool)])
+        flight_demand = np.concatenate([segment['demand'] for segment in trip_segments] or [np.zeros(0)])
+        flight_load = np.concatenate([segment['load'] for segment in trip_segments] or [np.zeros(0)])
+        flight_arrival = np.concatenate([segment['arrival'] for segment in trip_segments] or [np.zeros(0)])
+        flight_trip = np.repeat(np.arange(trip_count), lengths)
+        flight_position = np.concatenate([np.arange(1, n + 1) for n in lengths] or [np.zeros(0, dtype=int)])
+
+        self.incremental_check_stats['checks'] += 1
+        self.incremental_check_stats['positions'] += len(truck_ids) + len(flight_ids)
+        self.incremental_check_stats['rechecked'] += rechecked
+
+        truck_valid = truck_segment['valid']
+        truck_demand = truck_segment['demand']
+        truck_load = truck_segment['load']
+        truck_mask = truck_valid & (truck_demand < 0) & (truck_load > dyn_opt.truck_max_capacity)
+        flight_mask = flight_valid & (flight_demand < 0) & (flight_load > dyn_opt.drone_max_capacity)
+
+        launch_load = np.array([trip.get('current_load', 0) for trip in trips], dtype=float)
+        energy = np.array([trip.get('energy', 0) for trip in trips], dtype=float)
+
+        # 4. 时间窗：卡车客户用卡车到达时间，无人机客户用无人机到达时间（无记录的不检查）
+        tw_ids = np.concatenate([truck_ids, flight_ids]).astype(int)
+        tw_valid = np.concatenate([truck_valid, flight_valid])
+        is_drone = np.concatenate([np.zeros(len(truck_ids), dtype=bool), np.ones(len(flight_ids), dtype=bool)])
+        arrival = np.concatenate([truck_segment['arrival'], flight_arrival])
+        safe_ids = np.where(tw_valid, tw_ids, 0)
+        start_time = customer_arrays['start_time'][safe_ids]
+        end_time = customer_arrays['end_time'][safe_ids]
+        with np.errstate(invalid='ignore'):
+            early_deviation = start_time - arrival
+            late_deviation = arrival - end_time
+            early_mask = tw_valid & (arrival < start_time) & (early_deviation > self.violation_tolerance)
+            late_mask = tw_valid & ~(arrival < start_time) & (arrival > end_time)
+
+        return {
+            'truck_id': truck_id,
+            'truck_load': {
+                'customer_id': truck_ids,
+                'position': np.arange(1, len(truck_ids) + 1),
+                'load': truck_load,
+                'demand': truck_demand,
+                'mask': truck_mask,
+                'excess': truck_load - dyn_opt.truck_max_capacity
+            },
+            'drone_launch': {
+                'load': launch_load,
+                'mask': launch_load > dyn_opt.drone_max_capacity,
+                'excess': launch_load - dyn_opt.drone_max_capacity
+            },
+            'drone_flight': {
+                'customer_id': flight_ids,
+                'trip_index': flight_trip,
+                'position': flight_position,
+                'load': flight_load,
+                'mask': flight_mask,
+                'excess': flight_load - dyn_opt.drone_max_capacity
+            },
+            'drone_energy': {
+                'energy': energy,
+                'mask': energy > dyn_opt.drone_max_battery,
+                'excess': energy - dyn_opt.drone_max_battery
+            },
+            'time_window': {
+                'customer_id': tw_ids,
+                'is_drone': is_drone,
+                'trip_index': np.concatenate([np.full(len(truck_ids), -1), flight_trip]).astype(int),
+                'early_mask': early_mask,
+                'late_mask': late_mask,
+                'mask': early_mask | late_mask,
+                'deviation': np.where(early_mask, early_deviation, late_deviation)
+            },
+            'segments': {
+                'truck_current_load': truck.current_load,
+                'truck': truck_segment,
+                'trips': trip_segments
+            }
+        }
 
-        return violations
+    @staticmethod
+    def _common_prefix_length(previous_ids: np.ndarray, current_ids: np.ndarray) -> int:
+        """两条路径（客户ID数组）的公共前缀长度"""
+        length = min(len(previous_ids), len(current_ids))
+        mismatch = np.flatnonzero(previous_ids[:length] != current_ids[:length])
+        return int(mismatch[0]) if len(mismatch) else length
+
+    def _customer_segment(self, customer_ids: np.ndarray, is_drone: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """路径区段中各客户的(有效标记, 需求, 记录的到达时间)"""
+        customers = self.dyn_opt.customers
+        valid = (customer_ids >= 1) & (customer_ids <= len(customers))
+        demand = np.where(valid, self.dyn_opt.get_customer_arrays()['demand'][np.where(valid, customer_ids, 0)], 0)
+        arrival = np.array([self._recorded_arrival(customers[c - 1], is_drone) if is_valid else np.nan
+                            for c, is_valid in zip(customer_ids, valid)], dtype=float)
+        return valid, demand, arrival
+
+    def _truck_segment_arrays(self, truck_ids: np.ndarray, start: int, previous: Optional[Dict],
+                              current_load: float) -> Dict:
+        """
+        卡车路径区段：从当前载重出发依次送货/取货后的载重
+        只计算start之后的部分，之前的部分取自上一次检查结果
+        """
+        valid, demand, arrival = self._customer_segment(truck_ids[start:], False)
+        base_load = previous['load'][start - 1] if start > 0 else current_load
+        load = base_load - np.cumsum(demand)
+        if start > 0:
+            valid = np.concatenate([previous['valid'][:start], valid])
+            demand = np.concatenate([previous['demand'][:start], demand])
+            arrival = np.concatenate([previous['arrival'][:start], arrival])
+            load = np.concatenate([previous['load'][:start], load])
+        return {'customer_id': truck_ids, 'valid': valid, 'demand': demand, 'arrival': arrival, 'load': load}
+
+    def _trip_segment_arrays(self, path_ids: np.ndarray) -> Dict:
+        """
+        无人机任务区段：起飞时携带全部送货包裹，按计划送货/取货（服务失败不改变载重）后的飞行载重
+        """
+        customers = self.dyn_opt.customers
+        valid, demand, arrival = self._customer_segment(path_ids, True)
+        failed = np.array([customers[c - 1].success is False if is_valid else False
+                           for c, is_valid in zip(path_ids, valid)], dtype=bool)
+        load = np.maximum(demand, 0).sum() + np.cumsum(np.where(failed, 0, -demand))
+        return {'customer_id': path_ids, 'valid': valid, 'demand': demand, 'arrival': arrival, 'load': load}
+
+    @staticmethod
+    def _recorded_arrival(customer, is_drone: bool) -> float:
+        """客户记录的卡车/无人机到达时间（未记录时为nan）"""
+        arrival = getattr(customer, 'arrive_drone' if is_drone else 'arrive_truck', customer.start_time)
+        return np.nan if arrival is None else arrival
+
+    @staticmethod
+    def _count_violations(constraint_arrays: Dict) -> Dict:
+        """各修复类型的违反数量（与违反明细条数一致）"""
+        return {
+            'truck_load': int(np.count_nonzero(constraint_arrays['truck_load']['mask'])),
+            'drone_load': int(np.count_nonzero(constraint_arrays['drone_launch']['mask']) +
+                              np.count_nonzero(constraint_arrays['drone_flight']['mask'])),
+            'drone_energy': int(np.count_nonzero(constraint_arrays['drone_energy']['mask'])),
+            'time_window': int(np.count_nonzero(constraint_arrays['time_window']['mask']))
+        }
 
-    def _check_drone_load_violations_detailed(self, truck_id: int) -> List[Dict]:
-        """ 详细的无人机载重检查"""
+    def _violation_list(self, constraint_arrays: Dict, violation_type: str) -> List[Dict]:
+        """ 把违反掩码展开为修复算子使用的违反明细"""
         violations = []
-        try:
-            for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
-                # 检查总载重
-                total_load = trip.get('current_load', 0)
-                if total_load > self.dyn_opt.drone_max_capacity:
+        if violation_type == 'truck_load':
+            arrays = constraint_arrays['truck_load']
+            for i in np.flatnonzero(arrays['mask']):
+                projected_load = arrays['load'][i]
+                violations.append({
+                    'customer_id': int(arrays['customer_id'][i]),
+                    'position': int(arrays['position'][i]),
+                    'current_load': projected_load + arrays['demand'][i],
+                    'projected_load': projected_load,
+                    'excess': arrays['excess'][i]
+                })
+        elif violation_type == 'drone_load':
+            launch = constraint_arrays['drone_launch']
+            flight = constraint_arrays['drone_flight']
+            flight_indices = np.flatnonzero(flight['mask'])
+            for trip_idx in range(len(launch['mask'])):
+                if launch['mask'][trip_idx]:
                     violations.append({
                         'trip_index': trip_idx,
                         'violation_type': 'launch_overload',
-                        'current_load': total_load,
-                        'excess': total_load - self.dyn_opt.drone_max_capacity
+                        'current_load': launch['load'][trip_idx],
+                        'excess': launch['excess'][trip_idx]
                     })
+                for i in flight_indices[flight['trip_index'][flight_indices] == trip_idx]:
+                    violations.append({
+                        'trip_index': trip_idx,
+                        'violation_type': 'flight_overload',
+                        'customer_id': int(flight['customer_id'][i]),
+                        'position': int(flight['position'][i]),
+                        'load_at_violation': flight['load'][i],
+                        'excess': flight['excess'][i]
+                    })
+        elif violation_type == 'drone_energy':
+            arrays = constraint_arrays['drone_energy']
+            for trip_idx in np.flatnonzero(arrays['mask']):
+                violations.append({
+                    'trip_index': int(trip_idx),
+                    'total_energy': arrays['energy'][trip_idx],
+                    'excess_energy': arrays['excess'][trip_idx],
+                    'path': self.dyn_opt.DRONE_Routes[constraint_arrays['truck_id']].route[trip_idx]['path']
+                })
+        elif violation_type == 'time_window':
+            arrays = constraint_arrays['time_window']
+            for i in np.flatnonzero(arrays['mask']):
+                violation = {
+                    'customer_id': int(arrays['customer_id'][i]),
+                    'vehicle_type': 'drone' if arrays['is_drone'][i] else 'truck',
+                    'violation_type': 'early' if arrays['early_mask'][i] else 'late',
+                    'deviation': arrays['deviation'][i]
+                }
+                if arrays['is_drone'][i]:
+                    violation['trip_index'] = int(arrays['trip_index'][i])
+                violations.append(violation)
+        return violations
 
-                # 检查飞行过程载重变化
-                flight_violations = self._check_flight_load_progression(trip, trip_idx)
-                violations.extend(flight_violations)
-
+    def _comprehensive_violation_check(self, truck_id: int) -> Dict:
+        """ 全面的违反检查 - 一次性检查所有类型"""
+        violations = {}
+        try:
+            constraint_arrays = self.check_constraint_arrays(truck_id)
+            for violation_type, count in self._count_violations(constraint_arrays).items():
+                if count:
+                    violations[violation_type] = self._violation_list(constraint_arrays, violation_type)
         except Exception as e:
             if self.debug_mode:
-                print(f"     无人机载重检查出错: {e}")
-
+                print(f"      违反检查出错: {e}")
         return violations
 
-    def _check_flight_load_progression(self, trip: Dict, trip_idx: int) -> List[Dict]:
-        """ 检查飞行过程中的载重变化"""
-        violations = []
+    def _check_violations_of_type(self, truck_id: int, violation_type: str) -> List[Dict]:
         try:
-            path = trip['path']
-            current_load = trip.get('initial_load', 0)
-
-            for i, customer_id in enumerate(path[1:-1], 1):
-                if customer_id <= len(self.dyn_opt.customers):
-                    customer = self.dyn_opt.customers[customer_id - 1]
-
-                    if customer.demand > 0:
-                        current_load -= customer.demand
-                    else:
-                        current_load += abs(customer.demand)
-                        if current_load > self.dyn_opt.drone_max_capacity:
-                            violations.append({
-                                'trip_index': trip_idx,
-                                'violation_type': 'flight_overload',
-                                'customer_id': customer_id,
-                                'position': i,
-                                'load_at_violation': current_load,
-                                'excess': current_load - self.dyn_opt.drone_max_capacity
-                            })
-
+            return self._violation_list(self.check_constraint_arrays(truck_id), violation_type)
         except Exception as e:
             if self.debug_mode:
-                print(f"     飞行载重检查出错: {e}")
+                print(f"     {violation_type}检查出错: {e}")
+            return []
 
-        return violations
+    def _check_truck_load_violations_detailed(self, truck_id: int) -> List[Dict]:
+        """ 详细的卡车载重检查"""
+        return self._check_violations_of_type(truck_id, 'truck_load')
+
+    def _check_drone_load_violations_detailed(self, truck_id: int) -> List[Dict]:
+        """ 详细的无人机载重检查（起飞载重与飞行过程载重）"""
+        return self._check_violations_of_type(truck_id, 'drone_load')
 
     def _check_drone_energy_violations_detailed(self, truck_id: int) -> List[Dict]:
         """ 详细的能耗检查"""
-        violations = []
-        try:
-            for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
-                total_energy = trip.get('energy', 0)
-                if total_energy > self.dyn_opt.drone_max_battery:
-                    violations.append({
-                        'trip_index': trip_idx,
-                        'total_energy': total_energy,
-                        'excess_energy': total_energy - self.dyn_opt.drone_max_battery,
-                        'path': trip['path']
-                    })
-
-        except Exception as e:
-            if self.debug_mode:
-                print(f"     无人机能耗检查出错: {e}")
-
-        return violations
+        return self._check_violations_of_type(truck_id, 'drone_energy')
 
     def _check_time_window_violations_detailed(self, truck_id: int) -> List[Dict]:
         """ 详细的时间窗口检查 - 只检查显著违反"""
-        violations = []
-        try:
-            # 检查卡车路径时间窗口
-            for customer_id in self.dyn_opt.TRUCK_Routes[truck_id].Troute[1:-1]:
-                if customer_id <= len(self.dyn_opt.customers):
-                    customer = self.dyn_opt.customers[customer_id - 1]
-                    arrival_time = getattr(customer, 'arrive_truck', customer.start_time)
-
-                    # 只记录显著的早到（超过容忍度）
-                    if arrival_time < customer.start_time:
-                        deviation = customer.start_time - arrival_time
-                        if deviation > self.violation_tolerance:
-                            violations.append({
-                                'customer_id': customer_id,
-                                'vehicle_type': 'truck',
-                                'violation_type': 'early',
-                                'deviation': deviation
-                            })
-                    # 晚到始终记录
-                    elif arrival_time > customer.end_time:
-                        deviation = arrival_time - customer.end_time
-                        violations.append({
-                            'customer_id': customer_id,
-                            'vehicle_type': 'truck',
-                            'violation_type': 'late',
-                            'deviation': deviation
-                        })
-
-            # 检查无人机路径时间窗口
-            for trip_idx, trip in enumerate(self.dyn_opt.DRONE_Routes[truck_id].route):
-                for customer_id in trip['path'][1:-1]:
-                    if customer_id <= len(self.dyn_opt.customers):
-                        customer = self.dyn_opt.customers[customer_id - 1]
-                        arrival_time = getattr(customer, 'arrive_drone', customer.start_time)
-
-                        if arrival_time < customer.start_time:
-                            deviation = customer.start_time - arrival_time
-                            if deviation > self.violation_tolerance:
-                                violations.append({
-                                    'customer_id': customer_id,
-                                    'vehicle_type': 'drone',
-                                    'trip_index': trip_idx,
-                                    'violation_type': 'early',
-                                    'deviation': deviation
-                                })
-                        elif arrival_time > customer.end_time:
-                            deviation = arrival_time - customer.end_time
-                            violations.append({
-                                'customer_id': customer_id,
-                                'vehicle_type': 'drone',
-                                'trip_index': trip_idx,
-                                'violation_type': 'late',
-                                'deviation': deviation
-                            })
-
-        except Exception as e:
-            if self.debug_mode:
-                print(f"     时间窗口检查出错: {e}")
-
-        return violations
+        return self._check_violations_of_type(truck_id, 'time_window')
 
     def _repair_violation_by_type(self, truck_id: int, violation_type: str, violations: List[Dict]) -> bool:
         """ 根据违反类型执行对应的修复"""
@@ -1682,6 +2229,9 @@ class FeasibilityRepairOperators:
             if self.debug_mode:
                 print(f"     ❌ 修复{violation_type}时出错: {e}")
             return False
+        finally:
+            # 修复过程会移动客户，同步节点索引
+            self.dyn_opt._notify_route_mutation(truck_id)
 
     def _repair_truck_load_violations(self, truck_id: int, violations: List[Dict]) -> bool:
         """ 修复卡车载重违反"""
@@ -1986,7 +2536,7 @@ class FeasibilityRepairOperators:
 
             # 逆序删除
             for trip_idx in reversed(trips_to_remove):
-                removed_trip = self.dyn_opt.DRONE_Routes[truck_id].route.pop(trip_idx)
+                removed_trip = self.dyn_opt.DRONE_Routes[truck_id].remove_trip(trip_idx)
                 customers_to_reassign = removed_trip['path'][1:-1]
 
                 # 重新分配到卡车
@@ -2002,6 +2552,7 @@ class FeasibilityRepairOperators:
 
                 if self.debug_mode:
                     print(f"     移除无人机任务{trip_idx}，重新分配{len(customers_to_reassign)}个客户")
+            self.dyn_opt._notify_route_mutation(truck_id)
 
             # 2. 重新计算所有状态
             self._recalculate_all_states(truck_id)
@@ -2116,28 +2667,28 @@ class FeasibilityRepairOperators:
         """保持原有接口兼容性"""
         violations = self._check_drone_load_violations_detailed(truck_id)
         if violations:
-            return self._repair_drone_load_violations(truck_id, violations)
+            return self._repair_violation_by_type(truck_id, 'drone_load', violations)
         return True
 
     def drone_energy_repair_operator(self, truck_id: int) -> bool:
         """保持原有接口兼容性"""
         violations = self._check_drone_energy_violations_detailed(truck_id)
         if violations:
-            return self._repair_drone_energy_violations(truck_id, violations)
+            return self._repair_violation_by_type(truck_id, 'drone_energy', violations)
         return True
 
     def truck_load_repair_operator(self, truck_id: int) -> bool:
         """保持原有接口兼容性"""
         violations = self._check_truck_load_violations_detailed(truck_id)
         if violations:
-            return self._repair_truck_load_violations(truck_id, violations)
+            return self._repair_violation_by_type(truck_id, 'truck_load', violations)
         return True
 
     def time_window_repair_operator(self, truck_id: int) -> bool:
         """保持原有接口兼容性"""
         violations = self._check_time_window_violations_detailed(truck_id)
         if violations:
-            return self._repair_time_window_violations(truck_id, violations)
+            return self._repair_violation_by_type(truck_id, 'time_window', violations)
         return True
 
     def print_repair_statistics(self):
@@ -2164,8 +2715,36 @@ class FeasibilityRepairOperators:
         overall_success_rate = (total_success / total_calls * 100) if total_calls > 0 else 0
         print("-" * 50)
         print(f"总体成功率: {total_success}/{total_calls} ({overall_success_rate:.1f}%)")
+        positions = self.incremental_check_stats['positions']
+        rechecked = self.incremental_check_stats['rechecked']
+        recheck_rate = (rechecked / positions * 100) if positions > 0 else 0
+        print(f"约束检查: {self.incremental_check_stats['checks']}次, "
+              f"重新检查{rechecked}/{positions}个位置 ({recheck_rate:.1f}%)")
         print("=" * 50)
 
+# ==================== 时间矩阵写时复制视图 ====================
+class VisitTimeOverlay:
+    """
+    Vist_T的写时复制视图：增量评估时把模拟出的时间写在这里，原时间矩阵保持不变
+    """
+    def __init__(self, visit_times):
+        self.visit_times = visit_times
+        self.rows = {}
+
+    def __getitem__(self, index):
+        index %= len(self.visit_times)  # 与numpy一致地处理负下标（仓库节点为-1）
+        row = self.rows.get(index)
+        if row is None:
+            row = list(self.visit_times[index])
+            self.rows[index] = row
+        return row
+
+    def is_changed(self, index) -> bool:
+        """该行模拟时间是否与原时间矩阵不同"""
+        index %= len(self.visit_times)
+        row = self.rows.get(index)
+        return row is not None and row != list(self.visit_times[index])
+
 class Dynamic_Optimization:
     def __init__(self, truck_routes, drone_routes, clusters, customers, min_delete, max_delete, truck_max_capacity,
                  truck_speed, drone_speed, drone_weight, drone_max_capacity, drone_max_battery, service_time,
@@ -2202,6 +2781,7 @@ class Dynamic_Optimization:
         self.repair_ops = RepairOperators(self)
         # 初始化摧毁算子
         self.destroy_ops = DestroyOperators(self)
+        self.operator_weights_file = None  # 算子权重持久化文件（JSON），设置后每次动态规划开始时载入、结束时保存
         # 可行性修复算子
         try:
             self.feasibility_repair_ops = FeasibilityRepairOperators(self)
@@ -2231,6 +2811,8 @@ class Dynamic_Optimization:
         self.pheromone_max = 10.0  # 最大信息素值
         self.pheromone_initial = 1.0  # 初始信息素值
         self._pheromone_update_counter = 0  # 信息素更新计数器
+        self._pheromone_candidates = {}  # {(车辆类型, k): 各节点按综合评分降序的候选后继表}，信息素更新/挥发时重算
+        self._pheromone_candidate_sets = {}  # {(车辆类型, k): 各节点的候选后继集合}
 
         # 初始化信息素矩阵
         self.initialize_pheromone_matrix()
@@ -2239,12 +2821,45 @@ class Dynamic_Optimization:
         self.vehicle_customer_assignment = {}  # {truck_id: set(customer_ids)}
         self.customer_to_vehicle = {}  # {customer_id: truck_id}
         self.vehicle_initial_packages = {}  # {truck_id: {'delivery': set(), 'pickup': set()}}
+        self.node_index = {}  # {customer_id: 位置索引条目}，由路径插入/删除原语维护
+        self._node_index_members = {}  # {truck_id: set(customer_ids)}
+        self.debug_node_index = False  # 调试模式：每次路径变动后与从零重建的索引对比，索引过期时抛出异常
+        self.node_index_stats = {'stale_lookups': 0}  # 查询时发现的过期索引条目（路径变动未通知）
+        self.dirty_vehicles = set()  # 自上次重算时间以来路径/载重发生变化的车辆对
+        self._time_slack_cache = {}  # {truck_id: 前向时间松弛量}，Vist_T或路径变化后失效
+        self._load_profile_cache = {}  # {truck_id: 前缀载重剖面}，路径或服务状态变化后失效
+        self.failure_time_delay = service_time  # 服务失败造成的额外耗时（尝试联系客户等），用于连锁效应分析
+        self._customer_arrays = None  # 客户静态属性数组（需求、时间窗），供向量化约束检查使用
+        self._shaw_relatedness = None  # Shaw相关度矩阵及各客户的相关客户排序表
+        self._truck_distance_array = None  # ALLdistanceTmatrix的numpy数组
+        self._nearest_neighbours = {}  # {(车辆类型, k): 各客户按距离升序的最近邻客户表}
+        self._granular_neighbour_sets = {}  # {(车辆类型, k): 各客户的粒度邻域节点集合}
+        self._drone_distance_array = None  # ALLdistanceDmatrix的numpy数组
+        self.neighbour_list_size = 20  # 最近邻表长度k
+        self.shaw_weights = (0.6, 0.4)  # Shaw相关度中距离、时间窗开始时间的权重
+        self._vehicle_cost_cache = {}  # {truck_id: 车辆对成本}，路径/时间/载重变化后失效
+        self._total_cost_cache = None
+        self.debug_cost_cache = False  # 开启后每次cost()都与完整重算结果对比
         print("    约束管理属性初始化完成")
 
+        # ==================== 无人机能耗缓存 ====================
+        self.energy_cache_enabled = True  # 关闭后calculate_energy每次完整计算（用于对比测试）
+        self.energy_cache_size = 4096  # LRU缓存最大条目数
+        self.energy_cache_epsilon = 1e-6  # 起飞/回收时间的取整精度
+        self._energy_cache = OrderedDict()  # {行程签名: 能耗}
+        self.energy_cache_stats = {'hits': 0, 'misses': 0}
+
+        # ==================== 解指纹（跳过重复邻域结果） ====================
+        self._zobrist_rng = random.Random(20240601)  # 独立随机源，不影响算法的随机序列
+        self._zobrist_keys = {}  # {(边类型, 起点, 终点): 64位随机键}
+        self.evaluation_table = {}  # 本次重规划内已评估的状态 {(truck_id, 指纹): 是否可行}
+        self.fingerprint_stats = {}  # {算子: {'lookups': 查询次数, 'hits': 命中次数}}
+
         # ==================== 局部搜索 ====================
         self.theta = 0.08  # 质量阈值，决定何时启动局部搜索
         self.local_search_max_no_improve = 100  # 局部搜索停止条件
         self.enable_local_search = True  # 是否启用局部搜索
+        self.local_search_candidate_k = None  # 局部搜索只生成形成信息素候选边的移动（None表示不限制）
         # 局部搜索统计
         self.local_search_stats = {
             'calls': 0,
@@ -2267,7 +2882,8 @@ class Dynamic_Optimization:
         self.Ddis=None                                              #无 人 机 —— 客户距离矩阵
         self.Vist_T = None                                          #时间矩阵 ————记录车辆在客户处到达、离开的时间      包含所有节点的服务时间 包含起点 终点
         self.Distance()                                             #初始化距离矩阵
-        self.T = np.empty((self.cnum, 2), dtype='object')     #时间矩阵 ————记录车辆到达客户的时间，主要用以时间顺序排列 用 object 类型初始化，避免重复赋值        仅包含客户的服务时间
+        self.event_queue = []                                       #服务事件优先队列 ———— [(服务开始时间, 客户序号, 客户ID, 版本)]，按时间顺序弹出待服务客户
+        self._event_version = {}                                    #客户ID -> 当前有效事件版本，重新调度后旧事件惰性失效
         self.Initial_vehicle_information()
         self.Initial_visit_T()
         self.clean_route_data_types()
@@ -2275,6 +2891,7 @@ class Dynamic_Optimization:
         self._initialize_customer_success_status()
 
         self._initialize_vehicle_customer_assignment()
+        self.rebuild_node_index()
         ###### 构建初始解 ######
         # 逐个添加卡车
         for truck in self.TRUCK_Routes:
@@ -2439,8 +3056,377 @@ class Dynamic_Optimization:
         """
         获取客户所属的车辆对ID
         """
+        entry = self.node_index.get(customer_id)
+        if entry is not None:
+            return entry['vehicle']
         return self.customer_to_vehicle.get(customer_id, -1)
 
+    # ==================== 节点位置索引 ====================
+    def _build_vehicle_node_index(self, truck_id: int) -> Dict:
+        """
+        从路径从零构建指定车辆对的节点位置索引
+        Returns:
+            Dict: {customer_id: {'vehicle', 'truck_pos', 'trip_idx', 'path_pos', 'launch_trips', 'retrieval_trips'}}
+            truck_pos: 在卡车路径中的位置；trip_idx/path_pos: 所在无人机trip及在path中的位置（仅无人机服务客户）
+            launch_trips/retrieval_trips: 以该节点为起飞/回收节点的trip下标（仓库节点不记录）
+        """
+        vehicle_index = {}
+
+        def _entry(customer_id):
+            if customer_id not in vehicle_index:
+                vehicle_index[customer_id] = {
+                    'vehicle': truck_id,
+                    'truck_pos': None,
+                    'trip_idx': None,
+                    'path_pos': None,
+                    'launch_trips': [],
+                    'retrieval_trips': []
+                }
+            return vehicle_index[customer_id]
+
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        for pos in range(1, len(truck_route) - 1):  # 排除起终点
+            _entry(truck_route[pos])['truck_pos'] = pos
+        for trip_idx, trip in enumerate(self.DRONE_Routes[truck_id].route):
+            path = trip['path']
+            for pos in range(1, len(path) - 1):  # 排除起终点
+                entry = _entry(path[pos])
+                if entry['trip_idx'] is None:
+                    entry['trip_idx'] = trip_idx
+                    entry['path_pos'] = pos
+            if trip['launch_node'] != 0:
+                _entry(trip['launch_node'])['launch_trips'].append(trip_idx)
+            if trip['retrieval_node'] != 0:
+                _entry(trip['retrieval_node'])['retrieval_trips'].append(trip_idx)
+        return vehicle_index
+
+    def _refresh_node_index(self, truck_id: int):
+        """刷新指定车辆对在全局节点索引中的条目"""
+        for customer_id in self._node_index_members.get(truck_id, ()):
+            entry = self.node_index.get(customer_id)
+            if entry is not None and entry['vehicle'] == truck_id:
+                del self.node_index[customer_id]
+        vehicle_index = self._build_vehicle_node_index(truck_id)
+        self.node_index.update(vehicle_index)
+        self._node_index_members[truck_id] = set(vehicle_index)
+
+    def rebuild_node_index(self):
+        """从零重建全局节点索引"""
+        self.node_index = {}
+        self._node_index_members = {}
+        for truck_id in range(len(self.TRUCK_Routes)):
+            self._refresh_node_index(truck_id)
+
+    def _notify_route_mutation(self, truck_id: int):
+        """
+        路径整体变动通知（回滚、整条路径替换、批量插入/删除、可行性修复）：从零刷新该车辆对的节点索引
+        单个客户的插入/删除及卡车路径区间重排使用下面的原地更新通知
+        """
+        self._refresh_node_index(truck_id)
+        self._invalidate_route_state(truck_id)
+
+    def _invalidate_route_state(self, truck_id: int):
+        """路径变动后使依赖路径的缓存失效（节点索引已由调用方更新）"""
+        self.dirty_vehicles.add(truck_id)
+        self._time_slack_cache.pop(truck_id, None)
+        self.invalidate_load_profile(truck_id)
+        self.invalidate_vehicle_cost(truck_id)
+        if self.debug_node_index and not self.validate_node_index():
+            print(f" 车辆对{truck_id}路径变动后节点索引校验失败")
+
+    def _index_entry(self, truck_id: int, customer_id: int) -> Dict:
+        """取（不存在时创建）客户在指定车辆对中的索引条目"""
+        entry = self.node_index.get(customer_id)
+        if entry is None or entry['vehicle'] != truck_id:
+            entry = {'vehicle': truck_id, 'truck_pos': None, 'trip_idx': None, 'path_pos': None,
+                     'launch_trips': [], 'retrieval_trips': []}
+            self.node_index[customer_id] = entry
+            self._node_index_members.setdefault(truck_id, set()).add(customer_id)
+        return entry
+
+    def _drop_index_entry_if_unused(self, customer_id: int, entry: Dict):
+        """客户已不在卡车路径、无人机路径中且不是起飞/回收节点时删除其索引条目"""
+        if (entry['truck_pos'] is None and entry['trip_idx'] is None and
+                not entry['launch_trips'] and not entry['retrieval_trips']):
+            del self.node_index[customer_id]
+            self._node_index_members.get(entry['vehicle'], set()).discard(customer_id)
+
+    def _reindex_truck_positions(self, truck_id: int, start: int, end: int = None):
+        """把卡车路径[start, end)位置上客户的truck_pos更新为当前下标（end为None表示到路径末尾）"""
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        end = len(truck_route) - 1 if end is None else min(end, len(truck_route) - 1)
+        for pos in range(max(start, 1), end):
+            self._index_entry(truck_id, truck_route[pos])['truck_pos'] = pos
+
+    def _reindex_path_positions(self, truck_id: int, trip_idx: int, start: int):
+        """把无人机行程trip_idx中start之后客户的path_pos更新为当前下标"""
+        path = self.DRONE_Routes[truck_id].route[trip_idx]['path']
+        for pos in range(max(start, 1), len(path) - 1):
+            entry = self._index_entry(truck_id, path[pos])
+            entry['trip_idx'] = trip_idx
+            entry['path_pos'] = pos
+
+    def _notify_truck_insert(self, truck_id: int, position: int):
+        """卡车路径position处插入一个客户后原地更新索引：其后客户的位置后移一位"""
+        self._reindex_truck_positions(truck_id, position)
+        self._invalidate_route_state(truck_id)
+
+    def _notify_truck_remove(self, truck_id: int, position: int, customer_id: int):
+        """卡车路径position处的客户删除后原地更新索引：其后客户的位置前移一位"""
+        entry = self.node_index.get(customer_id)
+        if entry is not None and entry['vehicle'] == truck_id:
+            entry['truck_pos'] = None
+            self._drop_index_entry_if_unused(customer_id, entry)
+        self._reindex_truck_positions(truck_id, position)
+        self._invalidate_route_state(truck_id)
+
+    def _notify_truck_reorder(self, truck_id: int, start: int, end: int):
+        """卡车路径[start, end]区间内客户重排（移动、交换、2-opt逆转）后原地更新索引"""
+        self._reindex_truck_positions(truck_id, start, end + 1)
+        self._invalidate_route_state(truck_id)
+
+    def _notify_drone_insert(self, truck_id: int, trip_idx: int, position: int):
+        """无人机行程trip_idx的path[position]处插入一个客户后原地更新索引"""
+        self._reindex_path_positions(truck_id, trip_idx, position)
+        self._invalidate_route_state(truck_id)
+
+    def _notify_drone_remove(self, truck_id: int, trip_idx: int, position: int, customer_id: int):
+        """无人机行程trip_idx的path[position]处客户删除后原地更新索引"""
+        entry = self.node_index.get(customer_id)
+        if entry is not None and entry['vehicle'] == truck_id and entry['trip_idx'] == trip_idx:
+            entry['trip_idx'] = entry['path_pos'] = None
+            self._drop_index_entry_if_unused(customer_id, entry)
+        self._reindex_path_positions(truck_id, trip_idx, position)
+        self._invalidate_route_state(truck_id)
+
+    def _notify_trip_added(self, truck_id: int):
+        """在行程列表末尾新增无人机行程后原地更新索引"""
+        trips = self.DRONE_Routes[truck_id].route
+        trip_idx = len(trips) - 1
+        trip = trips[trip_idx]
+        self._reindex_path_positions(truck_id, trip_idx, 1)
+        if trip['launch_node'] != 0:
+            self._index_entry(truck_id, trip['launch_node'])['launch_trips'].append(trip_idx)
+        if trip['retrieval_node'] != 0:
+            self._index_entry(truck_id, trip['retrieval_node'])['retrieval_trips'].append(trip_idx)
+        self._invalidate_route_state(truck_id)
+
+    def _notify_trip_removed(self, truck_id: int, trip_idx: int, trip: Dict):
+        """删除第trip_idx个无人机行程（trip为被删除的行程）后原地更新索引：其后行程的下标前移一位"""
+        trips = self.DRONE_Routes[truck_id].route
+        for customer_id in trip['path'][1:-1]:
+            entry = self.node_index.get(customer_id)
+            if entry is not None and entry['vehicle'] == truck_id and entry['trip_idx'] == trip_idx:
+                entry['trip_idx'] = entry['path_pos'] = None
+                self._drop_index_entry_if_unused(customer_id, entry)
+        endpoint_nodes = {trip['launch_node'], trip['retrieval_node']}
+        for later_idx in range(trip_idx, len(trips)):
+            later_trip = trips[later_idx]
+            for customer_id in later_trip['path'][1:-1]:
+                entry = self.node_index.get(customer_id)
+                if entry is not None and entry['vehicle'] == truck_id and entry['trip_idx'] == later_idx + 1:
+                    entry['trip_idx'] = later_idx
+            endpoint_nodes.update((later_trip['launch_node'], later_trip['retrieval_node']))
+        endpoint_nodes.discard(0)
+        for node in endpoint_nodes:
+            entry = self.node_index.get(node)
+            if entry is None or entry['vehicle'] != truck_id:
+                continue
+            entry['launch_trips'] = [t - (t > trip_idx) for t in entry['launch_trips'] if t != trip_idx]
+            entry['retrieval_trips'] = [t - (t > trip_idx) for t in entry['retrieval_trips'] if t != trip_idx]
+            self._drop_index_entry_if_unused(node, entry)
+        self._invalidate_route_state(truck_id)
+
+    def _is_node_index_entry_valid(self, customer_id: int, entry: Dict) -> bool:
+        """检查索引条目与当前路径是否一致（防止路径被整体替换后索引过期）"""
+        truck_id = entry['vehicle']
+        if entry['truck_pos'] is not None:
+            truck_route = self.TRUCK_Routes[truck_id].Troute
+            if entry['truck_pos'] >= len(truck_route) or truck_route[entry['truck_pos']] != customer_id:
+                return False
+        drone_routes = self.DRONE_Routes[truck_id].route
+        if entry['trip_idx'] is not None:
+            if entry['trip_idx'] >= len(drone_routes):
+                return False
+            path = drone_routes[entry['trip_idx']]['path']
+            if entry['path_pos'] >= len(path) or path[entry['path_pos']] != customer_id:
+                return False
+        for trip_idx in entry['launch_trips']:
+            if trip_idx >= len(drone_routes) or drone_routes[trip_idx]['launch_node'] != customer_id:
+                return False
+        for trip_idx in entry['retrieval_trips']:
+            if trip_idx >= len(drone_routes) or drone_routes[trip_idx]['retrieval_node'] != customer_id:
+                return False
+        return True
+
+    def locate_customer(self, customer_id: int, truck_id: int = None) -> Optional[Dict]:
+        """
+        通过节点索引定位客户
+        Args:
+            customer_id: 客户ID
+            truck_id: 指定车辆对（None表示不限定）
+        Returns:
+            Dict: 索引条目；客户当前不在（指定车辆对的）路径中时返回None
+        索引中没有（指定车辆对的）条目时直接返回None，不扫描路径；
+        条目与路径不一致时打印警告并计入node_index_stats后刷新该车辆对，debug_node_index下直接抛出RuntimeError
+        """
+        entry = self.node_index.get(customer_id)
+        if entry is None or (truck_id is not None and entry['vehicle'] != truck_id):
+            return None
+        if self._is_node_index_entry_valid(customer_id, entry):
+            return entry
+        self._report_stale_node_index(customer_id, entry['vehicle'], entry)
+        self._refresh_node_index(entry['vehicle'])
+        entry = self.node_index.get(customer_id)
+        if entry is None or (truck_id is not None and entry['vehicle'] != truck_id):
+            return None
+        return entry
+
+    def _report_stale_node_index(self, customer_id: int, truck_id: int, entry: Optional[Dict]):
+        """
+        索引过期（某处修改路径后未调用_notify_route_mutation）：计数并打印；调试模式下直接抛出异常
+        """
+        self.node_index_stats['stale_lookups'] += 1
+        message = (f" ⚠️ 节点索引过期: 客户{customer_id}, 车辆对{truck_id}, 索引条目={entry}, "
+                   f"路径变动未调用_notify_route_mutation（累计{self.node_index_stats['stale_lookups']}次）")
+        if self.debug_node_index:
+            raise RuntimeError(message)
+        print(message)
+
+    def get_truck_position(self, truck_id: int, node: int) -> Optional[int]:
+        """
+        获取节点在卡车路径中的位置（仓库节点返回0，与list.index一致），不在路径中返回None
+        """
+        if node == 0:
+            return 0
+        entry = self.locate_customer(node, truck_id)
+        return entry['truck_pos'] if entry is not None else None
+
+    def validate_node_index(self) -> bool:
+        """
+        一致性检查：将维护的节点索引与从零重建的结果逐项对比
+        """
+        expected_index = {}
+        for truck_id in range(len(self.TRUCK_Routes)):
+            expected_index.update(self._build_vehicle_node_index(truck_id))
+        mismatches = [c for c in set(expected_index) | set(self.node_index)
+                      if expected_index.get(c) != self.node_index.get(c)]
+        if mismatches:
+            print(f" 节点索引不一致: {len(mismatches)}个节点")
+            for customer_id in mismatches[:10]:
+                print(f"   节点{customer_id}: 维护={self.node_index.get(customer_id)}, 重建={expected_index.get(customer_id)}")
+            return False
+        return True
+
+    # ==================== 车辆对检查点/回滚 ====================
+    CHECKPOINT_CUSTOMER_FIELDS = ('arrive_truck', 'departure_truck', 'arrive_drone', 'departure_drone',
+                                  'service_begin', 'wait', 'service_by', 'success', 'launch', 'retrieve')
+
+    @staticmethod
+    def _copy_state(state: Dict) -> Dict:
+        """浅复制状态字典，列表字段单独复制（路径、位置、service_by等）"""
+        return {name: list(value) if isinstance(value, list) else value for name, value in state.items()}
+
+    def checkpoint_vehicle(self, truck_id: int) -> Dict:
+        """
+        记录车辆对的可回滚状态：卡车路径与载重、无人机行程（路径/载重/电量）、
+        相关客户的Vist_T行与时间/服务状态。只复制该车辆对涉及的数据，代替深拷贝Truck/Drone对象
+        """
+        truck = self.TRUCK_Routes[truck_id]
+        drone = self.DRONE_Routes[truck_id]
+        customers = set(self.get_vehicle_customers(truck_id)) | set(truck.Troute)
+        for trip in drone.route:
+            customers.update(trip['path'])
+        customers.discard(0)
+        return {
+            'truck_id': truck_id,
+            'truck': truck,
+            'truck_state': self._copy_state(vars(truck)),
+            'drone': drone,
+            'trips': [(trip, self._copy_state(trip)) for trip in drone.route],
+            'visit_rows': {c: list(self.Vist_T[c - 1]) for c in customers},
+            'customer_state': {c: self._copy_state({name: getattr(self.customers[c - 1], name, None)
+                                                    for name in self.CHECKPOINT_CUSTOMER_FIELDS})
+                               for c in customers},
+            'assignment': set(self.get_vehicle_customers(truck_id))
+        }
+
+    def rollback_vehicle(self, checkpoint: Dict):
+        """
+        将车辆对恢复到检查点状态（同一检查点可多次回滚）
+        """
+        truck_id = checkpoint['truck_id']
+        truck = checkpoint['truck']
+        truck.__dict__.update(self._copy_state(checkpoint['truck_state']))
+        self.TRUCK_Routes[truck_id] = truck
+        # 行程字典原地还原，保持对象身份，再重建起飞/回收节点映射
+        for trip, trip_state in checkpoint['trips']:
+            trip.clear()
+            trip.update(self._copy_state(trip_state))
+        drone = checkpoint['drone']
+        drone.set_route([trip for trip, _ in checkpoint['trips']])
+        self.DRONE_Routes[truck_id] = drone
+        for customer_id, row in checkpoint['visit_rows'].items():
+            self.Vist_T[customer_id - 1, :] = row
+        for customer_id, customer_state in checkpoint['customer_state'].items():
+            self.customers[customer_id - 1].__dict__.update(self._copy_state(customer_state))
+        self.vehicle_customer_assignment[truck_id] = set(checkpoint['assignment'])
+        self._notify_route_mutation(truck_id)
+
+    # ==================== 解指纹 ====================
+    def _zobrist_key(self, kind, from_node, to_node) -> int:
+        """获取（按需生成）一条边的Zobrist随机键"""
+        key = (kind, from_node, to_node)
+        value = self._zobrist_keys.get(key)
+        if value is None:
+            value = self._zobrist_rng.getrandbits(64)
+            self._zobrist_keys[key] = value
+        return value
+
+    def fingerprint_vehicle(self, truck_id: int) -> int:
+        """
+        车辆对状态的Zobrist指纹：卡车路径边、无人机行程边以及路径规模的随机键异或
+        """
+        fingerprint = 0
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        for i in range(1, len(truck_route)):
+            fingerprint ^= self._zobrist_key('tk', truck_route[i - 1], truck_route[i])
+        trips = self.DRONE_Routes[truck_id].route
+        for trip in trips:
+            path = trip['path']
+            for i in range(1, len(path)):
+                fingerprint ^= self._zobrist_key('de', path[i - 1], path[i])
+        # 路径长度与行程数（避免重复边相互抵消造成误判）
+        fingerprint ^= self._zobrist_key('size', len(truck_route), len(trips))
+        return fingerprint
+
+    def reset_evaluation_table(self):
+        """开始新的重规划：清空指纹评估表"""
+        self.evaluation_table = {}
+
+    def _lookup_evaluation(self, operator_name: str, truck_id: int, fingerprint: int):
+        """查询指纹评估表并记录算子命中统计，命中返回是否可行，未命中返回None"""
+        stats = self.fingerprint_stats.setdefault(operator_name, {'lookups': 0, 'hits': 0})
+        stats['lookups'] += 1
+        result = self.evaluation_table.get((truck_id, fingerprint))
+        if result is not None:
+            stats['hits'] += 1
+        return result
+
+    def _record_evaluation(self, truck_id: int, fingerprint: int, feasible: bool):
+        """
+        记录已评估状态的可行性（指纹须取自该状态本身，局部搜索同时记录修复前后的指纹）
+        不记录成本：无人机能耗依赖Vist_T中的起飞时间，同一路径的成本会随时间重算变化，命中时按cost_single_vehicle取当前成本
+        """
+        self.evaluation_table[(truck_id, fingerprint)] = bool(feasible)
+
+    def print_fingerprint_stats(self):
+        """打印各算子的重复解命中率"""
+        for operator_name, stats in self.fingerprint_stats.items():
+            lookups = stats['lookups']
+            hit_rate = (stats['hits'] / lookups * 100) if lookups > 0 else 0
+            print(f"解指纹 {operator_name}: {stats['hits']}/{lookups}次重复 (命中率{hit_rate:.1f}%)")
+
     def update_route(self, vex, customer_num, service_by):
         """
         路径更新方法
@@ -2455,13 +3441,10 @@ class Dynamic_Optimization:
         # 记录更新前的成本
         old_cost = self.cost()
         # 保留现有的时间更新逻辑
-        launch_node = []
-        retrieval_node = []
-        if self.DRONE_Routes[truck_id].route:
-            launch_node = [trip['launch_node'] for trip in self.DRONE_Routes[truck_id].route]
-            retrieval_node = [trip['retrieval_node'] for trip in self.DRONE_Routes[truck_id].route]
+        launch_node = self.DRONE_Routes[truck_id].launch_map          # 起飞节点 -> 行程
+        retrieval_node = self.DRONE_Routes[truck_id].retrieval_map    # 回收节点 -> 行程
         if service_by[0] == "tk":
-            i_index = self.TRUCK_Routes[truck_id].Troute.index(customer_num)
+            i_index = self.locate_customer(customer_num, truck_id)['truck_pos']
             # 开始更新 Vist_T 时间
             self.Vist_T[customer_num - 1][2] = max(self.Vist_T[customer_num - 1][1],
                                                    self.customers[customer_num - 1].start_time)
@@ -2472,45 +3455,47 @@ class Dynamic_Optimization:
                 max_time = max(self.Vist_T[customer_num - 1][2], self.Vist_T[customer_num - 1][3])
                 self.Vist_T[customer_num - 1][2] = max_time
                 self.Vist_T[customer_num - 1][4] = self.Vist_T[customer_num - 1][3]
-                for trip in self.DRONE_Routes[truck_id].route:
-                    if trip['launch_node'] == customer_num:
-                        path = trip['path']
-                        for i in range(1, len(path)):
-                            prev_indices = path[i - 1] - 1
-                            current_indices = path[i] - 1
-                            distance = self.Ddis[prev_indices + 1][current_indices + 1]
-                            self.Vist_T[current_indices][3] = self.Vist_T[i - 1][4] + distance / self.drone_speed
-                            self.Vist_T[current_indices][4] = max(self.Vist_T[current_indices][3], self.customers[
-                                self.Vist_T[current_indices][0] - 1].start_time) + self.service_time
-                            if path[i] not in retrieval_node:
-                                self.Vist_T[current_indices][1] = 0
-                                self.Vist_T[current_indices][2] = 0
-            if customer_num not in launch_node and customer_num in retrieval_node:
-                max_time = max(self.Vist_T[customer_num - 1][2], self.Vist_T[customer_num - 1][3])
-                self.Vist_T[customer_num - 1][2] = max_time
-                self.Vist_T[customer_num - 1][4] = self.Vist_T[customer_num - 1][2]
-            self.Update_visit_T(truck_id, i_index + 1)
-        else:
-            self.Vist_T[customer_num - 1][4] = self.Vist_T[customer_num - 1][3]
-            for trip in self.DRONE_Routes[truck_id].route:
-                if customer_num in trip['path']:
+                for trip in launch_node[customer_num]:
                     path = trip['path']
-                    i_index = path.index(customer_num)
-                    for i in range(i_index + 1, len(path)):
+                    for i in range(1, len(path)):
                         prev_indices = path[i - 1] - 1
                         current_indices = path[i] - 1
                         distance = self.Ddis[prev_indices + 1][current_indices + 1]
-                        self.Vist_T[current_indices][3] = self.Vist_T[i - 1][4] + distance / self.drone_speed
+                        self.Vist_T[current_indices][3] = self.Vist_T[prev_indices][4] + distance / self.drone_speed
                         self.Vist_T[current_indices][4] = max(self.Vist_T[current_indices][3], self.customers[
                             self.Vist_T[current_indices][0] - 1].start_time) + self.service_time
                         if path[i] not in retrieval_node:
                             self.Vist_T[current_indices][1] = 0
                             self.Vist_T[current_indices][2] = 0
-                        else:
-                            self.Vist_T[current_indices][2] = max(self.Vist_T[current_indices][2],
-                                                                  self.Vist_T[current_indices][4])
-                    index = self.TRUCK_Routes[truck_id].Troute.index(path[len(path) - 1])
-                    self.Update_visit_T(truck_id, index + 1)
+            if customer_num not in launch_node and customer_num in retrieval_node:
+                max_time = max(self.Vist_T[customer_num - 1][2], self.Vist_T[customer_num - 1][3])
+                self.Vist_T[customer_num - 1][2] = max_time
+                self.Vist_T[customer_num - 1][4] = self.Vist_T[customer_num - 1][2]
+            self.Update_visit_T(truck_id, i_index + 1)
+        else:
+            self.Vist_T[customer_num - 1][4] = self.Vist_T[customer_num - 1][3]
+            entry = self.locate_customer(customer_num, truck_id)
+            if entry is not None and entry['trip_idx'] is not None:
+                trip = self.DRONE_Routes[truck_id].route[entry['trip_idx']]
+                path = trip['path']
+                i_index = entry['path_pos']
+                for i in range(i_index + 1, len(path)):
+                    prev_indices = path[i - 1] - 1
+                    current_indices = path[i] - 1
+                    distance = self.Ddis[prev_indices + 1][current_indices + 1]
+                    self.Vist_T[current_indices][3] = self.Vist_T[prev_indices][4] + distance / self.drone_speed
+                    self.Vist_T[current_indices][4] = max(self.Vist_T[current_indices][3], self.customers[
+                        self.Vist_T[current_indices][0] - 1].start_time) + self.service_time
+                    if path[i] not in retrieval_node:
+                        self.Vist_T[current_indices][1] = 0
+                        self.Vist_T[current_indices][2] = 0
+                    else:
+                        self.Vist_T[current_indices][2] = max(self.Vist_T[current_indices][2],
+                                                              self.Vist_T[current_indices][4])
+                index = self.get_truck_position(truck_id, path[len(path) - 1])
+                self.Update_visit_T(truck_id, index + 1)
+        self.invalidate_load_profile(truck_id)
+        self.invalidate_vehicle_cost(truck_id)
         print(" 删除客户前的路径状态:")
         print("   卡车路径：")
         print(f"     路径: {self.TRUCK_Routes[truck_id].Troute}")
@@ -2550,6 +3535,7 @@ class Dynamic_Optimization:
         替代原来的 ALNS + 可行性修复 模式
         """
         print(f"  执行约束感知重优化...")
+        self.reset_evaluation_table()
 
         try:
             # 1. 智能破坏：基于约束分析确定删除范围
@@ -2579,7 +3565,7 @@ class Dynamic_Optimization:
             new_cost = self.cost()
             if repair_success and new_cost < old_cost * (1 + self.theta):
                 print(f"    解质量良好，启动局部搜索...")
-                optimized_cost = self.local_search(truck_id, new_cost)
+                optimized_cost = self.local_search(truck_id, self.cost_single_vehicle(truck_id))
 
             final_cost = self.cost()
             total_improvement = old_cost - final_cost
@@ -2667,38 +3653,9 @@ class Dynamic_Optimization:
 
     def _simulate_insertion_safety(self, truck_id, customer_id, position):
         """
-        模拟插入的安全性检查
+        模拟插入的安全性检查（基于前缀载重剖面，O(1)）
         """
-        customer = self.customers[customer_id - 1]
-        truck = self.TRUCK_Routes[truck_id]
-
-        # 从当前载重开始模拟
-        simulated_load = truck.current_load
-        truck_route = truck.Troute
-
-        # 在插入位置处理新客户
-        if customer.demand < 0:  # 取货
-            simulated_load += abs(customer.demand)
-            if simulated_load > truck.max_capacity:
-                return False  # 立即超载
-        else:  # 送货
-            simulated_load -= customer.demand
-
-        # 检查对后续客户的影响
-        for i in range(position, len(truck_route) - 1):
-            future_customer_id = truck_route[i]
-            if future_customer_id <= len(self.customers):
-                future_customer = self.customers[future_customer_id - 1]
-
-                if future_customer.success is None:  # 未服务的客户
-                    if future_customer.demand < 0:  # 取货
-                        simulated_load += abs(future_customer.demand)
-                        if simulated_load > truck.max_capacity:
-                            return False  # 会导致后续超载
-                    else:  # 送货
-                        simulated_load -= future_customer.demand
-
-        return True  # 安全
+        return self.is_truck_insertion_load_feasible(truck_id, customer_id, position)
 
     def _lightweight_constraint_check(self, truck_id):
         """
@@ -2784,79 +3741,41 @@ class Dynamic_Optimization:
     def _check_truck_forward_looking_load(self, vehicle_id: int, failed_customer_id: int) -> List[Dict]:
         """
         检查卡车按原计划继续执行时的载重约束
+        基于前缀载重剖面：失败位置之后的最大载重不超限时直接返回
         """
         violations = []
         try:
             truck_route = self.TRUCK_Routes[vehicle_id].Troute
-            failed_customer = self.customers[failed_customer_id - 1]
 
             # 找到失败客户在路径中的位置
             if failed_customer_id not in truck_route:
                 return violations
 
             failed_position = truck_route.index(failed_customer_id)
+            if failed_position + 1 >= len(truck_route):
+                return violations
+            profile = self.get_load_profile(vehicle_id)
+            if profile['suffix_max'][failed_position + 1] <= self.truck_max_capacity:
+                return violations
 
-            # 计算失败客户之前的载重状态
-            current_load = self.TRUCK_Routes[vehicle_id].initial_load
-
-            # 模拟到失败客户之前的载重变化
-            for i in range(1, failed_position):
-                customer_id = truck_route[i]
-                if customer_id <= len(self.customers):
-                    customer = self.customers[customer_id - 1]
-                    if customer.success is True:
-                        current_load -= customer.demand
-                    elif customer.success is False:
-                        # 之前失败的客户：送货失败包裹仍在车上，取货失败没取到货
-                        if customer.demand > 0:  # 送货失败
-                            pass  # 载重不变
-                        else:  # 取货失败
-                            pass  # 载重不变
-                    else:
-                        # 未服务客户，假设按计划执行
-                        current_load -= customer.demand
-
-            # 处理当前失败客户对载重的影响
-            if failed_customer.demand > 0:
-                # 送货失败：包裹仍在车上，载重不减少
-                pass
-            else:
-                # 取货失败：没取到货，载重不增加
-                pass
-
-                # 检查后续客户按原计划执行时是否会违反约束
+            # 检查后续未服务的取货客户按原计划执行时是否会违反约束
             for i in range(failed_position + 1, len(truck_route) - 1):
                 customer_id = truck_route[i]
                 if customer_id <= len(self.customers):
                     customer = self.customers[customer_id - 1]
-
-                    if customer.success is True:
-                        # 已成功服务
-                        current_load -= customer.demand
-                    elif customer.success is False:
-                        # 已失败服务
-                        if customer.demand > 0:
-                            pass  # 送货失败，载重不变
-                        else:
-                            pass  # 取货失败，载重不变
-                    else:
-                        # 未服务客户，检查按计划执行是否违反约束
-                        if customer.demand < 0:  # 取货客户
-                            projected_load = current_load + abs(customer.demand)
-                            if projected_load > self.truck_max_capacity:
-                                violations.append({
-                                    'customer_id': customer_id,
-                                    'position': i,
-                                    'violation_type': 'future_pickup_overload',
-                                    'current_load': current_load,
-                                    'pickup_demand': abs(customer.demand),
-                                    'projected_load': projected_load,
-                                    'excess': projected_load - self.truck_max_capacity,
-                                    'caused_by_failure': failed_customer_id
-                                })
-
-                        # 按计划更新载重
-                        current_load -= customer.demand
+                    projected_load = profile['load'][i]
+                    if (customer.success is None and customer.demand < 0 and
+                            projected_load > self.truck_max_capacity):
+                        violations.append({
+                            'customer_id': customer_id,
+                            'position': i,
+                            'violation_type': 'future_pickup_overload',
+                            'current_load': projected_load - abs(customer.demand),
+                            'pickup_demand': abs(customer.demand),
+                            'projected_load': projected_load,
+                            'excess': projected_load - self.truck_max_capacity,
+                            'caused_by_failure': failed_customer_id
+                        })
 
         except Exception as e:
             print(f"         卡车前瞻性载重检查出错: {e}")
@@ -2866,9 +3785,11 @@ class Dynamic_Optimization:
     def _check_drone_forward_looking_load(self, vehicle_id: int, failed_customer_id: int) -> List[Dict]:
         """
         检查无人机按原计划继续执行时的载重约束
+        基于无人机任务载重剖面：失败位置之后的最大载重不超限时直接跳过该任务
         """
         violations = []
         try:
+            profile = self.get_load_profile(vehicle_id)
             for trip_idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
                 path = trip['path']
 
@@ -2877,50 +3798,30 @@ class Dynamic_Optimization:
                     continue
 
                 failed_position = path.index(failed_customer_id)
-                failed_customer = self.customers[failed_customer_id - 1]
-
-                # 计算到失败客户之前的载重
-                current_load = trip['initial_load']
-                for i in range(1, failed_position):
-                    customer_id = path[i]
-                    if customer_id <= len(self.customers):
-                        customer = self.customers[customer_id - 1]
-                        if customer.success is not False:  # 成功或未服务
-                            current_load -= customer.demand
-
-                # 处理失败客户对载重的影响
-                if failed_customer.demand > 0:
-                    # 送货失败：包裹仍在无人机上
-                    pass
-                else:
-                    # 取货失败：没取到货，载重不增加
-                    pass
+                trip_profile = profile['trips'][trip_idx]
+                if failed_position + 1 >= len(path) or \
+                        trip_profile['suffix_max'][failed_position + 1] <= self.drone_max_capacity:
+                    continue
 
-                # 检查后续客户
+                # 检查后续未服务的取货客户
                 for i in range(failed_position + 1, len(path) - 1):
                     customer_id = path[i]
                     if customer_id <= len(self.customers):
                         customer = self.customers[customer_id - 1]
-
-                        if customer.success is None:  # 未服务客户
-                            if customer.demand < 0:  # 取货客户
-                                projected_load = current_load + abs(customer.demand)
-                                if projected_load > self.drone_max_capacity:
-                                    violations.append({
-                                        'trip_index': trip_idx,
-                                        'customer_id': customer_id,
-                                        'position': i,
-                                        'violation_type': 'drone_future_pickup_overload',
-                                        'current_load': current_load,
-                                        'pickup_demand': abs(customer.demand),
-                                        'projected_load': projected_load,
-                                        'excess': projected_load - self.drone_max_capacity,
-                                        'caused_by_failure': failed_customer_id
-                                    })
-
-                        # 按计划更新载重
-                        if customer.success is not False:
-                            current_load -= customer.demand
+                        projected_load = trip_profile['load'][i]
+                        if (customer.success is None and customer.demand < 0 and
+                                projected_load > self.drone_max_capacity):
+                            violations.append({
+                                'trip_index': trip_idx,
+                                'customer_id': customer_id,
+                                'position': i,
+                                'violation_type': 'drone_future_pickup_overload',
+                                'current_load': projected_load - abs(customer.demand),
+                                'pickup_demand': abs(customer.demand),
+                                'projected_load': projected_load,
+                                'excess': projected_load - self.drone_max_capacity,
+                                'caused_by_failure': failed_customer_id
+                            })
 
         except Exception as e:
             print(f"         无人机前瞻性载重检查出错: {e}")
@@ -3015,29 +3916,60 @@ class Dynamic_Optimization:
             print(f"计算剩余能耗失败: {e}")
             return self.drone_max_battery * 1.1  # 保守估计
 
+    def save_operator_weights(self, path: Optional[str] = None) -> bool:
+        """把摧毁/修复算子的权重与累计统计保存为JSON，供后续重规划调用沿用"""
+        path = path or self.operator_weights_file
+        if not path:
+            return False
+        try:
+            state = {'destroy': self.destroy_ops.get_operator_state(),
+                     'repair': self.repair_ops.get_operator_state()}
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            print(f" 算子权重已保存: {path}")
+            return True
+        except Exception as e:
+            print(f" 算子权重保存失败: {e}")
+            return False
+
+    def load_operator_weights(self, path: Optional[str] = None) -> bool:
+        """载入save_operator_weights保存的算子权重与统计，文件不存在时保持当前权重"""
+        path = path or self.operator_weights_file
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.destroy_ops.set_operator_state(state.get('destroy', {}))
+            self.repair_ops.set_operator_state(state.get('repair', {}))
+            print(f" 算子权重已载入: {path}")
+            return True
+        except Exception as e:
+            print(f" 算子权重载入失败: {e}")
+            return False
+
     def run_dynamic_optimization(self):
         """
         多阶段动态规划主函数
         """
         try:
-            # 步骤1: 初始化时间矩阵T（按服务时间排序所有客户）
-            self._initialize_time_matrix_T()
-            total_stages = len(self.T)
+            self.load_operator_weights()
+            # 步骤1: 初始化服务事件队列（按服务时间排序所有客户）
+            self._initialize_event_queue()
+            total_stages = len(self._event_version)
             print(f" 总阶段数: {total_stages}")
             # 步骤2: 多阶段处理主循环
             current_stage_index = 0
             processed_customers = set()
-            while current_stage_index < len(self.T):
-                # 获取当前阶段的客户
-                current_customer_id = int(self.T[current_stage_index][0])
-                current_service_time = self.T[current_stage_index][1]
+            while True:
+                # 弹出下一个待服务客户
+                event = self._pop_next_service_event(processed_customers)
+                if event is None:
+                    break
+                current_customer_id, current_service_time = event
                 print(f"\n 阶段 {current_stage_index + 1}: 客户{current_customer_id}")
                 print(f"    预计服务时间: {current_service_time:.2f}")
-                # 跳过已处理的客户
-                if current_customer_id in processed_customers:
-                    print(f"    客户{current_customer_id}已处理，跳过")
-                    current_stage_index += 1
-                    continue
+                current_stage_index += 1
                 # 获取客户信息
                 customer = self.customers[current_customer_id - 1]
           # ================== 阶段1：服务前准备和状态更新 ==================
@@ -3055,7 +3987,6 @@ class Dynamic_Optimization:
                     print(f"    客户{current_customer_id}在家，服务成功")
                     success_result = self._handle_successful_service_complete(current_customer_id)
                     processed_customers.add(current_customer_id)
-                    current_stage_index += 1
                 else:
                     # ============ 服务失败分支 ============
                     print(f"    客户{current_customer_id}不在家，服务失败")
@@ -3080,22 +4011,23 @@ class Dynamic_Optimization:
                                 vehicle_id, current_customer_id, constraint_analysis)
                         else:
                             replan_success = False
-                        # 重规划成功后更新时间矩阵
+                        # 重规划成功后重新调度该车辆对的服务事件
                         if replan_success:
                             print(f"     重规划成功，更新时间矩阵")
                             self._recalculate_time_matrix_T()
-                            # 找到下一个未处理的客户
-                            next_stage = self._find_next_unprocessed_stage(processed_customers)
-                            current_stage_index = next_stage if next_stage is not None else len(self.T)
                         else:
                             print(f"     重规划失败，继续下一客户")
-                            current_stage_index += 1
                     else:
                         print(f"     约束满足，无需重规划")
-                        current_stage_index += 1
             print(f"\n🏁 改进版多阶段动态规划完成！")
             print(f"总服务客户数: {sum(1 for c in self.customers if c.success is True)}")
             print(f"总失败客户数: {sum(1 for c in self.customers if c.success is False)}")
+            self.print_energy_cache_stats()
+            self.print_fingerprint_stats()
+            self.repair_ops.print_insertion_bound_stats()
+            self.destroy_ops.print_operator_stats("摧毁算子统计")
+            self.repair_ops.print_operator_stats("修复算子统计")
+            self.save_operator_weights()
             return True
         except Exception as e:
             print(f"❌ 动态规划执行出错: {e}")
@@ -3177,12 +4109,11 @@ class Dynamic_Optimization:
                 target_customer = self.customers[customer_id - 1]
                 vehicle_id = target_customer.service_by[1]
                 print(f"       更新车辆对{vehicle_id}无人机剩余电池：离开客户{customer_id}")
-                # 找到该客户所在的trip
+                # 通过节点索引找到该客户所在的trip
                 target_trip = None
-                for  trip in self.DRONE_Routes[vehicle_id].route:
-                    if customer_id in trip['path']:
-                        target_trip = trip
-                        break
+                entry = self.locate_customer(customer_id, vehicle_id)
+                if entry is not None and entry['trip_idx'] is not None:
+                    target_trip = self.DRONE_Routes[vehicle_id].route[entry['trip_idx']]
                 if target_trip is None:
                     print(f"         未找到客户{customer_id}所在的无人机trip")
                     return
@@ -3210,32 +4141,31 @@ class Dynamic_Optimization:
             customer = self.customers[customer_id - 1]
             vehicle_id = customer.service_by[1]
             print(f"       更新车辆对{vehicle_id}无人机电池：到达客户{customer_id}")
-            # 找到该客户所在的trip
+            # 通过节点索引找到该客户所在的trip
             target_trip = None
             target_trip_idx = None
-            for trip_idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
-                if customer_id in trip['path']:
-                    target_trip = trip
-                    target_trip_idx = trip_idx
-                    break
+            entry = self.locate_customer(customer_id, vehicle_id)
+            if entry is not None and entry['trip_idx'] is not None:
+                target_trip_idx = entry['trip_idx']
+                target_trip = self.DRONE_Routes[vehicle_id].route[target_trip_idx]
             if target_trip is None:
                 print(f"         未找到客户{customer_id}所在的无人机trip")
                 return
 
             path = target_trip['path']
-            target_position = path.index(customer_id)
+            target_position = entry['path_pos']
             if target_position == 0:  # 如果是起飞节点，不消耗能耗
                 energy_consumed = 0
             # 获取前一个位置和当前位置
             from_customer_id = path[target_position - 1]
             to_customer_id = customer_id
             # 计算飞行能耗
-            current_load = trip['current_load']
+            current_load = target_trip['current_load']
             distance = self.ALLdistanceDmatrix[from_customer_id][to_customer_id]
             flight_time = distance / self.drone_speed
             flight_energy = flight_time * self.energy_fight * (current_load + self.drone_weight)
             energy_consumed = flight_energy
-            trip['current_remain_battery'] = trip['current_remain_battery'] - energy_consumed
+            target_trip['current_remain_battery'] = target_trip['current_remain_battery'] - energy_consumed
         except Exception as e:
             print(f"         无人机电池更新出错: {e}")
 
@@ -3307,18 +4237,17 @@ class Dynamic_Optimization:
             # 1. 找到失败客户所在的无人机trip
             failed_trip = None
             trip_index = None
-            for idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
-                if failed_customer_id in trip['path']:
-                    failed_trip = trip
-                    trip_index = idx
-                    break
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is not None and entry['trip_idx'] is not None:
+                trip_index = entry['trip_idx']
+                failed_trip = self.DRONE_Routes[vehicle_id].route[trip_index]
             if failed_trip is None:
                 # 失败客户不在无人机路径中，无需检查无人机载重
                 return violations
             print(f"            找到失败客户{failed_customer_id}在无人机trip {trip_index}")
             # 2. 获取路径和失败位置
             path = failed_trip['path']
-            failed_position = path.index(failed_customer_id)
+            failed_position = entry['path_pos']
             failed_customer = self.customers[failed_customer_id - 1]
             violations['affected_trip'] = trip_index
 
@@ -3398,11 +4327,10 @@ class Dynamic_Optimization:
             failed_trip_idx = None
             failed_trip = None
 
-            for trip_idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
-                if failed_customer_id in trip['path']:
-                    failed_trip_idx = trip_idx
-                    failed_trip = trip
-                    break
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is not None and entry['trip_idx'] is not None:
+                failed_trip_idx = entry['trip_idx']
+                failed_trip = self.DRONE_Routes[vehicle_id].route[failed_trip_idx]
 
             if failed_trip is None:
                 return violations
@@ -3410,7 +4338,7 @@ class Dynamic_Optimization:
             # 计算从失败客户位置继续执行到结束所需的能耗
             remaining_battery = failed_trip.get('current_remain_battery', self.drone_max_battery)
             path = failed_trip['path']
-            failed_position = path.index(failed_customer_id)
+            failed_position = entry['path_pos']
 
             # 修正：正确计算剩余所需能耗
             remaining_energy_needed = self._calculate_remaining_energy_after_failure(
@@ -3504,10 +4432,11 @@ class Dynamic_Optimization:
         try:
             truck = self.TRUCK_Routes[vehicle_id]
             truck_route = truck.Troute
-            if failed_customer_id not in truck_route:
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is None or entry['truck_pos'] is None:
                 return violations
 
-            failed_position = truck_route.index(failed_customer_id)
+            failed_position = entry['truck_pos']
             failed_customer = self.customers[failed_customer_id - 1]
             print(f"         检查卡车载重约束(失败位置: {failed_position})")
 
@@ -3700,6 +4629,9 @@ class Dynamic_Optimization:
         基于所有客户的当前服务状态进行完整重算
         """
         print(f"         完整重算车辆对{vehicle_id}载重...")
+        self.dirty_vehicles.add(vehicle_id)  # 载重变化会影响无人机能耗
+        self.invalidate_load_profile(vehicle_id)
+        self.invalidate_vehicle_cost(vehicle_id)
         try:
             truck = self.TRUCK_Routes[vehicle_id]
             # 1. 重新计算卡车载重
@@ -3943,15 +4875,14 @@ class Dynamic_Optimization:
             Dict: {trip_index, trip, position_in_path} 或 None
         """
         try:
-            for trip_idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
-                if failed_customer_id in trip['path']:
-                    position_in_path = trip['path'].index(failed_customer_id)
-                    return {
-                        'trip_index': trip_idx,
-                        'trip': trip,
-                        'position_in_path': position_in_path
-                    }
-            return None
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is None or entry['trip_idx'] is None:
+                return None
+            return {
+                'trip_index': entry['trip_idx'],
+                'trip': self.DRONE_Routes[vehicle_id].route[entry['trip_idx']],
+                'position_in_path': entry['path_pos']
+            }
         except Exception as e:
             print(f"        定位失败客户任务出错: {e}")
             return None
@@ -4108,6 +5039,7 @@ class Dynamic_Optimization:
 
             # 更新路径
             trip['path'] = new_path
+            self._notify_route_mutation(vehicle_id)
 
             # 重新计算载重（只保留未放弃的配送客户的载重）
             self._recalculate_trip_load_after_abandonment(trip, abandoned_customers)
@@ -4260,6 +5192,7 @@ class Dynamic_Optimization:
 
             # 更新trip
             trip['path'] = emergency_path
+            self._notify_route_mutation(vehicle_id)
             trip['current_load'] = 0
             trip['current_load_delivery'] = 0
             trip['current_load_pickup'] = 0
@@ -4547,31 +5480,24 @@ class Dynamic_Optimization:
 
     def _analyze_drone_return_delay_effects(self, vehicle_id: int, failed_customer_id: int) -> List[Dict]:
         """
-        分析无人机返回延迟对卡车路径的影响
+        分析无人机返回延迟对卡车路径的影响（推迟量经回收节点传递，被等待时间吸收后停止）
         """
         effects = []
 
         try:
-            # 找到失败客户所在的无人机任务
-            for trip_idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
-                if failed_customer_id in trip['path']:
-                    retrieval_node = trip['retrieval_node']
-
-                    # 检查回收节点在卡车路径中的位置
-                    truck_route = self.TRUCK_Routes[vehicle_id].Troute
-                    if retrieval_node in truck_route:
-                        retrieval_position = truck_route.index(retrieval_node)
-
-                        # 分析对后续卡车客户的时间影响
-                        for i in range(retrieval_position + 1, len(truck_route) - 1):
-                            subsequent_customer = truck_route[i]
-                            effects.append({
-                                'type': 'truck_schedule_delay',
-                                'affected_customer': subsequent_customer,
-                                'cause': f'无人机任务{trip_idx}返回延迟'
-                            })
-
-                    break
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is None or entry['trip_idx'] is None or entry['truck_pos'] is not None:
+                return effects
+            trip_idx = entry['trip_idx']
+            for affected in self.propagate_failure_delay(vehicle_id, failed_customer_id):
+                if affected['via_retrieval'] and affected['vehicle_type'] == 'truck':
+                    effects.append({
+                        'type': 'truck_schedule_delay',
+                        'affected_customer': affected['customer_id'],
+                        'delay': affected['delay'],
+                        'time_window_violation': affected['time_window_violation'],
+                        'cause': f'无人机任务{trip_idx}返回延迟'
+                    })
 
         except Exception as e:
             print(f"          分析无人机返回延迟效应出错: {e}")
@@ -4609,7 +5535,12 @@ class Dynamic_Optimization:
         # 如果有大量客户受到连锁影响，需要重规划
         total_affected = 0
         for effect_type, effects in cascading_effects.items():
-            total_affected += len(effects) if isinstance(effects, list) else 0
+            if not isinstance(effects, list):
+                continue
+            total_affected += len(effects)
+            # 推迟传递后破坏了原本满足的时间窗
+            if any(effect.get('time_window_violation') for effect in effects):
+                return True
 
         # 如果超过3个后续客户受影响，认为是关键连锁效应
         return total_affected > 3
@@ -4692,11 +5623,12 @@ class Dynamic_Optimization:
         try:
             truck_route = self.TRUCK_Routes[vehicle_id].Troute
 
-            if failed_customer_id not in truck_route:
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is None or entry['truck_pos'] is None:
                 print(f"         失败客户{failed_customer_id}不在车辆对{vehicle_id}的卡车路径中")
                 return customers_to_replan
 
-            failed_position = truck_route.index(failed_customer_id)
+            failed_position = entry['truck_pos']
             print(f"         失败客户在卡车路径位置: {failed_position}")
 
             # 1. 收集失败客户之后的所有卡车客户（包括失败客户本身）
@@ -4782,46 +5714,90 @@ class Dynamic_Optimization:
 
         # 初始化
         best_cost = self.cost_single_vehicle(vehicle_id)
+        initial_cost = best_cost
         current_cost = best_cost
+        best_checkpoint = None  # 最优解检查点（None表示初始解即最优）
         temperature = temperature_start
         iterations_no_improve = 0
 
         print(f"         ALNS参数: max_iter={max_iterations}, temp_start={temperature_start:.2f}")
+        self.reset_evaluation_table()
+        self._record_evaluation(vehicle_id, self.fingerprint_vehicle(vehicle_id), True)
+
+        def _record_operator_outcome(outcome):
+            # 摧毁与修复算子按同一ALNS结果计分，奖励各自按本次调用耗时归一化
+            improved = outcome in ('best', 'improved')
+            self.destroy_ops.update_operator_performance(destroy_operator, improved, destroy_time, outcome)
+            if self.repair_ops.last_repair is not None:
+                repair_operator, repair_time = self.repair_ops.last_repair
+                self.repair_ops.update_operator_performance(repair_operator, improved, repair_time, outcome)
 
         try:
             for iteration in range(max_iterations):
+                # 记录当前解，拒绝或修复失败时回滚
+                checkpoint = self.checkpoint_vehicle(vehicle_id)
                 # Step 1: 选择并执行摧毁算子
                 destroy_operator = self.destroy_ops.select_destroy_operator()
+                destroy_start = time.perf_counter()
                 customers_removed = getattr(self.destroy_ops, f"{destroy_operator}_removal")(
                     vehicle_id, customers_to_replan[0] if customers_to_replan else -1)
+                destroy_time = time.perf_counter() - destroy_start
 
                 if not customers_removed:
                     print(f"           迭代{iteration}: 摧毁算子{destroy_operator}未移除任何客户")
+                    self.rollback_vehicle(checkpoint)
+                    self.destroy_ops.update_operator_performance(destroy_operator, False, destroy_time)
                     continue
 
                 print(f"           迭代{iteration}: {destroy_operator}移除{len(customers_removed)}个客户")
 
                 # Step 2: 选择并执行修复算子
-                repair_success = self.repair_ops.repair_solution(vehicle_id, customers_removed)
+                repair_success = self.repair_ops.repair_solution(vehicle_id, customers_removed,
+                                                                 record_performance=False)
 
                 if not repair_success:
-                    print(f"           修复失败，跳过此次迭代")
+                    print(f"           修复失败，回滚并跳过此次迭代")
+                    self.rollback_vehicle(checkpoint)
+                    _record_operator_outcome('rejected')
                     continue
 
-                # Step 3: 轻量级局部搜索（条件触发）
+                # 本次重规划中已评估过的解不再局部搜索，记录为不可行的解直接拒绝
+                fingerprint = self.fingerprint_vehicle(vehicle_id)
+                evaluation = self._lookup_evaluation(destroy_operator, vehicle_id, fingerprint)
                 new_cost = self.cost_single_vehicle(vehicle_id)
-                if new_cost < current_cost * 1.05:  # 如果解质量较好，进行局部搜索
-                    optimized_cost = self.local_search(vehicle_id, new_cost)
-                    if optimized_cost < new_cost:
-                        new_cost = optimized_cost
-                        print(f"           局部搜索改进: {new_cost - optimized_cost:.2f}")
+                if evaluation is False:
+                    print(f"           重复的不可行解（指纹命中），跳过评估")
+                    self.rollback_vehicle(checkpoint)
+                    iterations_no_improve += 1
+                    _record_operator_outcome('rejected')
+                    temperature *= temperature_decay
+                    if iterations_no_improve >= max_no_improve:
+                        print(f"           连续{max_no_improve}次无改进，提前终止")
+                        break
+                    continue
+
+                if evaluation is not None:
+                    # 重复解：该状态的局部搜索结果已记录，直接按车辆对成本进入接受准则
+                    print(f"           重复解（指纹命中），跳过局部搜索: {new_cost:.2f}")
+                else:
+                    # Step 3: 轻量级局部搜索（条件触发）
+                    self._record_evaluation(vehicle_id, fingerprint, True)
+                    if new_cost < current_cost * 1.05:  # 如果解质量较好，进行局部搜索
+                        # 局部搜索保留的状态由_apply_intra_operator_with_feasibility_check按修复后指纹记录
+                        optimized_cost = self.local_search(vehicle_id, new_cost)
+                        if optimized_cost < new_cost:
+                            print(f"           局部搜索改进: {new_cost - optimized_cost:.2f}")
+                            new_cost = optimized_cost
 
                 # Step 4: 接受准则（模拟退火）
                 accept_solution = False
+                outcome = 'rejected'
                 if new_cost < best_cost:
                     # 新的最优解
                     accept_solution = True
+                    outcome = 'best'
                     best_cost = new_cost
+                    best_checkpoint = None
                     iterations_no_improve = 0
                     print(f"           ✅ 新最优解: {new_cost:.2f} (改进{current_cost - new_cost:.2f})")
 
@@ -4831,6 +5807,7 @@ class Dynamic_Optimization:
                 elif new_cost < current_cost:
                     # 局部改进
                     accept_solution = True
+                    outcome = 'improved'
                     iterations_no_improve = 0
                     print(f"           📈 局部改进: {new_cost:.2f}")
 
@@ -4840,18 +5817,22 @@ class Dynamic_Optimization:
                         accept_prob = math.exp((current_cost - new_cost) / temperature)
                         if random.random() < accept_prob:
                             accept_solution = True
+                            outcome = 'accepted'
                             print(f"           🌡️ 模拟退火接受: {accept_prob:.3f}")
 
                 # Step 5: 更新当前解
                 if accept_solution:
+                    if new_cost > best_cost and best_checkpoint is None:
+                        # 接受较差解前保存最优解
+                        best_checkpoint = checkpoint
                     current_cost = new_cost
                 else:
-                    # 拒绝解，恢复之前状态（这里简化处理）
+                    # 拒绝解，恢复之前状态
+                    self.rollback_vehicle(checkpoint)
                     iterations_no_improve += 1
 
-                # Step 6: 更新算子权重和信息素
-                improved = new_cost < best_cost
-                self.destroy_ops.update_operator_performance(destroy_operator, improved)
+                # Step 6: 更新算子权重（奖励按算子耗时归一化）
+                _record_operator_outcome(outcome)
 
                 # Step 7: 降温和终止条件检查
                 temperature *= temperature_decay
@@ -4864,7 +5845,10 @@ class Dynamic_Optimization:
             if hasattr(self, 'evaporate_pheromone'):
                 self.evaporate_pheromone()
 
-            improvement = self.cost_single_vehicle(vehicle_id) - best_cost
+            # 当前解不是最优解时恢复最优解
+            if best_checkpoint is not None:
+                self.rollback_vehicle(best_checkpoint)
+            improvement = initial_cost - self.cost_single_vehicle(vehicle_id)
             print(f"         ALNS完成，最终改进: {improvement:.2f}")
 
             return improvement > 0.01  # 显著改进才认为成功
@@ -4948,6 +5932,7 @@ class Dynamic_Optimization:
                     print(f"           应急插入客户{customer_id}")
 
             print(f"         应急重规划完成: {inserted_count}/{len(customers_to_replan)}个客户")
+            self._notify_route_mutation(vehicle_id)
 
             # 3. 重新计算时间和载重
             if len(truck_route) > 2:
@@ -4960,50 +5945,44 @@ class Dynamic_Optimization:
             return False
 
     def _analyze_subsequent_customer_timing_impact(self, vehicle_id: int, failed_customer_id: int) -> List[Dict]:
-        """分析对后续客户时间安排的影响"""
+        """分析对后续客户时间安排的影响（只包含到达时间实际被推迟的客户）"""
         effects = []
         try:
-            # 检查同一车辆对中失败客户之后的客户
-            truck_route = self.TRUCK_Routes[vehicle_id].Troute
-            if failed_customer_id in truck_route:
-                failed_pos = truck_route.index(failed_customer_id)
-                for i in range(failed_pos + 1, len(truck_route) - 1):
-                    effects.append({
-                        'type': 'timing_delay',
-                        'affected_customer': truck_route[i],
-                        'vehicle_type': 'truck'
-                    })
-
-            # 检查无人机任务
-            for trip in self.DRONE_Routes[vehicle_id].route:
-                if failed_customer_id in trip['path']:
-                    failed_pos = trip['path'].index(failed_customer_id)
-                    for i in range(failed_pos + 1, len(trip['path']) - 1):
-                        effects.append({
-                            'type': 'timing_delay',
-                            'affected_customer': trip['path'][i],
-                            'vehicle_type': 'drone'
-                        })
-
+            for affected in self.propagate_failure_delay(vehicle_id, failed_customer_id):
+                # 经无人机回收传递到卡车的推迟由无人机返回延迟分析负责
+                if affected['via_retrieval'] and affected['vehicle_type'] == 'truck':
+                    continue
+                effects.append({
+                    'type': 'timing_delay',
+                    'affected_customer': affected['customer_id'],
+                    'vehicle_type': affected['vehicle_type'],
+                    'delay': affected['delay'],
+                    'time_window_violation': affected['time_window_violation']
+                })
             return effects
         except Exception as e:
             print(f"          分析后续客户时间影响出错: {e}")
             return []
 
     def _analyze_energy_chain_effects(self, vehicle_id: int, failed_customer_id: int) -> List[Dict]:
-        """分析能耗链式效应"""
+        """分析能耗链式效应：失败客户处额外悬停耗时带来的能耗使任务能耗接近上限"""
         effects = []
         try:
-            # 简化实现：如果能耗接近上限，标记为链式效应
-            for trip_idx, trip in enumerate(self.DRONE_Routes[vehicle_id].route):
-                if failed_customer_id in trip['path']:
-                    current_energy = trip.get('energy', 0)
-                    if current_energy > self.drone_max_battery * 0.9:
-                        effects.append({
-                            'type': 'energy_critical',
-                            'trip_index': trip_idx,
-                            'energy_ratio': current_energy / self.drone_max_battery
-                        })
+            entry = self.locate_customer(failed_customer_id, vehicle_id)
+            if entry is None or entry['trip_idx'] is None:
+                return effects
+            trip_idx = entry['trip_idx']
+            trip = self.DRONE_Routes[vehicle_id].route[trip_idx]
+            extra_energy = ((trip.get('current_load', 0) + self.drone_weight) *
+                            self.failure_time_delay * self.energy_hover)
+            projected_energy = trip.get('energy', 0) + extra_energy
+            if projected_energy > self.drone_max_battery * 0.9:
+                effects.append({
+                    'type': 'energy_critical',
+                    'trip_index': trip_idx,
+                    'extra_energy': extra_energy,
+                    'energy_ratio': projected_energy / self.drone_max_battery
+                })
             return effects
         except Exception as e:
             print(f"          分析能耗链式效应出错: {e}")
@@ -5035,45 +6014,77 @@ class Dynamic_Optimization:
 # ==================== 卡车重规划结束   ===================
 
 
-    def _initialize_time_matrix_T(self):
+    def _initialize_event_queue(self):
         """
-        初始化时间矩阵T：收集所有客户的服务时间并排序
+        初始化服务事件队列：计算所有客户的服务时间并建堆
         """
-        print(" 初始化时间矩阵T...")
+        print(" 初始化服务事件队列...")
 
         # 首先确保所有客户都有正确的服务时间
         self._calculate_all_service_times()
 
-        # 收集所有客户的 [客户ID, 服务开始时间]
-        customer_times = []
-        for customer in self.customers:
+        self.event_queue = []
+        self._event_version = {}
+        for customer_index, customer in enumerate(self.customers):
             service_time = getattr(customer, 'service_begin', customer.start_time)
-            customer_times.append([customer.cust_no, service_time])
-        # 按服务时间排序
-        customer_times.sort(key=lambda x: x[1])
-        # 构建T矩阵
-        self.T = np.array(customer_times, dtype='object')
-        print(f"    时间矩阵T构建完成: {len(customer_times)}个客户")
-        if len(customer_times) > 0:
-            print(f"    服务时间范围: {self.T[0][1]:.2f} - {self.T[-1][1]:.2f}")
+            self._event_version[customer.cust_no] = 0
+            # 客户序号作为同一时间的次序，与按时间稳定排序的结果一致
+            self.event_queue.append((service_time, customer_index, customer.cust_no, 0))
+        heapq.heapify(self.event_queue)
+        print(f"    服务事件队列构建完成: {len(self.event_queue)}个客户")
+        if self.event_queue:
+            latest = max(event[0] for event in self.event_queue)
+            print(f"    服务时间范围: {self.event_queue[0][0]:.2f} - {latest:.2f}")
+
+    def _schedule_service_event(self, customer_id: int):
+        """按客户当前的服务时间重新调度事件，该客户之前的事件随之失效"""
+        customer = self.customers[customer_id - 1]
+        service_time = getattr(customer, 'service_begin', customer.start_time)
+        version = self._event_version.get(customer_id, 0) + 1
+        self._event_version[customer_id] = version
+        heapq.heappush(self.event_queue, (service_time, customer_id - 1, customer_id, version))
 
-    def _recalculate_time_matrix_T(self):
+    def _pop_next_service_event(self, processed_customers):
         """
-        重规划后重新计算时间矩阵T
+        弹出下一个待处理的服务事件（跳过已处理和已失效的事件）
+        Returns:
+            Tuple: (客户ID, 服务时间)，队列为空时返回None
         """
-        print("     重新计算时间矩阵T...")
-        # 1. 重新计算所有客户的服务时间
-        self._calculate_all_service_times()
-        # 2. 重新排序构建T矩阵
-        self._initialize_time_matrix_T()
-        print(f"   时间矩阵T更新完成: {len(self.T)}个客户")
+        while self.event_queue:
+            service_time, _, customer_id, version = heapq.heappop(self.event_queue)
+            if customer_id in processed_customers or self._event_version.get(customer_id) != version:
+                continue
+            return customer_id, service_time
+        return None
 
-    def _calculate_all_service_times(self):
+    def _recalculate_time_matrix_T(self):
         """
-        重新计算所有客户的服务时间
+        重规划后重新计算服务时间并重新调度事件
+        重规划严格限定在车辆对内（包裹不能转运），只需处理发生变化的车辆对
+        """
+        print("     重新计算时间矩阵T...")
+        # 1. 只重新计算脏车辆对的服务时间
+        dirty_vehicles = sorted(self.dirty_vehicles)
+        print(f"     需要重算的车辆对: {dirty_vehicles}")
+        self._calculate_all_service_times(dirty_vehicles)
+        # 2. 只为这些车辆对的客户重新调度服务事件
+        rescheduled = 0
+        for truck_id in dirty_vehicles:
+            for customer_id in self.get_vehicle_customers(truck_id):
+                self._schedule_service_event(customer_id)
+                rescheduled += 1
+        print(f"   服务事件更新完成: 重新调度{rescheduled}个客户")
+
+    def _calculate_all_service_times(self, vehicle_ids=None):
+        """
+        重新计算客户的服务时间
+        Args:
+            vehicle_ids: 需要重算的车辆对列表，None表示全部车辆对
         """
+        if vehicle_ids is None:
+            vehicle_ids = range(len(self.TRUCK_Routes))
         # 为每个车辆对重新计算时间
-        for truck_id in range(len(self.TRUCK_Routes)):
+        for truck_id in vehicle_ids:
             # 更新该车辆对的访问时间矩阵
             if len(self.TRUCK_Routes[truck_id].Troute) > 2:  # 有客户
                 self.Update_visit_T(truck_id, 1)  # 从第一个客户开始更新
@@ -5090,27 +6101,22 @@ class Dynamic_Optimization:
                             trip.get('current_load', 0)
                         )
 
-        # 更新所有客户的service_begin时间
-        for customer in self.customers:
-            if hasattr(customer, 'service_by') and customer.service_by:
-                if customer.service_by[0] == "tk":
-                    # 卡车服务：使用arrive_truck时间
-                    customer.service_begin = getattr(customer, 'arrive_truck', customer.start_time)
-                else:
-                    # 无人机服务：使用arrive_drone时间
-                    customer.service_begin = getattr(customer, 'arrive_drone', customer.start_time)
+            # 更新该车辆对客户的service_begin时间
+            for customer_id in self.get_vehicle_customers(truck_id):
+                self._update_customer_service_begin(self.customers[customer_id - 1])
+            self.dirty_vehicles.discard(truck_id)
+
+    def _update_customer_service_begin(self, customer):
+        """根据服务方式更新客户的service_begin时间"""
+        if hasattr(customer, 'service_by') and customer.service_by:
+            if customer.service_by[0] == "tk":
+                # 卡车服务：使用arrive_truck时间
+                customer.service_begin = getattr(customer, 'arrive_truck', customer.start_time)
             else:
-                customer.service_begin = customer.start_time
-
-    def _find_next_unprocessed_stage(self, processed_customers):
-        """
-        在更新后的T矩阵中找到下一个未处理的客户
-        """
-        for stage_idx in range(len(self.T)):
-            customer_id = int(self.T[stage_idx][0])
-            if customer_id not in processed_customers:
-                return stage_idx
-        return None
+                # 无人机服务：使用arrive_drone时间
+                customer.service_begin = getattr(customer, 'arrive_drone', customer.start_time)
+        else:
+            customer.service_begin = customer.start_time
 
     def _emergency_replan_within_vehicle(self, vehicle_id, customers_to_replan):
         """
@@ -5137,6 +6143,7 @@ class Dynamic_Optimization:
                     print(f"         应急插入客户{customer_id}")
 
             print(f"       ✅ 应急重规划完成: {inserted_count}/{len(customers_to_replan)}个客户")
+            self._notify_route_mutation(vehicle_id)
             return inserted_count > 0
 
         except Exception as e:
@@ -5183,8 +6190,9 @@ class Dynamic_Optimization:
 
         # 逆序删除空的trips
         for trip_idx in reversed(trips_to_remove):
-            del drone_routes[trip_idx]
+            self.DRONE_Routes[vehicle_id].remove_trip(trip_idx)
             print(f"           删除车辆对{vehicle_id}的空无人机任务{trip_idx}")
+        self._notify_route_mutation(vehicle_id)
 
     def _emergency_replan_within_vehicle(self, vehicle_id: int, customers_to_replan: list) -> bool:
         """
@@ -5199,6 +6207,7 @@ class Dynamic_Optimization:
                 insert_position += 1
                 # 更新客户服务信息
                 self.customers[customer_id - 1].service_by = ["tk", vehicle_id]
+            self._notify_route_mutation(vehicle_id)
             print(f"    应急重规划完成，{len(customers_to_replan)}个客户已插入卡车路径")
             return True
         except Exception as e:
@@ -5281,6 +6290,7 @@ class Dynamic_Optimization:
             self.Vist_T[i, 2] = self.customers[i].departure_truck                # 卡车离开时间
             self.Vist_T[i, 3] = self.customers[i].arrive_drone                   # 无人机到达时间
             self.Vist_T[i, 4] = self.customers[i].departure_drone                # 无人机离开时间
+        self.invalidate_vehicle_cost()
 
     def set_customer_service_status(self, customer_id: int, success_status: bool):
         """
@@ -5291,90 +6301,702 @@ class Dynamic_Optimization:
         """
         if customer_id <= len(self.customers):
             self.customers[customer_id - 1].success = success_status
+            vehicle_id = self.get_customer_vehicle(customer_id)
+            if vehicle_id is not None:
+                self.invalidate_load_profile(vehicle_id)
+                self.invalidate_vehicle_cost(vehicle_id)  # 服务状态影响无人机载重与能耗
+            else:
+                self.invalidate_load_profile()
+                self.invalidate_vehicle_cost()
             print(f"    客户{customer_id}服务状态设置为: {'成功' if success_status else '失败'}")
 
+    # ==================== 前向时间松弛量 ====================
+    def get_time_slack(self, truck_id: int) -> Dict:
+        """获取车辆对的前向时间松弛量（失效时按当前Vist_T重新计算）"""
+        slack = self._time_slack_cache.get(truck_id)
+        if slack is None:
+            slack = self._compute_time_slack(truck_id)
+            self._time_slack_cache[truck_id] = slack
+        return slack
+
+    def _compute_time_slack(self, truck_id: int) -> Dict:
+        """
+        按Update_visit_T的时间传播规则，从路径末端向前递推前向时间松弛量
+        Returns:
+            Dict: {
+                'truck_arrival': {节点: 卡车到达该节点最多可推迟的时间},
+                'truck_departure': {节点: 卡车离开该节点最多可推迟的时间},
+                'drone_arrival': {trip下标: [无人机到达path各位置最多可推迟的时间]},
+                'truck_wait': {节点: 卡车等待时间窗开启的时间},
+                'sync_wait': {节点: 卡车在回收节点等待无人机的时间},
+                'drone_wait': {trip下标: [无人机在path各位置等待时间窗开启的时间]},
+                'hover': {trip下标: 无人机在回收节点悬停等待卡车的时间}
+            }
+        推迟量先被卡车等待时间窗开启、卡车在回收节点等待无人机、无人机等待时间窗开启
+        以及无人机在回收节点悬停等待卡车所吸收，剩余部分才传递到下游。
+        已经晚到的客户不约束松弛量（由可行性修复处理），只保证不破坏现有满足的时间窗。
+        """
+        INF = float('inf')
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        drone = self.DRONE_Routes[truck_id]
+        trip_positions = {id(trip): trip_idx for trip_idx, trip in enumerate(drone.route)}
+        truck_arrival = {}
+        truck_departure = {}
+        drone_arrival = {}
+        truck_wait = {}
+        sync_wait_times = {}
+        drone_wait = {}
+        hover_times = {}
+
+        def _end_time_slack(customer_id, arrival_time):
+            slack = self.customers[customer_id - 1].end_time - arrival_time
+            return slack if slack >= 0 else INF
+
+        def _launched_trips_slack(node):
+            # 以该节点为起飞节点的行程：起飞推迟量等于到达第一个位置的推迟量
+            slack = INF
+            for trip in drone.launch_map.get(node, []):
+                trip_slack = drone_arrival.get(trip_positions[id(trip)])
+                if trip_slack and len(trip_slack) > 1:
+                    slack = min(slack, trip_slack[1])
+            return slack
+
+        def _trip_slack(trip):
+            path = trip['path']
+            trip_idx = trip_positions[id(trip)]
+            slacks = [INF] * len(path)
+            waits = [0] * len(path)
+            drone_wait[trip_idx] = waits
+            retrieval = path[-1]
+            if retrieval in truck_departure:
+                r = retrieval - 1
+                # 无人机先到则在回收节点悬停等待卡车，悬停时间可吸收推迟
+                hover = max(self.Vist_T[r][2] - self.Vist_T[r][3], 0)
+                hover_times[trip_idx] = hover
+                slack = hover + truck_departure[retrieval]
+                if retrieval in drone.launch_map:
+                    # 回收节点同时为起飞节点：后续行程以无人机到达时间起飞
+                    slack = min(slack, _launched_trips_slack(retrieval))
+                slacks[-1] = slack
+            for k in range(len(path) - 2, 0, -1):
+                c = path[k] - 1
+                arrival = self.Vist_T[c][3]
+                wait = max(self.customers[c].start_time - arrival, 0)
+                waits[k] = wait
+                slacks[k] = min(_end_time_slack(path[k], arrival), wait + slacks[k + 1])
+            return slacks
+
+        next_arrival_slack = INF  # 返回仓库不受时间窗约束
+        for j in range(len(truck_route) - 2, 0, -1):
+            node = truck_route[j]
+            c = node - 1
+            truck_departure[node] = next_arrival_slack
+            for trip in drone.launch_map.get(node, []):
+                drone_arrival[trip_positions[id(trip)]] = _trip_slack(trip)
+            arrival = self.Vist_T[c][1]
+            service_begin = max(arrival, self.customers[c].start_time)
+            wait = service_begin - arrival
+            # 卡车在回收节点等待无人机的时间
+            sync_wait = max(self.Vist_T[c][2] - (service_begin + self.service_time), 0)
+            truck_wait[node] = wait
+            sync_wait_times[node] = sync_wait
+            slack = min(_end_time_slack(node, arrival), wait + sync_wait + truck_departure[node])
+            if node in drone.launch_map and (j == 1 or node not in drone.retrieval_map):
+                # 仅为起飞节点：无人机在卡车到达时起飞
+                slack = min(slack, _launched_trips_slack(node))
+            truck_arrival[node] = slack
+            next_arrival_slack = slack
+        return {
+            'truck_arrival': truck_arrival,
+            'truck_departure': truck_departure,
+            'drone_arrival': drone_arrival,
+            'truck_wait': truck_wait,
+            'sync_wait': sync_wait_times,
+            'drone_wait': drone_wait,
+            'hover': hover_times
+        }
+
+    def is_truck_insertion_time_feasible(self, truck_id: int, customer_id: int, position: int) -> bool:
+        """
+        O(1)判断在卡车路径position处插入客户是否会破坏时间窗（不修改任何状态）
+        """
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        if position <= 0 or position >= len(truck_route):
+            return True
+        customer = self.customers[customer_id - 1]
+        prev_node = truck_route[position - 1]
+        next_node = truck_route[position]
+        prev_departure = self.Vist_T[prev_node - 1][2] if prev_node != 0 else 0
+        arrival = prev_departure + self.Tdis[prev_node][customer_id] / self.truck_speed
+        if arrival > customer.end_time:
+            return False
+        if next_node == 0:
+            return True
+        departure = max(arrival, customer.start_time) + self.service_time
+        delay = departure + self.Tdis[customer_id][next_node] / self.truck_speed - self.Vist_T[next_node - 1][1]
+        return delay <= self.get_time_slack(truck_id)['truck_arrival'].get(next_node, float('inf')) + 1e-9
+
+    def is_drone_insertion_time_feasible(self, truck_id: int, trip_idx: int, customer_id: int, position: int) -> bool:
+        """
+        O(1)判断在无人机trip的path[position]之前插入客户是否会破坏时间窗（不修改任何状态）
+        """
+        path = self.DRONE_Routes[truck_id].route[trip_idx]['path']
+        if position <= 0 or position >= len(path):
+            return True
+        prev_node = path[position - 1]
+        next_node = path[position]
+        if prev_node == 0 or next_node == 0:
+            return True
+        customer = self.customers[customer_id - 1]
+        arrival = self.Vist_T[prev_node - 1][4] + self.Ddis[prev_node][customer_id] / self.drone_speed
+        if arrival > customer.end_time:
+            return False
+        departure = max(arrival, customer.start_time) + self.service_time
+        delay = departure + self.Ddis[customer_id][next_node] / self.drone_speed - self.Vist_T[next_node - 1][3]
+        trip_slack = self.get_time_slack(truck_id)['drone_arrival'].get(trip_idx)
+        if not trip_slack or position >= len(trip_slack):
+            return True
+        return delay <= trip_slack[position] + 1e-9
+
+    def is_truck_position_time_feasible(self, truck_id: int, position: int, customer_id: int) -> bool:
+        """
+        局部搜索用O(1)预判：position之前的路径不变时，把customer_id放到position处
+        其到达时间是否会破坏原本满足的时间窗（必要条件，不修改任何状态）
+        """
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        if position <= 0 or position >= len(truck_route) - 1:
+            return True
+        customer = self.customers[customer_id - 1]
+        prev_node = truck_route[position - 1]
+        prev_departure = self.Vist_T[prev_node - 1][2] if prev_node != 0 else 0
+        arrival = prev_departure + self.Tdis[prev_node][customer_id] / self.truck_speed
+        current_arrival = self.Vist_T[customer_id - 1][1]
+        return arrival <= customer.end_time or current_arrival > customer.end_time
+
+    def get_customer_arrays(self) -> Dict:
+        """客户静态属性数组，下标为客户ID（0号为仓库占位）"""
+        if self._customer_arrays is None or len(self._customer_arrays['demand']) != len(self.customers) + 1:
+            size = len(self.customers) + 1
+            demand = np.zeros(size)
+            start_time = np.full(size, np.nan)
+            end_time = np.full(size, np.nan)
+            for i, customer in enumerate(self.customers, start=1):
+                demand[i] = customer.demand
+                start_time[i] = np.nan if customer.start_time is None else customer.start_time
+                end_time[i] = np.nan if customer.end_time is None else customer.end_time
+            self._customer_arrays = {'demand': demand, 'start_time': start_time, 'end_time': end_time}
+        return self._customer_arrays
+
+    def get_nearest_neighbours(self, vehicle_type: str = 'truck', k: int = None) -> List[np.ndarray]:
+        """
+        各客户按卡车（或无人机）距离升序排列的k个最近邻客户（不含仓库及自身，实例静态，只构建一次）
+        Args:
+            vehicle_type: 'truck'使用ALLdistanceTmatrix，'drone'使用ALLdistanceDmatrix
+            k: 最近邻个数，None时使用neighbour_list_size
+        Returns:
+            List[np.ndarray]: 下标为客户ID（0号为仓库占位）
+        """
+        size = len(self.customers) + 1
+        k = min(self.neighbour_list_size if k is None else k, size - 2)
+        cache_key = (vehicle_type, k)
+        neighbours = self._nearest_neighbours.get(cache_key)
+        if neighbours is None or len(neighbours) != size:
+            source = self.get_drone_distance_array() if vehicle_type == 'drone' else self.get_truck_distance_array()
+            distance = source[:size, :size].copy()
+            distance[:, 0] = np.inf
+            np.fill_diagonal(distance, np.inf)
+            neighbours = [np.empty(0, dtype=int)]
+            for customer_id in range(1, size):
+                row = distance[customer_id]
+                if k <= 0:
+                    neighbours.append(np.empty(0, dtype=int))
+                    continue
+                nearest = np.argpartition(row, k - 1)[:k]
+                nearest = nearest[np.isfinite(row[nearest])]
+                neighbours.append(nearest[np.argsort(row[nearest], kind='stable')])
+            self._nearest_neighbours[cache_key] = neighbours
+        return neighbours
+
+    def get_granular_neighbour_sets(self, vehicle_type: str, k: int) -> List[frozenset]:
+        """
+        粒度邻域：各客户的k个最近邻节点集合（含仓库0，保证路径首尾位置始终可选）
+        插入位置的前驱或后继在集合中时才参与评估
+        """
+        size = len(self.customers) + 1
+        cache_key = (vehicle_type, k)
+        sets = self._granular_neighbour_sets.get(cache_key)
+        if sets is None or len(sets) != size:
+            sets = [frozenset({0}.union(int(c) for c in nearest))
+                    for nearest in self.get_nearest_neighbours(vehicle_type, k)]
+            self._granular_neighbour_sets[cache_key] = sets
+        return sets
+
+    def get_shaw_relatedness(self) -> Dict:
+        """
+        Shaw相关度矩阵（距离与时间窗开始时间均为实例静态属性，只需构建一次）
+        R[i][j] = phi_d * d_ij / max(d) + phi_t * |start_i - start_j| / max(|Δstart|)，越小越相关
+        Returns:
+            Dict: {'matrix': 相关度矩阵（下标为客户ID，0号为仓库），
+                   'ranked': 每个客户按相关度升序排列的其他客户ID数组}
+        """
+        size = len(self.customers) + 1
+        if self._shaw_relatedness is None or len(self._shaw_relatedness['ranked']) != size:
+            phi_distance, phi_time = self.shaw_weights
+            distance = self.get_truck_distance_array()[:size, :size]
+            start_time = np.nan_to_num(self.get_customer_arrays()['start_time'])
+            time_gap = np.abs(start_time[:, None] - start_time[None, :])
+            max_distance = distance[1:, 1:].max() if size > 1 else 0
+            max_gap = time_gap[1:, 1:].max() if size > 1 else 0
+            matrix = (phi_distance * distance / (max_distance if max_distance > 0 else 1) +
+                      phi_time * time_gap / (max_gap if max_gap > 0 else 1))
+            # 排除仓库和客户自身后按相关度升序排列
+            masked = matrix.copy()
+            masked[:, 0] = np.inf
+            np.fill_diagonal(masked, np.inf)
+            ranked = [np.empty(0, dtype=int)]
+            for customer_id in range(1, size):
+                ranked.append(np.argsort(masked[customer_id], kind='stable')[:size - 2])
+            self._shaw_relatedness = {'matrix': matrix, 'ranked': ranked}
+        return self._shaw_relatedness
+
+    # ==================== 前缀载重剖面 ====================
+    def invalidate_load_profile(self, vehicle_id=None):
+        """使车辆对载重剖面失效（vehicle_id为None时全部失效）"""
+        if vehicle_id is None:
+            self._load_profile_cache.clear()
+        else:
+            self._load_profile_cache.pop(vehicle_id, None)
+
+    def get_load_profile(self, truck_id: int) -> Dict:
+        """获取车辆对的前缀载重剖面（失效时按当前路径与服务状态重新计算）"""
+        profile = self._load_profile_cache.get(truck_id)
+        if profile is None:
+            profile = self._compute_load_profile(truck_id)
+            self._load_profile_cache[truck_id] = profile
+        return profile
+
+    def _effective_demand(self, customer_id: int) -> Tuple[float, float]:
+        """客户按计划执行时的(送货量, 取货量)：服务失败的客户不改变载重"""
+        customer = self.customers[customer_id - 1]
+        if customer.success is False:
+            return 0, 0
+        if customer.demand > 0:
+            return customer.demand, 0
+        return 0, abs(customer.demand)
+
+    @staticmethod
+    def _running_max(values: List[float]) -> Tuple[List[float], List[float]]:
+        """前缀最大值与后缀最大值，用于O(1)区间最大值查询"""
+        prefix_max = list(values)
+        for i in range(1, len(prefix_max)):
+            prefix_max[i] = max(prefix_max[i - 1], prefix_max[i])
+        suffix_max = list(values)
+        for i in range(len(suffix_max) - 2, -1, -1):
+            suffix_max[i] = max(suffix_max[i + 1], suffix_max[i])
+        return prefix_max, suffix_max
+
+    def _compute_trip_load_profile(self, path: List[int]) -> Dict:
+        """
+        无人机任务载重剖面：load[k]为离开path[k]时的载重
+        起飞时携带path中全部送货包裹（含送货失败的包裹），之后按计划送货/取货
+        """
+        customers_in_path = [c for c in path[1:-1] if c != 0]
+        delivery_remaining = sum(self.customers[c - 1].demand for c in customers_in_path
+                                 if self.customers[c - 1].demand > 0)
+        pickup_collected = 0
+        load = [delivery_remaining + pickup_collected]
+        for customer_id in path[1:-1]:
+            if customer_id != 0:
+                delivery, pickup = self._effective_demand(customer_id)
+                delivery_remaining -= delivery
+                pickup_collected += pickup
+            load.append(delivery_remaining + pickup_collected)
+        if len(path) > 1:
+            load.append(load[-1])
+        prefix_max, suffix_max = self._running_max(load)
+        return {
+            'delivery_remaining': delivery_remaining,  # 返回卡车时仍在无人机上的送货包裹
+            'pickup_collected': pickup_collected,  # 返回卡车时携带的取货量
+            'load': load,
+            'prefix_max': prefix_max,
+            'suffix_max': suffix_max
+        }
+
+    def _compute_load_profile(self, truck_id: int) -> Dict:
+        """
+        车辆对前缀载重剖面（按计划执行整条路径，已服务客户按实际状态计入）
+        Returns:
+            Dict: {
+                'delivery_remaining': [离开卡车路径各位置时车上剩余的送货包裹],
+                'pickup_collected': [离开卡车路径各位置时车上累计的取货量],
+                'load': [两者之和],
+                'prefix_max'/'suffix_max': load的前缀/后缀最大值,
+                'trips': {trip下标: 无人机任务载重剖面（另含launch_pos/retrieval_pos）}
+            }
+        卡车从仓库出发时携带自身及所有无人机任务的送货包裹；在起飞节点交出该任务的送货包裹，
+        在回收节点收回无人机取到的货物以及送货失败的包裹。
+        """
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        last_pos = len(truck_route) - 1
+        route_positions = {}
+        for pos, node in enumerate(truck_route):
+            if node not in route_positions:
+                route_positions[node] = pos
+        route_positions[0] = 0  # 仓库起飞
+
+        trips = {}
+        launch_delivery = [0] * len(truck_route)  # 各位置起飞任务交出的送货包裹
+        retrieval_delivery = [0] * len(truck_route)  # 各位置回收任务带回的送货失败包裹
+        retrieval_pickup = [0] * len(truck_route)  # 各位置回收任务带回的取货量
+        delivery_remaining = 0
+        for trip_idx, trip in enumerate(self.DRONE_Routes[truck_id].route):
+            trip_profile = self._compute_trip_load_profile(trip['path'])
+            launch_pos = route_positions.get(trip['launch_node'])
+            retrieval_node = trip['retrieval_node']
+            retrieval_pos = last_pos if retrieval_node == 0 else route_positions.get(retrieval_node)
+            trip_profile['launch_pos'] = launch_pos
+            trip_profile['retrieval_pos'] = retrieval_pos
+            trips[trip_idx] = trip_profile
+            if launch_pos is None or retrieval_pos is None:
+                continue
+            delivery_remaining += trip_profile['load'][0]  # 无人机的送货包裹由卡车从仓库带出
+            launch_delivery[launch_pos] += trip_profile['load'][0]
+            retrieval_delivery[retrieval_pos] += trip_profile['delivery_remaining']
+            retrieval_pickup[retrieval_pos] += trip_profile['pickup_collected']
+
+        for customer_id in truck_route[1:-1]:
+            if customer_id != 0 and self.customers[customer_id - 1].demand > 0:
+                delivery_remaining += self.customers[customer_id - 1].demand
+
+        pickup_collected = 0
+        delivery_list = []
+        pickup_list = []
+        for pos, node in enumerate(truck_route):
+            if 0 < pos < last_pos and node != 0:
+                delivery, pickup = self._effective_demand(node)
+                delivery_remaining -= delivery
+                pickup_collected += pickup
+            # 先回收再起飞（同一节点先收回无人机再放飞下一任务）
+            delivery_remaining += retrieval_delivery[pos]
+            pickup_collected += retrieval_pickup[pos]
+            delivery_remaining -= launch_delivery[pos]
+            delivery_list.append(delivery_remaining)
+            pickup_list.append(pickup_collected)
+
+        load = [d + p for d, p in zip(delivery_list, pickup_list)]
+        prefix_max, suffix_max = self._running_max(load)
+        return {
+            'delivery_remaining': delivery_list,
+            'pickup_collected': pickup_list,
+            'load': load,
+            'prefix_max': prefix_max,
+            'suffix_max': suffix_max,
+            'trips': trips
+        }
+
+    def is_truck_insertion_load_feasible(self, truck_id: int, customer_id: int, position: int) -> bool:
+        """
+        O(1)判断在卡车路径Troute[position]之前插入客户是否超载（不修改任何状态）
+        送货客户使仓库到插入点之前的载重增加，取货客户使插入点之后的载重增加
+        """
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        if position <= 0 or position >= len(truck_route):
+            return False
+        capacity = self.TRUCK_Routes[truck_id].max_capacity
+        profile = self.get_load_profile(truck_id)
+        delivery, pickup = self._effective_demand(customer_id)
+        if delivery > 0:
+            return profile['prefix_max'][position - 1] + delivery <= capacity
+        return (profile['load'][position - 1] + pickup <= capacity and
+                profile['suffix_max'][position] + pickup <= capacity)
+
+    def is_drone_insertion_load_feasible(self, truck_id: int, trip_idx: int, customer_id: int,
+                                         position: int) -> bool:
+        """
+        O(1)判断在无人机任务path[position]之前插入客户是否使无人机或卡车超载（不修改任何状态）
+        """
+        profile = self.get_load_profile(truck_id)
+        trip_profile = profile['trips'].get(trip_idx)
+        if trip_profile is None or position <= 0 or position >= len(trip_profile['load']):
+            return False
+        delivery, pickup = self._effective_demand(customer_id)
+        truck_capacity = self.TRUCK_Routes[truck_id].max_capacity
+        launch_pos = trip_profile['launch_pos']
+        retrieval_pos = trip_profile['retrieval_pos']
+        if delivery > 0:
+            # 无人机起飞到插入点之前载重增加，卡车从仓库到起飞节点载重增加
+            if trip_profile['prefix_max'][position - 1] + delivery > self.drone_max_capacity:
+                return False
+            if launch_pos is not None and launch_pos > 0:
+                return profile['prefix_max'][launch_pos - 1] + delivery <= truck_capacity
+            return True
+        # 取货：无人机插入点之后载重增加，卡车从回收节点起载重增加
+        if trip_profile['load'][position - 1] + pickup > self.drone_max_capacity:
+            return False
+        if trip_profile['suffix_max'][position] + pickup > self.drone_max_capacity:
+            return False
+        if retrieval_pos is not None:
+            return profile['suffix_max'][retrieval_pos] + pickup <= truck_capacity
+        return True
+
+    def validate_load_profiles(self) -> bool:
+        """
+        一致性检查：缓存的载重剖面与从零重算结果对比，并抽查O(1)插入判断与逐点模拟是否一致
+        """
+        consistent = True
+        for truck_id, cached in list(self._load_profile_cache.items()):
+            actual = self._compute_load_profile(truck_id)
+            if cached['load'] != actual['load'] or \
+                    [t['load'] for t in cached['trips'].values()] != [t['load'] for t in actual['trips'].values()]:
+                print(f" 车辆对{truck_id}载重剖面缓存不一致")
+                consistent = False
+        for truck_id in range(len(self.TRUCK_Routes)):
+            truck_route = self.TRUCK_Routes[truck_id].Troute
+            capacity = self.TRUCK_Routes[truck_id].max_capacity
+            for customer in self.customers:
+                if customer.cust_no in self.node_index:
+                    continue
+                for position in range(1, len(truck_route)):
+                    truck_route.insert(position, customer.cust_no)
+                    expected = max(self._compute_load_profile(truck_id)['load']) <= capacity
+                    truck_route.pop(position)
+                    if expected != self.is_truck_insertion_load_feasible(truck_id, customer.cust_no, position):
+                        print(f" 车辆对{truck_id}在位置{position}插入客户{customer.cust_no}的载重判断不一致")
+                        consistent = False
+        return consistent
+
+    def propagate_failure_delay(self, truck_id: int, failed_customer_id: int, delay: float = None) -> List[Dict]:
+        """
+        失败客户处离开时间推迟delay后，沿车辆对路径一次向前传递推迟量（不修改任何状态）
+        每个位置先用预先计算的等待时间（等待时间窗开启、卡车等待无人机、无人机悬停等待卡车）吸收推迟，
+        推迟量被完全吸收且没有待回收的推迟无人机时立即停止
+        Returns:
+            List[Dict]: 到达时间被推迟的客户 [{'customer_id', 'vehicle_type', 'trip_index',
+                        'delay', 'time_window_violation', 'via_retrieval'}]
+        """
+        if delay is None:
+            delay = self.failure_time_delay
+        affected = []
+        entry = self.locate_customer(failed_customer_id, truck_id)
+        if entry is None or delay <= 0:
+            return affected
+        slack = self.get_time_slack(truck_id)
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        drone = self.DRONE_Routes[truck_id]
+        trips = drone.route
+        trip_positions = {id(trip): trip_idx for trip_idx, trip in enumerate(trips)}
+        pending_retrieval = {}  # {回收节点: 无人机到达推迟量}
+
+        def _record(customer_id, vehicle_type, trip_idx, arrival_delay, arrival_column, via_retrieval):
+            customer = self.customers[customer_id - 1]
+            arrival = self.Vist_T[customer_id - 1][arrival_column]
+            affected.append({
+                'customer_id': customer_id,
+                'vehicle_type': vehicle_type,
+                'trip_index': trip_idx,
+                'delay': arrival_delay,
+                # 只标记原本满足、推迟后被破坏的时间窗
+                'time_window_violation': arrival <= customer.end_time < arrival + arrival_delay,
+                'via_retrieval': via_retrieval
+            })
+
+        def _propagate_trip(trip_idx, start_pos, departure_delay, via_retrieval):
+            # 无人机从path[start_pos]离开推迟departure_delay，逐点吸收，到达回收节点的推迟记入pending
+            path = trips[trip_idx]['path']
+            waits = slack['drone_wait'].get(trip_idx)
+            for k in range(start_pos + 1, len(path) - 1):
+                if departure_delay <= 0:
+                    return
+                customer_id = path[k]
+                _record(customer_id, 'drone', trip_idx, departure_delay, 3, via_retrieval)
+                wait = waits[k] if waits else max(
+                    self.customers[customer_id - 1].start_time - self.Vist_T[customer_id - 1][3], 0)
+                departure_delay = max(departure_delay - wait, 0)
+            retrieval = path[-1]
+            if departure_delay > 0 and retrieval != 0:
+                # 无人机悬停等待卡车的时间吸收推迟
+                hover = slack['hover'].get(trip_idx)
+                if hover is None:
+                    hover = max(self.Vist_T[retrieval - 1][2] - self.Vist_T[retrieval - 1][3], 0)
+                if departure_delay > hover:
+                    pending_retrieval[retrieval] = max(pending_retrieval.get(retrieval, 0), departure_delay - hover)
+
+        failed_trip_idx = entry['trip_idx']
+        if failed_trip_idx is not None and entry['truck_pos'] is None:
+            # 无人机服务失败：推迟沿无人机任务传递，经回收节点影响卡车
+            _propagate_trip(failed_trip_idx, entry['path_pos'], delay, False)
+            retrieval = trips[failed_trip_idx]['path'][-1]
+            if retrieval not in pending_retrieval:
+                return affected
+            start = truck_route.index(retrieval) if retrieval in truck_route else len(truck_route) - 1
+            truck_delay = 0
+        else:
+            # 卡车服务失败：离开时间推迟，卡车等待无人机的时间可吸收
+            start = entry['truck_pos']
+            node = truck_route[start]
+            truck_delay = max(delay - slack['sync_wait'].get(node, 0), 0)
+            start += 1
+
+        via_retrieval = failed_trip_idx is not None and entry['truck_pos'] is None
+        for j in range(start, len(truck_route) - 1):
+            node = truck_route[j]
+            arrival_delay = truck_delay
+            retrieval_delay = pending_retrieval.pop(node, 0)
+            if arrival_delay <= 0 and retrieval_delay <= 0:
+                if not pending_retrieval:
+                    break
+                continue
+            if arrival_delay > 0:
+                _record(node, 'truck', None, arrival_delay, 1, via_retrieval)
+            ready_delay = max(arrival_delay - slack['truck_wait'].get(node, 0), 0)
+            if retrieval_delay > 0:
+                # 回收节点：离开时间为卡车服务完成与无人机到达的较晚者
+                truck_delay = max(ready_delay - slack['sync_wait'].get(node, 0), retrieval_delay)
+            else:
+                truck_delay = ready_delay
+            if node in drone.launch_map:
+                # 仅为起飞节点时无人机随卡车到达起飞；同时为回收节点时随无人机到达起飞
+                launch_delay = arrival_delay if j == 1 or node not in drone.retrieval_map else retrieval_delay
+                if launch_delay > 0:
+                    for trip in drone.launch_map[node]:
+                        _propagate_trip(trip_positions[id(trip)], 0, launch_delay, via_retrieval)
+        return affected
+
     def Update_visit_T(self, truck_id, customer_index):                          # 更新路径中的客户时间
-        launch_node=[]
-        retrieval_node=[]
-        if self.DRONE_Routes[truck_id].route:
-            launch_node = [trip['launch_node'] for trip in self.DRONE_Routes[truck_id].route]                        # 起飞节点集合
-            retrieval_node = [trip['retrieval_node'] for trip in self.DRONE_Routes[truck_id].route]                  # 回收节点集合
-        for j in range(customer_index, len(self.TRUCK_Routes[truck_id].Troute)-1):                                   # 从传入节点开始更新时间
+        self._time_slack_cache.pop(truck_id, None)
+        self.invalidate_vehicle_cost(truck_id)
+        self._propagate_visit_times(truck_id, customer_index, self.Vist_T)
+
+    def _propagate_visit_times(self, truck_id, customer_index, times, truck_route=None, trip_paths=None):
+        """
+        时间传播核心：从customer_index开始沿卡车路径写入到达/离开时间
+        times可以是Vist_T，也可以是VisitTimeOverlay（用于不修改状态的增量评估）
+        truck_route/trip_paths用于评估尚未执行的路径（trip_paths: {id(trip): 新path}）
+        """
+        if truck_route is None:
+            truck_route = self.TRUCK_Routes[truck_id].Troute
+        trip_paths = trip_paths or {}
+        launch_map = self.DRONE_Routes[truck_id].launch_map                                                             # 起飞节点 -> 行程
+        retrieval_map = self.DRONE_Routes[truck_id].retrieval_map                                                       # 回收节点 -> 行程
+        for j in range(customer_index, len(truck_route)-1):                                                             # 从传入节点开始更新时间
+            node = truck_route[j]
             if j-1==0:
-                j_index =  self.TRUCK_Routes[truck_id].Troute[j]-1
+                j_index =  node-1
                 distance=self.Tdis[0][j_index+1]
-                self.Vist_T[j_index][1]=distance/self.truck_speed                                                                               #更新卡车到达时间
-                self.Vist_T[j_index][2]=max(self.Vist_T[j_index][1], self.customers[self.Vist_T[j_index][0]-1].start_time)+self.service_time    #更新卡车离开时间
-                if self.TRUCK_Routes[truck_id].Troute[j] in launch_node:                                                                        #假设 当前节点仅为起飞节点时
-                    self.Vist_T[j_index][3] = self.Vist_T[j_index][1]
-                    self.Vist_T[j_index][4] = self.Vist_T[j_index][1]
-                    for trip in self.DRONE_Routes[truck_id].route:                                                                              #更新以当前节点为起飞节点的无人机路径
-                        if trip['launch_node'] == self.TRUCK_Routes[truck_id].Troute[j]:
-                            path=trip['path']
-                            for i in range(1, len(path)):
-                                prev_indices =  path[i - 1]-1
-                                current_indices =  path[i]-1
-                                distance = self.Ddis[prev_indices+1][current_indices+1]
-                                self.Vist_T[current_indices][3] = self.Vist_T[prev_indices][4]+distance/self.drone_speed
-                                self.Vist_T[current_indices][4] = max(self.Vist_T[current_indices][3], self.customers[self.Vist_T[current_indices][0]-1].start_time)+self.service_time
-                                if path[i] not in retrieval_node:
-                                    self.Vist_T[current_indices][1] = 0
-                                    self.Vist_T[current_indices][2] = 0
+                times[j_index][1]=distance/self.truck_speed                                                                               #更新卡车到达时间
+                times[j_index][2]=max(times[j_index][1], self.customers[times[j_index][0]-1].start_time)+self.service_time    #更新卡车离开时间
+                if node in launch_map:                                                                                                          #假设 当前节点仅为起飞节点时
+                    times[j_index][3] = times[j_index][1]
+                    times[j_index][4] = times[j_index][1]
+                    for trip in launch_map[node]:                                                                                               #更新以当前节点为起飞节点的无人机路径
+                        path = trip_paths.get(id(trip), trip['path'])
+                        for i in range(1, len(path)):
+                            prev_indices =  path[i - 1]-1
+                            current_indices =  path[i]-1
+                            distance = self.Ddis[prev_indices+1][current_indices+1]
+                            times[current_indices][3] = times[prev_indices][4]+distance/self.drone_speed
+                            times[current_indices][4] = max(times[current_indices][3], self.customers[times[current_indices][0]-1].start_time)+self.service_time
+                            if path[i] not in retrieval_map:
+                                times[current_indices][1] = 0
+                                times[current_indices][2] = 0
                 else:
-                    self.Vist_T[j_index][3] = self.Vist_T[j_index][1]
-                    self.Vist_T[j_index][4] = self.Vist_T[j_index][2]
+                    times[j_index][3] = times[j_index][1]
+                    times[j_index][4] = times[j_index][2]
             else:
-                j_index = self.TRUCK_Routes[truck_id].Troute[j]-1
-                prev_indices =  self.TRUCK_Routes[truck_id].Troute[j-1]-1
+                j_index = node-1
+                prev_node = truck_route[j-1]
+                prev_indices =  prev_node-1
                 distance = self.Tdis[prev_indices+1][j_index+1]
-                self.Vist_T[j_index][1] = distance / self.truck_speed+self.Vist_T[prev_indices][2]
-                self.Vist_T[j_index][2] = max(self.Vist_T[j_index][1], self.customers[self.Vist_T[j_index][0] - 1].start_time) + self.service_time
+                times[j_index][1] = distance / self.truck_speed+times[prev_indices][2]
+                times[j_index][2] = max(times[j_index][1], self.customers[times[j_index][0] - 1].start_time) + self.service_time
+                is_launch = node in launch_map
+                is_retrieval = node in retrieval_map
                 # 判断当前节点 卡车不搭载无人机
-                if (self.TRUCK_Routes[truck_id].Troute[j - 1] in launch_node and self.TRUCK_Routes[truck_id].Troute[j] not in retrieval_node) or (self.Vist_T[prev_indices][3] == 0 and self.TRUCK_Routes[truck_id].Troute[j] not in retrieval_node):
-                    self.Vist_T[j_index][3] = 0
-                    self.Vist_T[j_index][4] = 0
+                if (prev_node in launch_map and not is_retrieval) or (times[prev_indices][3] == 0 and not is_retrieval):
+                    times[j_index][3] = 0
+                    times[j_index][4] = 0
                 else:
-                    if self.TRUCK_Routes[truck_id].Troute[j] not in launch_node and self.TRUCK_Routes[truck_id].Troute[j] not in retrieval_node:       #当前节点为普通客户节点时
-                        self.Vist_T[j_index][3] = self.Vist_T[j_index][1]
-                        self.Vist_T[j_index][4] = self.Vist_T[j_index][2]
-                    if self.TRUCK_Routes[truck_id].Troute[j] in launch_node and self.TRUCK_Routes[truck_id].Troute[j] not in retrieval_node:           #当前节点仅为起飞节点时
-                        self.Vist_T[j_index][3] = self.Vist_T[j_index][1]
-                        self.Vist_T[j_index][4] = self.Vist_T[j_index][1]
-                        for trip in self.DRONE_Routes[truck_id].route:
-                            if trip['launch_node'] == self.TRUCK_Routes[truck_id].Troute[j]:
-                                path = trip['path']
-                                for i in range(1, len(path)):
-                                    prev_indices =  path[i - 1]-1
-                                    current_indices =  path[i]-1
-                                    distance = self.Ddis[prev_indices+1][current_indices+1]
-                                    self.Vist_T[current_indices][3] = self.Vist_T[prev_indices][4] + distance / self.drone_speed
-                                    self.Vist_T[current_indices][4] = max(self.Vist_T[current_indices][3],
-                                                       self.customers[self.Vist_T[current_indices][0] - 1].start_time) + self.service_time
-                                    if path[i] not in retrieval_node:
-                                        self.Vist_T[current_indices][1] = 0
-                                        self.Vist_T[current_indices][2] = 0
-                    if self.TRUCK_Routes[truck_id].Troute[j] in launch_node and self.TRUCK_Routes[truck_id].Troute[j] in retrieval_node:               #当前节点既为起飞节点又为回收节点时
-                        max_time=max(self.Vist_T[j_index][2], self.Vist_T[j_index][3])
-                        self.Vist_T[j_index][2] = max_time
-                        self.Vist_T[j_index][4] = self.Vist_T[j_index][3]
-                        for trip in self.DRONE_Routes[truck_id].route:
-                            if trip['launch_node'] == self.TRUCK_Routes[truck_id].Troute[j]:
-                                path = trip['path']
-                                for i in range(1, len(path)):
-                                    prev_indices =  path[i - 1]-1
-                                    current_indices =  path[i]-1
-                                    distance = self.Ddis[prev_indices+1][current_indices+1]
-                                    self.Vist_T[current_indices][3] = self.Vist_T[i - 1][4] + distance / self.drone_speed
-                                    self.Vist_T[current_indices][4] = max(self.Vist_T[current_indices][3], self.customers[self.Vist_T[current_indices][0] - 1].start_time) + self.service_time
-                                    if path[i] not in retrieval_node:
-                                        self.Vist_T[current_indices][1] = 0
-                                        self.Vist_T[current_indices][2] = 0
-                    if self.TRUCK_Routes[truck_id].Troute[j] not in launch_node and self.TRUCK_Routes[truck_id].Troute[j] in retrieval_node:  # 当前节点仅为回收节点时
-                        max_time = max(self.Vist_T[j_index][2], self.Vist_T[j_index][3])
-                        self.Vist_T[j_index][2] = max_time
-                        self.Vist_T[j_index][4] = self.Vist_T[j_index][2]
-
-    def calculate_energy(self, time, drone_route, demand):     # 传入参数 无人机起飞节点的出发时间 无人机路径
+                    if not is_launch and not is_retrieval:                                                                                      #当前节点为普通客户节点时
+                        times[j_index][3] = times[j_index][1]
+                        times[j_index][4] = times[j_index][2]
+                    if is_launch and not is_retrieval:                                                                                          #当前节点仅为起飞节点时
+                        times[j_index][3] = times[j_index][1]
+                        times[j_index][4] = times[j_index][1]
+                        for trip in launch_map[node]:
+                            path = trip_paths.get(id(trip), trip['path'])
+                            for i in range(1, len(path)):
+                                prev_indices =  path[i - 1]-1
+                                current_indices =  path[i]-1
+                                distance = self.Ddis[prev_indices+1][current_indices+1]
+                                times[current_indices][3] = times[prev_indices][4] + distance / self.drone_speed
+                                times[current_indices][4] = max(times[current_indices][3],
+                                                   self.customers[times[current_indices][0] - 1].start_time) + self.service_time
+                                if path[i] not in retrieval_map:
+                                    times[current_indices][1] = 0
+                                    times[current_indices][2] = 0
+                    if is_launch and is_retrieval:                                                                                              #当前节点既为起飞节点又为回收节点时
+                        max_time=max(times[j_index][2], times[j_index][3])
+                        times[j_index][2] = max_time
+                        times[j_index][4] = times[j_index][3]
+                        for trip in launch_map[node]:
+                            path = trip_paths.get(id(trip), trip['path'])
+                            for i in range(1, len(path)):
+                                prev_indices =  path[i - 1]-1
+                                current_indices =  path[i]-1
+                                distance = self.Ddis[prev_indices+1][current_indices+1]
+                                times[current_indices][3] = times[prev_indices][4] + distance / self.drone_speed
+                                times[current_indices][4] = max(times[current_indices][3], self.customers[times[current_indices][0] - 1].start_time) + self.service_time
+                                if path[i] not in retrieval_map:
+                                    times[current_indices][1] = 0
+                                    times[current_indices][2] = 0
+                    if not is_launch and is_retrieval:  # 当前节点仅为回收节点时
+                        max_time = max(times[j_index][2], times[j_index][3])
+                        times[j_index][2] = max_time
+                        times[j_index][4] = times[j_index][2]
+
+    def calculate_energy(self, time, drone_route, demand, retrieval_departure=None):     # 传入参数 无人机起飞节点的出发时间 无人机路径 （可选）回收节点卡车离开时间
+        """
+        无人机行程能耗（带LRU缓存）
+        缓存签名: (路径, 取整后的起飞时间, 初始载重, 路径客户成功状态掩码, 取整后的回收节点卡车离开时间)
+        """
+        if not self.energy_cache_enabled:
+            return self._calculate_energy_uncached(time, drone_route, demand, retrieval_departure)
+        if retrieval_departure is None and len(drone_route) > 2:
+            retrieval_departure = self.Vist_T[drone_route[-1] - 1][2]
+        epsilon = self.energy_cache_epsilon
+        success_mask = 0
+        for bit, node in enumerate(drone_route[1:]):
+            if self.customers[node - 1].success is not False:
+                success_mask |= 1 << bit
+        key = (tuple(drone_route), round(time / epsilon), demand, success_mask,
+               round(retrieval_departure / epsilon) if retrieval_departure is not None else None)
+        energy = self._energy_cache.get(key)
+        if energy is not None:
+            self._energy_cache.move_to_end(key)
+            self.energy_cache_stats['hits'] += 1
+            return energy
+        self.energy_cache_stats['misses'] += 1
+        energy = self._calculate_energy_uncached(time, drone_route, demand, retrieval_departure)
+        self._energy_cache[key] = energy
+        if len(self._energy_cache) > self.energy_cache_size:
+            self._energy_cache.popitem(last=False)
+        return energy
+
+    def clear_energy_cache(self):
+        """清空能耗缓存及统计"""
+        self._energy_cache.clear()
+        self.energy_cache_stats = {'hits': 0, 'misses': 0}
+
+    def print_energy_cache_stats(self):
+        """打印能耗缓存命中统计"""
+        hits = self.energy_cache_stats['hits']
+        misses = self.energy_cache_stats['misses']
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+        print(f"能耗缓存: {hits}次命中, {misses}次未命中 (命中率{hit_rate:.1f}%), "
+              f"当前{len(self._energy_cache)}/{self.energy_cache_size}条")
+
+    def _calculate_energy_uncached(self, time, drone_route, demand, retrieval_departure=None):   # 完整计算无人机行程能耗
         curent_load=demand
         arrival_time=0
         depart_time=0
@@ -5402,7 +7024,9 @@ class Dynamic_Optimization:
                 travel_time = self.ALLdistanceDmatrix[prev_indices+1][current_indices+1] / self.drone_speed
                 arrival_time += travel_time + depart_time
                 energy_neeed += (curent_load + self.drone_weight) * travel_time * self.energy_fight
-                wait_time = max(0, self.Vist_T[current_indices][2] - arrival_time)
+                if retrieval_departure is None:
+                    retrieval_departure = self.Vist_T[current_indices][2]
+                wait_time = max(0, retrieval_departure - arrival_time)
                 energy_neeed += (curent_load + self.drone_weight) * wait_time * self.energy_hover
             else:
                 prev_indices =  drone_route[i - 1]-1
@@ -5422,7 +7046,22 @@ class Dynamic_Optimization:
                         curent_load += abs(customer.demand)
         return  energy_neeed
 
-    def cost_single_vehicle(self, vehicle_id):                   # 计算单一车辆对成本
+    def invalidate_vehicle_cost(self, vehicle_id=None):
+        """使车辆对成本缓存失效（vehicle_id为None时全部失效）"""
+        if vehicle_id is None:
+            self._vehicle_cost_cache.clear()
+        else:
+            self._vehicle_cost_cache.pop(vehicle_id, None)
+        self._total_cost_cache = None
+
+    def cost_single_vehicle(self, vehicle_id):                   # 计算单一车辆对成本（带缓存）
+        cost = self._vehicle_cost_cache.get(vehicle_id)
+        if cost is None:
+            cost = self._compute_vehicle_cost(vehicle_id)
+            self._vehicle_cost_cache[vehicle_id] = cost
+        return cost
+
+    def _compute_vehicle_cost(self, vehicle_id):                 # 完整计算单一车辆对成本
         cost=22.0  #固定成本
         lenth_truck=len(self.TRUCK_Routes[vehicle_id].Troute)
         for i in range(1, lenth_truck):
@@ -5439,12 +7078,369 @@ class Dynamic_Optimization:
         return cost
 
     def cost(self):  # 计算所有成本
-        cost=0.0
-        lenth=len(self.TRUCK_Routes)
-        for vehicle_id in range(lenth):
-            cost+=self.cost_single_vehicle(vehicle_id)
+        if self._total_cost_cache is None:
+            cost=0.0
+            lenth=len(self.TRUCK_Routes)
+            for vehicle_id in range(lenth):
+                cost+=self.cost_single_vehicle(vehicle_id)
+            self._total_cost_cache = cost
+        if self.debug_cost_cache:
+            self.validate_cost_cache()
+        return self._total_cost_cache
+
+    def validate_cost_cache(self) -> bool:
+        """
+        一致性检查：将缓存的车辆对成本与完整重算结果逐项对比
+        """
+        mismatches = []
+        for vehicle_id, cached_cost in self._vehicle_cost_cache.items():
+            actual_cost = self._compute_vehicle_cost(vehicle_id)
+            if abs(cached_cost - actual_cost) > 1e-6:
+                mismatches.append((vehicle_id, cached_cost, actual_cost))
+        if mismatches:
+            print(f" 成本缓存不一致: {len(mismatches)}个车辆对")
+            for vehicle_id, cached_cost, actual_cost in mismatches:
+                print(f"   车辆对{vehicle_id}: 缓存={cached_cost:.4f}, 重算={actual_cost:.4f}")
+            return False
+        return True
+
+    # ==================== 增量成本评估（不修改状态） ====================
+    def _truck_leg_cost(self, prev_node, node, is_last):
+        """卡车路径中终点位于某位置的一段成本（与cost_single_vehicle一致：返回仓库的最后一段不计）"""
+        if is_last:
+            return 0.0
+        return self.ALLdistanceTmatrix[prev_node][node] * self.cost_truck
+
+    def _truck_positions_cost(self, node_at, length, positions):
+        """路径中以positions为终点的各段成本之和，node_at(i)返回位置i的节点"""
+        cost = 0.0
+        for i in positions:
+            if 1 <= i <= length - 1:
+                prev_node = 0 if i == 1 else node_at(i - 1)
+                cost += self._truck_leg_cost(prev_node, node_at(i), i == length - 1)
         return cost
 
+    def _truck_insert_distance_delta(self, node_at, length, customer_id, position):
+        """在position处插入customer_id的卡车成本变化"""
+        def new_node_at(i):
+            if i < position:
+                return node_at(i)
+            return customer_id if i == position else node_at(i - 1)
+        return (self._truck_positions_cost(new_node_at, length + 1, (position, position + 1)) -
+                self._truck_positions_cost(node_at, length, (position,)))
+
+    def _truck_remove_distance_delta(self, node_at, length, position):
+        """删除position处节点的卡车成本变化"""
+        def new_node_at(i):
+            return node_at(i) if i < position else node_at(i + 1)
+        return (self._truck_positions_cost(new_node_at, length - 1, (position,)) -
+                self._truck_positions_cost(node_at, length, (position, position + 1)))
+
+    def _trip_energy(self, trip, times, path=None):
+        """按给定时间视图计算行程能耗（与cost_single_vehicle的计算口径一致）"""
+        if path is None:
+            path = trip['path']
+        return self.calculate_energy(times[trip['launch_node'] - 1][4], path, trip['initial_load'],
+                                     times[path[-1] - 1][2])
+
+    def _drone_energy_delta(self, truck_id, start_pos, truck_route=None, trip_paths=None, propagate=True):
+        """
+        路径变化引起的无人机能耗成本变化
+        propagate=False: 保持当前Vist_T时间不变（与局部搜索、无人机插入的执行方式一致）
+        propagate=True: 在写时复制视图上模拟Update_visit_T(truck_id, start_pos)后的时间
+        """
+        trip_paths = trip_paths or {}
+        times = self.Vist_T
+        if propagate:
+            times = VisitTimeOverlay(self.Vist_T)
+            self._propagate_visit_times(truck_id, start_pos, times, truck_route, trip_paths)
+        delta = 0.0
+        for trip in self.DRONE_Routes[truck_id].route:
+            new_path = trip_paths.get(id(trip))
+            if new_path is None:
+                if not propagate or not (times.is_changed(trip['launch_node'] - 1) or
+                                         times.is_changed(trip['path'][-1] - 1)):
+                    continue
+            delta += self._trip_energy(trip, times, new_path) - self._trip_energy(trip, self.Vist_T)
+        return delta * self.cost_drone
+
+    def delta_insert(self, truck_id: int, customer_id: int, position: int,
+                     trip_idx: Optional[int] = None, propagate: bool = False) -> float:
+        """
+        插入客户的成本变化（不修改任何状态）
+        trip_idx为None时插入卡车路径position处，否则插入该无人机行程path的position处
+        """
+        if trip_idx is None:
+            truck_route = self.TRUCK_Routes[truck_id].Troute
+            delta = self._truck_insert_distance_delta(truck_route.__getitem__, len(truck_route),
+                                                      customer_id, position)
+            if propagate:
+                new_route = truck_route[:position] + [customer_id] + truck_route[position:]
+                delta += self._drone_energy_delta(truck_id, position, truck_route=new_route)
+            return delta
+        trip = self.DRONE_Routes[truck_id].route[trip_idx]
+        new_path = trip['path'][:position] + [customer_id] + trip['path'][position:]
+        start_pos = self.get_truck_position(truck_id, trip['launch_node']) if propagate else 1
+        return self._drone_energy_delta(truck_id, max(start_pos, 1), trip_paths={id(trip): new_path},
+                                        propagate=propagate)
+
+    def truck_insertion_deltas(self, truck_id: int, customer_id: int, positions=None) -> np.ndarray:
+        """
+        一次计算客户插入卡车路径多个位置的成本变化（与delta_insert逐位置计算一致，不修改任何状态）
+        positions为None时计算所有位置1..len(route)-1；返回仓库的最后一段不计成本
+        """
+        truck_route = np.asarray(self.TRUCK_Routes[truck_id].Troute)
+        length = len(truck_route)
+        positions = np.arange(1, length) if positions is None else np.asarray(positions, dtype=int)
+        distance = self.get_truck_distance_array()
+        prev_node = np.where(positions == 1, 0, truck_route[positions - 1])
+        next_node = truck_route[positions]
+        is_last = positions == length - 1
+        new_cost = (distance[prev_node, customer_id] * self.cost_truck +
+                    np.where(is_last, 0.0, distance[customer_id, next_node] * self.cost_truck))
+        old_cost = np.where(is_last, 0.0, distance[prev_node, next_node] * self.cost_truck)
+        return new_cost - old_cost
+
+    def drone_insertion_energy_bounds(self, truck_id: int, trip_idx: int, customer_id: int, positions) -> np.ndarray:
+        """
+        客户插入无人机行程多个位置的能耗成本下界（不修改任何状态），保证不大于delta_insert的结果
+        飞行与服务能耗只与距离和载重有关，可按原路径的载重剖面批量精确计算；
+        悬停能耗依赖逐点时间递推，下界中忽略插入后的悬停，并扣除插入点之后原有的悬停能耗（插入只会推迟到达）
+        行程只有起降节点时无法给出下界，返回-inf
+        """
+        positions = np.asarray(positions, dtype=int)
+        trip = self.DRONE_Routes[truck_id].route[trip_idx]
+        path = trip['path']
+        if positions.size == 0 or len(path) < 3:
+            return np.full(positions.size, -np.inf)
+        distance = self.get_drone_distance_array()
+        nodes = np.asarray(path)
+        m = len(path) - 1
+        # 原路径剖面：第i段(path[i-1]→path[i])的飞行时间与载重、节点i的悬停能耗
+        travel = np.empty(m + 1)
+        leg_load = np.empty(m + 1)
+        hover = np.zeros(m + 1)
+        load = trip['initial_load']
+        depart_time = self.Vist_T[trip['launch_node'] - 1][4]
+        retrieval_departure = self.Vist_T[path[-1] - 1][2]
+        for i in range(1, m + 1):
+            travel[i] = distance[path[i - 1], path[i]] / self.drone_speed
+            leg_load[i] = load
+            arrival_time = depart_time + travel[i]
+            if i == m:
+                wait_time = max(0, retrieval_departure - arrival_time)
+            else:
+                customer = self.customers[path[i] - 1]
+                wait_time = max(0, customer.start_time - arrival_time)
+                depart_time = arrival_time + wait_time + self.service_time
+                if customer.success is not False:
+                    load = load - customer.demand if customer.demand > 0 else load + abs(customer.demand)
+            hover[i] = (leg_load[i] + self.drone_weight) * wait_time * self.energy_hover
+        # 插入客户后的载重变化
+        customer = self.customers[customer_id - 1]
+        load_change = 0.0
+        if customer.success is not False:
+            load_change = -customer.demand if customer.demand > 0 else abs(customer.demand)
+        travel_suffix = np.concatenate((np.cumsum(travel[:0:-1])[::-1], [0.0]))  # travel_suffix[p] = Σ travel[p+1..m]
+        hover_suffix = np.concatenate((np.cumsum(hover[:0:-1])[::-1], [0.0]))
+        loaded = leg_load[positions] + self.drone_weight
+        to_customer = distance[nodes[positions - 1], customer_id] / self.drone_speed
+        from_customer = distance[customer_id, nodes[positions]] / self.drone_speed
+        energy = (self.energy_fight * (loaded * to_customer + (loaded + load_change) * from_customer -
+                                       loaded * travel[positions]) +
+                  self.energy_service * self.service_time * loaded +
+                  load_change * (self.energy_fight * travel_suffix[positions] +
+                                 self.energy_service * self.service_time * (m - positions)) -
+                  hover_suffix[positions - 1])
+        # 能耗缓存按取整后的时间复用结果，为取整误差与浮点误差预留余量
+        margin = (2 * self.energy_cache_epsilon * self.energy_hover * float(np.sum(leg_load[1:] + self.drone_weight)) +
+                  1e-9 * (1 + np.abs(energy)))
+        return (energy - margin) * self.cost_drone
+
+    def get_truck_distance_array(self) -> np.ndarray:
+        """ALLdistanceTmatrix的numpy数组视图（实例静态，只转换一次），供向量化计算使用"""
+        if self._truck_distance_array is None:
+            self._truck_distance_array = np.asarray(self.ALLdistanceTmatrix, dtype=float)
+        return self._truck_distance_array
+
+    def get_drone_distance_array(self) -> np.ndarray:
+        """ALLdistanceDmatrix的numpy数组视图（实例静态，只转换一次）"""
+        if self._drone_distance_array is None:
+            self._drone_distance_array = np.asarray(self.ALLdistanceDmatrix, dtype=float)
+        return self._drone_distance_array
+
+    def truck_removal_gains(self, truck_id: int, positions) -> np.ndarray:
+        """
+        一次计算卡车路径多个位置客户的移除收益（-delta_remove，不修改任何状态）
+        按前后节点下标数组在距离矩阵上批量取值；返回仓库的最后一段不计成本
+        """
+        truck_route = np.asarray(self.TRUCK_Routes[truck_id].Troute)
+        positions = np.asarray(positions, dtype=int)
+        length = len(truck_route)
+        distance = self.get_truck_distance_array()
+        customer = truck_route[positions]
+        prev_node = np.where(positions == 1, 0, truck_route[positions - 1])
+        next_node = truck_route[positions + 1]
+        removed_cost = (distance[prev_node, customer] +
+                        np.where(positions + 1 == length - 1, 0.0, distance[customer, next_node]))
+        added_cost = np.where(positions == length - 2, 0.0, distance[prev_node, next_node])
+        return (removed_cost - added_cost) * self.cost_truck
+
+    def delta_remove(self, truck_id: int, customer_id: int, propagate: bool = False) -> float:
+        """
+        删除客户的成本变化（不修改任何状态）
+        起飞/回收节点的删除会连带调整无人机行程，此处只评估卡车距离部分
+        """
+        entry = self.locate_customer(customer_id, truck_id)
+        if entry is None:
+            return 0.0
+        if entry['truck_pos'] is not None:
+            truck_route = self.TRUCK_Routes[truck_id].Troute
+            position = entry['truck_pos']
+            delta = self._truck_remove_distance_delta(truck_route.__getitem__, len(truck_route), position)
+            if propagate and not entry['launch_trips'] and not entry['retrieval_trips']:
+                new_route = truck_route[:position] + truck_route[position + 1:]
+                delta += self._drone_energy_delta(truck_id, position, truck_route=new_route)
+            return delta
+        trip = self.DRONE_Routes[truck_id].route[entry['trip_idx']]
+        path_pos = entry['path_pos']
+        new_path = trip['path'][:path_pos] + trip['path'][path_pos + 1:]
+        start_pos = self.get_truck_position(truck_id, trip['launch_node']) if propagate else 1
+        return self._drone_energy_delta(truck_id, max(start_pos, 1), trip_paths={id(trip): new_path},
+                                        propagate=propagate)
+
+    def delta_swap(self, truck_id: int, pos1: int, pos2: int, propagate: bool = False) -> float:
+        """交换卡车路径两个位置客户的成本变化（不修改任何状态）"""
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        if pos1 == pos2:
+            return 0.0
+        pos1, pos2 = min(pos1, pos2), max(pos1, pos2)
+        swapped = {pos1: truck_route[pos2], pos2: truck_route[pos1]}
+        positions = sorted({pos1, pos1 + 1, pos2, pos2 + 1})
+        delta = (self._truck_positions_cost(lambda i: swapped.get(i, truck_route[i]), len(truck_route), positions) -
+                 self._truck_positions_cost(truck_route.__getitem__, len(truck_route), positions))
+        if propagate:
+            new_route = list(truck_route)
+            new_route[pos1], new_route[pos2] = new_route[pos2], new_route[pos1]
+            delta += self._drone_energy_delta(truck_id, pos1, truck_route=new_route)
+        return delta
+
+    def delta_reverse(self, truck_id: int, i: int, j: int, propagate: bool = False) -> float:
+        """逆转卡车路径i..j段（2-opt）的成本变化（不修改任何状态）"""
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        if i >= j:
+            return 0.0
+        def new_node_at(k):
+            return truck_route[i + j - k] if i <= k <= j else truck_route[k]
+        # 距离矩阵不一定对称，逆转段内部各段也需要重新计算
+        positions = range(i, j + 2)
+        delta = (self._truck_positions_cost(new_node_at, len(truck_route), positions) -
+                 self._truck_positions_cost(truck_route.__getitem__, len(truck_route), positions))
+        if propagate:
+            new_route = truck_route[:i] + truck_route[i:j + 1][::-1] + truck_route[j + 1:]
+            delta += self._drone_energy_delta(truck_id, i, truck_route=new_route)
+        return delta
+
+    def delta_relocate(self, truck_id: int, from_pos: int, to_pos: int, propagate: bool = False) -> float:
+        """
+        将卡车路径from_pos处客户移到to_pos的成本变化（to_pos为删除后列表中的下标，与list.remove+insert一致）
+        """
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        customer_id = truck_route[from_pos]
+        length = len(truck_route)
+        def removed_node_at(k):
+            return truck_route[k] if k < from_pos else truck_route[k + 1]
+        delta = (self._truck_remove_distance_delta(truck_route.__getitem__, length, from_pos) +
+                 self._truck_insert_distance_delta(removed_node_at, length - 1, customer_id, to_pos))
+        if propagate:
+            new_route = truck_route[:from_pos] + truck_route[from_pos + 1:]
+            new_route.insert(to_pos, customer_id)
+            delta += self._drone_energy_delta(truck_id, min(from_pos, to_pos), truck_route=new_route)
+        return delta
+
+    def validate_delta_evaluation(self, truck_id: int, samples: int = 20, propagate: bool = False) -> bool:
+        """
+        一致性检查：随机抽取移动，将增量评估结果与“在副本上执行并重算成本”逐项对比
+        propagate=True时副本执行后调用Update_visit_T，否则保持时间不变
+        """
+        truck_route = self.TRUCK_Routes[truck_id].Troute
+        trips = self.DRONE_Routes[truck_id].route
+        base_cost = self._compute_vehicle_cost(truck_id)
+        mismatches = []
+        for _ in range(samples):
+            move = random.choice(['insert', 'remove', 'swap', 'reverse', 'relocate', 'drone_insert', 'drone_remove'])
+            plain_nodes = [c for c in truck_route[1:-1]
+                           if c not in self.DRONE_Routes[truck_id].launch_map
+                           and c not in self.DRONE_Routes[truck_id].retrieval_map]
+            served = set(truck_route) | {c for trip in trips for c in trip['path']}
+            unserved = [c for c in range(1, len(self.customers) + 1) if c not in served]
+            n = len(truck_route)
+            if move in ('insert', 'drone_insert') and not unserved:
+                continue
+            if move in ('swap', 'reverse', 'relocate') and n < 5:
+                continue
+            copy_opt = copy.deepcopy(self)
+            copy_route = copy_opt.TRUCK_Routes[truck_id].Troute
+            if move == 'insert':
+                customer_id, position = random.choice(unserved), random.randint(1, n - 1)
+                predicted = self.delta_insert(truck_id, customer_id, position, propagate=propagate)
+                copy_route.insert(position, customer_id)
+                start_pos = position
+            elif move == 'remove':
+                if not plain_nodes:
+                    continue
+                customer_id = random.choice(plain_nodes)
+                position = truck_route.index(customer_id)
+                predicted = self.delta_remove(truck_id, customer_id, propagate=propagate)
+                copy_route.pop(position)
+                start_pos = position
+            elif move == 'swap':
+                pos1, pos2 = random.sample(range(1, n - 1), 2)
+                predicted = self.delta_swap(truck_id, pos1, pos2, propagate=propagate)
+                copy_route[pos1], copy_route[pos2] = copy_route[pos2], copy_route[pos1]
+                start_pos = min(pos1, pos2)
+            elif move == 'reverse':
+                i = random.randint(1, n - 3)
+                j = random.randint(i + 1, n - 2)
+                predicted = self.delta_reverse(truck_id, i, j, propagate=propagate)
+                copy_route[i:j + 1] = copy_route[i:j + 1][::-1]
+                start_pos = i
+            elif move == 'relocate':
+                from_pos = random.randint(1, n - 2)
+                to_pos = random.choice([k for k in range(1, n - 2) if k != from_pos] or [from_pos])
+                predicted = self.delta_relocate(truck_id, from_pos, to_pos, propagate=propagate)
+                customer_id = copy_route.pop(from_pos)
+                copy_route.insert(to_pos, customer_id)
+                start_pos = min(from_pos, to_pos)
+            else:
+                if not trips:
+                    continue
+                trip_idx = random.randrange(len(trips))
+                copy_path = copy_opt.DRONE_Routes[truck_id].route[trip_idx]['path']
+                if move == 'drone_insert':
+                    customer_id, position = random.choice(unserved), random.randint(1, len(copy_path) - 1)
+                    predicted = self.delta_insert(truck_id, customer_id, position, trip_idx=trip_idx,
+                                                  propagate=propagate)
+                    copy_path.insert(position, customer_id)
+                else:
+                    if len(copy_path) <= 2:
+                        continue
+                    customer_id = copy_path[random.randint(1, len(copy_path) - 2)]
+                    predicted = self.delta_remove(truck_id, customer_id, propagate=propagate)
+                    copy_path.remove(customer_id)
+                start_pos = max(self.get_truck_position(truck_id, trips[trip_idx]['launch_node']), 1)
+            if propagate:
+                copy_opt._propagate_visit_times(truck_id, start_pos, copy_opt.Vist_T)
+            actual = copy_opt._compute_vehicle_cost(truck_id) - base_cost
+            if abs(predicted - actual) > 1e-6:
+                mismatches.append((move, predicted, actual))
+        if mismatches:
+            print(f" 增量成本评估不一致: {len(mismatches)}/{samples}")
+            for move, predicted, actual in mismatches[:10]:
+                print(f"   {move}: 增量={predicted:.4f}, 重算={actual:.4f}")
+            return False
+        return True
+
     # ==================== 信息素机制方法 ====================
 
     def initialize_pheromone_matrix(self):
@@ -5456,6 +7452,8 @@ class Dynamic_Optimization:
         self.pheromone_matrix = np.full((matrix_size, matrix_size), self.pheromone_initial, dtype=float)
         # 设置对角线为0（避免自循环）
         np.fill_diagonal(self.pheromone_matrix, 0.0)
+        self._pheromone_candidates.clear()
+        self._pheromone_candidate_sets.clear()
         print(f"信息素矩阵初始化完成，大小: {matrix_size}×{matrix_size}")
         print(f"对角线检查: {np.sum(np.diag(self.pheromone_matrix))}")  # 应该为0
 
@@ -5535,6 +7533,7 @@ class Dynamic_Optimization:
             print(f" 警告：对角线不为0！更新前: {diagonal_before:.6f}, 更新后: {diagonal_after:.6f}")
         else:
             print(f" 对角线检查通过: {diagonal_after:.6f}")
+        self._refresh_pheromone_candidates()
         print(f" 信息素更新完成，改进比例: {improvement_ratio:.4f}")
 
     def evaporate_pheromone(self):
@@ -5551,8 +7550,67 @@ class Dynamic_Optimization:
         diagonal_after = np.sum(np.diag(self.pheromone_matrix))
         if abs(diagonal_after) > 1e-10:
             print(f" 挥发后对角线异常！挥发前: {diagonal_before:.6f}, 挥发后: {diagonal_after:.6f}")
+        self._refresh_pheromone_candidates()
         print(f" 信息素挥发完成，挥发率: {self.pheromone_evaporation_rate}")
 
+    def get_pheromone_candidate_lists(self, vehicle_type: str = 'truck', k: int = None) -> List[np.ndarray]:
+        """
+        各节点的k个候选后继客户（不含仓库及自身），按综合评分 α·1/max(距离, 0.1) + β·信息素 降序排列
+        与get_pheromone_guided_insertion_score的评分口径一致；首次使用时构建，之后只在
+        update_pheromone/evaporate_pheromone改变信息素时重算
+        Args:
+            vehicle_type: 'truck'使用ALLdistanceTmatrix，'drone'使用ALLdistanceDmatrix
+            k: 候选个数，None时使用neighbour_list_size
+        Returns:
+            List[np.ndarray]: 下标为节点ID（0号为仓库）
+        """
+        size = self.pheromone_matrix.shape[0]
+        k = min(self.neighbour_list_size if k is None else k, size - 2)
+        cache_key = (vehicle_type, k)
+        candidates = self._pheromone_candidates.get(cache_key)
+        if candidates is None:
+            candidates = self._build_pheromone_candidate_lists(vehicle_type, k)
+            self._pheromone_candidates[cache_key] = candidates
+        return candidates
+
+    def get_pheromone_candidate_sets(self, vehicle_type: str = 'truck', k: int = None) -> List[frozenset]:
+        """候选后继表的集合形式，供O(1)判断边(i, j)是否为候选边"""
+        size = self.pheromone_matrix.shape[0]
+        cache_key = (vehicle_type, min(self.neighbour_list_size if k is None else k, size - 2))
+        sets = self._pheromone_candidate_sets.get(cache_key)
+        if sets is None:
+            sets = [frozenset(int(c) for c in candidates)
+                    for candidates in self.get_pheromone_candidate_lists(vehicle_type, k)]
+            self._pheromone_candidate_sets[cache_key] = sets
+        return sets
+
+    def _build_pheromone_candidate_lists(self, vehicle_type: str, k: int) -> List[np.ndarray]:
+        """按当前信息素矩阵用argpartition为每个节点选出评分最高的k个后继并排序"""
+        size = self.pheromone_matrix.shape[0]
+        if k <= 0:
+            return [np.empty(0, dtype=int) for _ in range(size)]
+        source = self.get_drone_distance_array() if vehicle_type == 'drone' else self.get_truck_distance_array()
+        score = (self.pheromone_alpha / np.maximum(source[:size, :size], 0.1) +
+                 self.pheromone_beta * self.pheromone_matrix)
+        score[:, 0] = -np.inf
+        np.fill_diagonal(score, -np.inf)
+        top = np.argpartition(-score, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(score, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        return [top[node] for node in range(size)]
+
+    def _refresh_pheromone_candidates(self):
+        """信息素变化后重算已构建的候选后继表（集合形式在下次使用时重建）"""
+        for vehicle_type, k in list(self._pheromone_candidates):
+            self._pheromone_candidates[(vehicle_type, k)] = self._build_pheromone_candidate_lists(vehicle_type, k)
+        self._pheromone_candidate_sets.clear()
+
+    def is_pheromone_candidate_edge(self, from_node: int, to_node: int, k: int, vehicle_type: str = 'truck') -> bool:
+        """边(from_node, to_node)是否在候选后继表中；与仓库相连的边总是视为候选边"""
+        if from_node == 0 or to_node == 0:
+            return True
+        return to_node in self.get_pheromone_candidate_sets(vehicle_type, k)[from_node]
+
     def get_pheromone_guided_insertion_score(self, customer_id, prev_customer, next_customer,
                                              insertion_cost):
         """
@@ -5580,6 +7638,33 @@ class Dynamic_Optimization:
                        self.pheromone_beta * pheromone_score)
         return total_score
 
+    def get_pheromone_guided_insertion_scores(self, customer_id, prev_nodes, next_nodes,
+                                              insertion_costs) -> np.ndarray:
+        """
+        get_pheromone_guided_insertion_score的批量版本：一次计算一组插入位置的综合得分
+        Args:
+            customer_id: 要插入的客户ID
+            prev_nodes / next_nodes: 各插入位置的前后节点数组
+            insertion_costs: 各插入位置的插入成本数组
+        Returns:
+            np.ndarray: 各位置的综合得分
+        """
+        customer_id = self.safe_node_index(customer_id)
+        prev_ids = self._safe_node_indices(prev_nodes)
+        next_ids = self._safe_node_indices(next_nodes)
+        distance_score = 1.0 / np.maximum(np.asarray(insertion_costs, dtype=float), 0.1)
+        pheromone_score = self.pheromone_matrix[prev_ids, customer_id] + self.pheromone_matrix[customer_id, next_ids]
+        return self.pheromone_alpha * distance_score + self.pheromone_beta * pheromone_score
+
+    def _safe_node_indices(self, node_ids) -> np.ndarray:
+        """safe_node_index的批量版本：超出范围的节点ID按仓库0处理"""
+        node_ids = np.asarray(node_ids, dtype=int)
+        invalid = (node_ids < 0) | (node_ids > self.cnum)
+        if invalid.any():
+            print(f"  警告：节点ID {node_ids[invalid].tolist()} 超出范围 [0, {self.cnum}]")
+            node_ids = np.where(invalid, 0, node_ids)
+        return node_ids
+
     def print_pheromone_info(self):
             """
             打印信息素相关信息
@@ -5650,8 +7735,11 @@ class Dynamic_Optimization:
                     trip['retrieval_node'] = int(trip['retrieval_node'])
                 if original_path != cleaned_path:
                     trips_cleaned += 1
+            drone.rebuild_node_maps()  # 节点类型已变化，重建起飞/回收节点映射
             if trips_cleaned > 0:
                 print(f"    无人机{drone_idx}: {trips_cleaned}个任务已清理")
+        self.invalidate_load_profile()
+        self.invalidate_vehicle_cost()
         print(" 数据类型清理完成")
 
     # ==================== 局部搜索核心算法 ====================
@@ -5659,6 +7747,7 @@ class Dynamic_Optimization:
     def local_search(self, truck_id: int, current_cost: float) -> float:
         """
         车辆对内局部搜索主控制器
+        current_cost与返回值均为车辆对成本（cost_single_vehicle）
         """
         if not self.validate_customer_assignment(truck_id, next(iter(self.get_vehicle_customers(truck_id)), -1)):
             return current_cost
@@ -5743,18 +7832,20 @@ class Dynamic_Optimization:
         return should_trigger, trigger_reason
 
 
-    def _apply_intra_operator_with_feasibility_check(self, truck_id: int, operator_name: str, current_cost: float):
+    def _apply_intra_operator_with_feasibility_check(self, truck_id: int, operator_name: str, current_cost: float,
+                                                     move: Optional[Tuple[int, int]] = None):
         """
         执行车辆对内算子并进行可行性检查
+        current_cost为车辆对成本；move仅用于intra_move，指定(客户, 新位置)代替随机选择
         """
-        # 备份当前状态
-        backup_truck_route = copy.deepcopy(self.TRUCK_Routes[truck_id])
-        backup_drone_routes = copy.deepcopy(self.DRONE_Routes[truck_id])
+        # 备份当前状态（车辆对检查点，代替深拷贝）
+        checkpoint = self.checkpoint_vehicle(truck_id)
+        operation_successful = False
 
         try:
             # 执行局部搜索操作
             if operator_name == 'intra_move':
-                operation_success = self._intra_move_within_vehicle(truck_id)
+                operation_success = self._intra_move_within_vehicle(truck_id, move)
             elif operator_name == 'intra_swap':
                 operation_success = self._intra_swap_within_vehicle(truck_id)
             elif operator_name == 'intra_2opt':
@@ -5765,46 +7856,71 @@ class Dynamic_Optimization:
             if not operation_success:
                 return False, current_cost
 
-            # 可行性检查和修复
-            if hasattr(self, 'feasibility_repair_ops') and self.feasibility_repair_ops:
-                feasible = self.feasibility_repair_ops.check_and_repair_feasibility(truck_id)
-                if feasible:
-                    new_cost = self.cost()
-                    return True, new_cost
-
-            # 如果没有可行性检查模块，直接计算成本
-            new_cost = self.cost()
-            return True, new_cost
+            # 本次重规划中已评估过的状态直接复用记录的可行性，不再重复修复（按修复前的指纹查询）
+            fingerprint = self.fingerprint_vehicle(truck_id)
+            feasible = self._lookup_evaluation(operator_name, truck_id, fingerprint)
+            if feasible is None:
+                # 可行性检查和修复（没有可行性检查模块时视为可行）
+                feasible = True
+                if hasattr(self, 'feasibility_repair_ops') and self.feasibility_repair_ops:
+                    feasible = self.feasibility_repair_ops.check_and_repair_feasibility(truck_id)
+                repaired_fingerprint = self.fingerprint_vehicle(truck_id)
+                self._record_evaluation(truck_id, repaired_fingerprint, feasible)
+                # 修复前的状态：修复未改动路径或修复失败（随后回滚）时结论可直接复用；
+                # 修复改动了路径时该状态命中后仍需修复，不按修复前指纹记录
+                if not feasible or repaired_fingerprint == fingerprint:
+                    self._record_evaluation(truck_id, fingerprint, feasible)
+            # 与current_cost同为车辆对成本（局部搜索只改变该车辆对）
+            new_cost = self.cost_single_vehicle(truck_id)
+            operation_successful = feasible and new_cost < current_cost
+            return feasible, new_cost
 
         except Exception as e:
             print(f"       操作执行异常: {e}")
             return False, current_cost
         finally:
-            # 如果操作失败或不可行，恢复备份状态
-            if not hasattr(self, '_operation_successful') or not self._operation_successful:
-                self.TRUCK_Routes[truck_id] = backup_truck_route
-                self.DRONE_Routes[truck_id] = backup_drone_routes
+            # 如果操作失败、不可行或未改进，回滚到检查点
+            if not operation_successful:
+                self.rollback_vehicle(checkpoint)
 
-    def _intra_move_within_vehicle(self, truck_id: int) -> bool:
-        """车辆对内客户移动"""
+    def _intra_move_within_vehicle(self, truck_id: int, move: Optional[Tuple[int, int]] = None) -> bool:
+        """车辆对内客户移动（move为(客户, 新位置)时执行指定移动，否则随机选择）"""
         try:
             vehicle_customers = list(self.get_vehicle_customers(truck_id))
             if len(vehicle_customers) < 2:
                 return False
 
             # 随机选择一个客户进行移动
-            customer_to_move = random.choice(vehicle_customers)
+            customer_to_move = random.choice(vehicle_customers) if move is None else move[0]
 
             # 尝试在卡车路径内移动
             truck_route = self.TRUCK_Routes[truck_id].Troute
-            if customer_to_move in truck_route and len(truck_route) > 3:
-                current_pos = truck_route.index(customer_to_move)
+            entry = self.locate_customer(customer_to_move, truck_id)
+            if entry is not None and entry['truck_pos'] is not None and len(truck_route) > 3:
+                current_pos = entry['truck_pos']
                 # 随机选择新位置（排除当前位置和仓库位置）
                 valid_positions = [i for i in range(1, len(truck_route) - 1) if i != current_pos]
+                if move is not None:
+                    valid_positions = [i for i in valid_positions if i == move[1]]
+                elif self.local_search_candidate_k:
+                    # 只移动到与前驱或后继形成信息素候选边的位置（按移除客户后的路径判断）
+                    remaining = truck_route[:current_pos] + truck_route[current_pos + 1:]
+                    k = self.local_search_candidate_k
+                    valid_positions = [i for i in valid_positions
+                                       if self.is_pheromone_candidate_edge(remaining[i - 1], customer_to_move, k) or
+                                       self.is_pheromone_candidate_edge(customer_to_move, remaining[i], k)]
                 if valid_positions:
                     new_pos = random.choice(valid_positions)
-                    truck_route.remove(customer_to_move)
+                    # 前移时new_pos之前的路径不变，可O(1)预判被移动客户的时间窗
+                    if new_pos < current_pos and not self.is_truck_position_time_feasible(
+                            truck_id, new_pos, customer_to_move):
+                        return False
+                    # 增量成本不下降则无需执行
+                    if self.delta_relocate(truck_id, current_pos, new_pos) >= -1e-9:
+                        return False
+                    truck_route.pop(current_pos)
                     truck_route.insert(new_pos, customer_to_move)
+                    self._notify_truck_reorder(truck_id, min(current_pos, new_pos), max(current_pos, new_pos))
                     self._update_customer_service_info(truck_id, customer_to_move)
                     return True
 
@@ -5824,8 +7940,23 @@ class Dynamic_Optimization:
                 return False
 
             # 随机选择两个位置进行交换
-            pos1, pos2 = random.sample(customer_positions, 2)
+            if self.local_search_candidate_k:
+                # 第二个位置的客户须是第一个位置前驱的信息素候选后继
+                pos1 = random.choice(customer_positions)
+                partners = [pos for pos in customer_positions if pos != pos1 and self.is_pheromone_candidate_edge(
+                    truck_route[pos1 - 1], truck_route[pos], self.local_search_candidate_k)]
+                if not partners:
+                    return False
+                pos2 = random.choice(partners)
+            else:
+                pos1, pos2 = random.sample(customer_positions, 2)
+            first_pos, last_pos = min(pos1, pos2), max(pos1, pos2)
+            if not self.is_truck_position_time_feasible(truck_id, first_pos, truck_route[last_pos]):
+                return False
+            if self.delta_swap(truck_id, pos1, pos2) >= -1e-9:
+                return False
             truck_route[pos1], truck_route[pos2] = truck_route[pos2], truck_route[pos1]
+            self._notify_truck_reorder(truck_id, first_pos, last_pos)
 
             # 更新客户服务信息
             self._update_customer_service_info(truck_id, truck_route[pos1])
@@ -5850,10 +7981,24 @@ class Dynamic_Optimization:
                 return False
 
             i = random.randint(1, n - 2)  # 第一个边的起点
-            j = random.randint(i + 2, n)  # 第二个边的起点
+            if self.local_search_candidate_k:
+                # 逆转后新增边(route[i-1], route[j])须在信息素候选后继表中
+                partners = [j for j in range(i + 2, n + 1) if self.is_pheromone_candidate_edge(
+                    truck_route[i - 1], truck_route[j], self.local_search_candidate_k)]
+                if not partners:
+                    return False
+                j = random.choice(partners)
+            else:
+                j = random.randint(i + 2, n)  # 第二个边的起点
+
+            if not self.is_truck_position_time_feasible(truck_id, i, truck_route[j]):
+                return False
+            if self.delta_reverse(truck_id, i, j) >= -1e-9:
+                return False
 
             # 执行2-opt交换：逆转i到j之间的路径
             truck_route[i:j + 1] = truck_route[i:j + 1][::-1]
+            self._notify_truck_reorder(truck_id, i, j)
 
             # 更新相关客户的服务信息
             for pos in range(i, j + 1):
@@ -36,6 +36,9 @@ class LocalSearchValidator:
         # 2. 单算子效果测试
         self.validate_individual_operators()
 
+        # 2.1 改进移动保留验证
+        self.validate_improving_moves_kept()
+
         # 3. 改进追踪测试
         self.track_improvement_patterns(num_tests)
 
@@ -161,6 +164,7 @@ class LocalSearchValidator:
                             # 恢复状态继续测试
                             self.dyn_opt.TRUCK_Routes[truck_id] = copy.deepcopy(backup_truck)
                             self.dyn_opt.DRONE_Routes[truck_id] = copy.deepcopy(backup_drone)
+                            self.dyn_opt._notify_route_mutation(truck_id)
 
                     except Exception as e:
                         print(f"    ⚠️ {op_name}执行异常: {e}")
@@ -191,6 +195,7 @@ class LocalSearchValidator:
                 # 恢复原始状态
                 self.dyn_opt.TRUCK_Routes[truck_id] = backup_truck
                 self.dyn_opt.DRONE_Routes[truck_id] = backup_drone
+                self.dyn_opt._notify_route_mutation(truck_id)
 
         # 计算总体统计
         for op_name, stats in operator_stats.items():
@@ -207,6 +212,63 @@ class LocalSearchValidator:
 
         return total_success_rate > 30  # 期望至少30%成功率
 
+    def validate_improving_moves_kept(self) -> bool:
+        """
+        验证改进的移动被保留：对每个车辆对先把一个客户移到使车辆对成本上升的位置，
+        再用intra_move（客户重定位）把它移回原位置；算子报告可行且成本下降时，
+        路径须保持移回后的状态且车辆对成本等于报告值。测试结束后各车辆对回滚到测试前状态
+        """
+        print("\n📌 测试: 改进移动保留验证")
+        print("-" * 40)
+        results = {'improving_moves': 0, 'kept': 0, 'rolled_back': 0}
+        for truck_id in range(len(self.dyn_opt.TRUCK_Routes)):
+            if len(self.dyn_opt.TRUCK_Routes[truck_id].Troute) < 4:
+                continue
+            checkpoint = self.dyn_opt.checkpoint_vehicle(truck_id)
+            perturbation = self._perturb_by_relocate(truck_id, checkpoint)
+            if perturbation is not None:
+                customer_id, original_pos = perturbation
+                cost_before = self.dyn_opt.cost_single_vehicle(truck_id)
+                route_before = list(self.dyn_opt.TRUCK_Routes[truck_id].Troute)
+                feasible, new_cost = self.dyn_opt._apply_intra_operator_with_feasibility_check(
+                    truck_id, 'intra_move', cost_before, move=(customer_id, original_pos))
+                if feasible and new_cost < cost_before:
+                    results['improving_moves'] += 1
+                    kept = (self.dyn_opt.TRUCK_Routes[truck_id].Troute != route_before and
+                            abs(self.dyn_opt.cost_single_vehicle(truck_id) - new_cost) < 1e-6)
+                    results['kept' if kept else 'rolled_back'] += 1
+            self.dyn_opt.rollback_vehicle(checkpoint)
+
+        passed = results['improving_moves'] > 0 and results['rolled_back'] == 0
+        print(f"  改进移动: {results['improving_moves']}次, 保留: {results['kept']}次, "
+              f"被回滚: {results['rolled_back']}次 -> {'通过' if passed else '未通过'}")
+        self.validation_results['move_retention'] = results
+        return passed
+
+    def _perturb_by_relocate(self, truck_id: int, checkpoint: Dict):
+        """
+        把卡车路径中的一个客户移到使车辆对成本上升（且可行）的位置，返回(客户, 原位置)；找不到时返回None
+        """
+        dyn_opt = self.dyn_opt
+        cost_original = dyn_opt.cost_single_vehicle(truck_id)
+        route_length = len(dyn_opt.TRUCK_Routes[truck_id].Troute)
+        for original_pos in range(1, route_length - 1):
+            for new_pos in range(1, route_length - 1):
+                if new_pos == original_pos or dyn_opt.delta_relocate(truck_id, original_pos, new_pos) <= 1e-9:
+                    continue
+                truck_route = dyn_opt.TRUCK_Routes[truck_id].Troute
+                customer_id = truck_route.pop(original_pos)
+                truck_route.insert(new_pos, customer_id)
+                dyn_opt._notify_route_mutation(truck_id)
+                dyn_opt.Update_visit_T(truck_id, 1)
+                feasible = (dyn_opt.feasibility_repair_ops is None or
+                            dyn_opt.feasibility_repair_ops.check_and_repair_feasibility(truck_id))
+                if (feasible and dyn_opt.TRUCK_Routes[truck_id].Troute[new_pos] == customer_id and
+                        dyn_opt.cost_single_vehicle(truck_id) > cost_original + 1e-6):
+                    return customer_id, original_pos
+                dyn_opt.rollback_vehicle(checkpoint)
+        return None
+
     def track_improvement_patterns(self, num_iterations: int = 10):
         """
         追踪局部搜索的改进模式
@@ -14,6 +14,8 @@ from collections import defaultdict, Counter
 from typing import Dict, List, Tuple, Any
 import json
 import os
+import io
+import contextlib
 from datetime import datetime
 
 class OperatorValidator:
@@ -65,6 +67,18 @@ class OperatorValidator:
         print("\n🔄 第6阶段：重规划策略效果验证")
         replanning_results = self.validate_replanning_strategies()
 
+        # 6.1 节点索引维护验证
+        print("\n🗂️ 第6阶段补充：节点索引维护验证")
+        node_index_results = self.validate_node_index_maintenance()
+
+        # 6.2 增量成本评估验证
+        print("\n🧮 第6阶段补充：增量成本评估验证")
+        delta_evaluation_results = self.validate_delta_evaluation()
+
+        # 6.3 载重剖面验证
+        print("\n📦 第6阶段补充：载重剖面验证")
+        load_profile_results = self.validate_load_profiles()
+
         # 7. 综合效果分析
         print("\n📈 第7阶段：综合效果分析")
         comprehensive_analysis = self.perform_comprehensive_analysis()
@@ -80,6 +94,9 @@ class OperatorValidator:
             'feasibility_repair': feasibility_results,
             'local_search': local_search_results,
             'replanning_strategies': replanning_results,
+            'node_index_maintenance': node_index_results,
+            'delta_evaluation': delta_evaluation_results,
+            'load_profiles': load_profile_results,
             'comprehensive_analysis': comprehensive_analysis,
             'total_validation_time': total_time
         }
@@ -100,7 +117,8 @@ class OperatorValidator:
             'worst_time_removal',
             'drone_worst_energy_removal',
             'shaw_removal',
-            'route_removal'
+            'route_removal',
+            'string_removal'
         ]
 
         results = {}
@@ -280,6 +298,57 @@ class OperatorValidator:
 
         return results
 
+    def benchmark_granular_neighbourhoods(self, k_values=(None, 5, 10, 20),
+                                          repair_operators=('cheapest_distance_insertion', 'regret_distance_insertion'),
+                                          iterations=None, granular_source='distance'):
+        """
+        粒度邻域速度与质量对比：对每个k重放同一组随机摧毁（相同随机种子状态），
+        记录修复耗时与修复后车辆对成本，质量以相对完整扫描（k=None）的平均成本差表示
+        granular_source: 'distance'为距离k近邻，'pheromone'为信息素候选后继表
+        """
+        print("  🧭 测试粒度邻域插入的速度与质量...")
+        iterations = iterations or self.test_iterations
+        repair_ops = self.dyn_opt.repair_ops
+        original_k, original_source = repair_ops.granular_k, repair_ops.granular_source
+        repair_ops.granular_source = granular_source
+        initial_random_state = random.getstate()
+        results = {}
+
+        for k in k_values:
+            random.setstate(initial_random_state)  # 各k使用相同的摧毁序列
+            repair_ops.granular_k = k
+            stats = {'repair_times': [], 'costs': [], 'failures': 0}
+            for iteration in range(iterations):
+                truck_id = random.randint(0, len(self.dyn_opt.TRUCK_Routes) - 1)
+                checkpoint = self.dyn_opt.checkpoint_vehicle(truck_id)
+                operator = repair_operators[iteration % len(repair_operators)]
+                with contextlib.redirect_stdout(io.StringIO()):
+                    removed_customers = self.dyn_opt.destroy_ops.random_removal(truck_id, -1)
+                    start_time = time.perf_counter()
+                    success = bool(removed_customers) and getattr(repair_ops, operator)(truck_id, removed_customers)
+                    stats['repair_times'].append(time.perf_counter() - start_time)
+                    cost_after = self.dyn_opt.cost_single_vehicle(truck_id)
+                if success:
+                    stats['costs'].append(cost_after)
+                else:
+                    stats['costs'].append(np.nan)
+                    stats['failures'] += 1
+                self.dyn_opt.rollback_vehicle(checkpoint)
+            results[k] = stats
+
+        repair_ops.granular_k, repair_ops.granular_source = original_k, original_source
+        random.setstate(initial_random_state)
+
+        baseline_costs = np.array(results[k_values[0]]['costs'])
+        for k, stats in results.items():
+            costs = np.array(stats['costs'])
+            stats['avg_repair_time_ms'] = float(np.mean(stats['repair_times']) * 1000)
+            stats['avg_cost_gap'] = float(np.nanmean(costs - baseline_costs)) if np.isfinite(costs - baseline_costs).any() else 0.0
+            label = '完整扫描' if k is None else f'k={k}'
+            print(f"      {label}: 平均修复耗时={stats['avg_repair_time_ms']:.2f}ms, "
+                  f"相对成本差={stats['avg_cost_gap']:+.4f}, 修复失败={stats['failures']}")
+        return results
+
     def validate_pheromone_mechanism(self):
         """验证信息素机制效果"""
         print("  🐜 测试信息素机制...")
@@ -442,6 +511,150 @@ class OperatorValidator:
 
         return results
 
+    def validate_node_index_maintenance(self, iterations=None):
+        """
+        验证节点索引维护：随机执行破坏、修复、局部搜索及激进可行性修复改动路径，每次改动后及回滚后
+        将维护的节点索引逐车辆对与_build_vehicle_node_index从零重建的结果对比
+        """
+        print("  🗂️ 测试节点索引维护...")
+        iterations = iterations or self.test_iterations
+        dyn_opt = self.dyn_opt
+        destroy_operators = ['random_removal', 'worst_distance_removal', 'shaw_removal',
+                             'route_removal', 'string_removal']
+        repair_operators = ['cheapest_distance_insertion', 'regret_distance_insertion',
+                            'drone_priority_insertion', 'drone_newroute_insertion']
+        local_search_operators = ['_intra_move_within_vehicle', '_intra_swap_within_vehicle',
+                                  '_intra_2opt_within_vehicle']
+        results = {'mutations': 0, 'checks': 0, 'mismatches': 0, 'stale_lookups': 0}
+        stale_before = dyn_opt.node_index_stats['stale_lookups']
+
+        def _check(truck_id, stage):
+            results['checks'] += 1
+            maintained = {c: e for c, e in dyn_opt.node_index.items() if e['vehicle'] == truck_id}
+            expected = dyn_opt._build_vehicle_node_index(truck_id)
+            if maintained != expected or not dyn_opt.validate_node_index():
+                results['mismatches'] += 1
+                diff = [c for c in set(maintained) | set(expected) if maintained.get(c) != expected.get(c)]
+                print(f"    ❌ {stage}后车辆对{truck_id}节点索引不一致: {diff[:10]}")
+
+        for _ in range(iterations):
+            truck_id = random.randint(0, len(dyn_opt.TRUCK_Routes) - 1)
+            checkpoint = dyn_opt.checkpoint_vehicle(truck_id)
+            try:
+                destroy_operator = random.choice(destroy_operators)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    removed_customers = getattr(dyn_opt.destroy_ops, destroy_operator)(truck_id, -1)
+                results['mutations'] += 1
+                _check(truck_id, destroy_operator)
+                if removed_customers:
+                    repair_operator = random.choice(repair_operators)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        getattr(dyn_opt.repair_ops, repair_operator)(truck_id, removed_customers)
+                    results['mutations'] += 1
+                    _check(truck_id, repair_operator)
+                local_search_operator = random.choice(local_search_operators)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    getattr(dyn_opt, local_search_operator)(truck_id)
+                results['mutations'] += 1
+                _check(truck_id, local_search_operator)
+                # 激进修复：制造能耗违反后删除问题无人机行程并把客户移回卡车
+                if dyn_opt.feasibility_repair_ops and self._create_drone_energy_violation(truck_id):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        dyn_opt.feasibility_repair_ops._aggressive_repair_mode(truck_id)
+                    results['mutations'] += 1
+                    _check(truck_id, '_aggressive_repair_mode')
+            except Exception as e:
+                print(f"    ⚠️ 路径改动异常: {e}")
+            dyn_opt.rollback_vehicle(checkpoint)
+            _check(truck_id, '回滚')
+
+        results['stale_lookups'] = dyn_opt.node_index_stats['stale_lookups'] - stale_before
+        results['passed'] = results['mismatches'] == 0 and results['stale_lookups'] == 0
+        status = "✅ 通过" if results['passed'] else "❌ 失败"
+        print(f"    路径改动: {results['mutations']}次, 索引对比: {results['checks']}次, "
+              f"不一致: {results['mismatches']}次, 过期查询: {results['stale_lookups']}次 {status}")
+        return results
+
+    def validate_delta_evaluation(self, samples=20):
+        """
+        验证增量成本评估：对每个车辆对分别在不传播/传播访问时间两种模式下，
+        将delta_*的结果与在副本上执行移动后重算的成本对比
+        """
+        print("  🧮 测试增量成本评估...")
+        dyn_opt = self.dyn_opt
+        results = {'checks': 0, 'failures': 0, 'failed_vehicles': []}
+
+        for truck_id in range(len(dyn_opt.TRUCK_Routes)):
+            for propagate in (False, True):
+                results['checks'] += 1
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        consistent = dyn_opt.validate_delta_evaluation(truck_id, samples, propagate=propagate)
+                except Exception as e:
+                    print(f"    ⚠️ 车辆对{truck_id}增量评估验证异常: {e}")
+                    consistent = False
+                if not consistent:
+                    results['failures'] += 1
+                    results['failed_vehicles'].append((truck_id, propagate))
+                    print(f"    ❌ 车辆对{truck_id}增量评估不一致 (propagate={propagate})")
+
+        results['passed'] = results['failures'] == 0
+        status = "✅ 通过" if results['passed'] else "❌ 失败"
+        print(f"    对比: {results['checks']}次, 不一致: {results['failures']}次 {status}")
+        return results
+
+    def validate_load_profiles(self, iterations=None):
+        """
+        验证载重剖面：随机执行破坏、修复改动路径，每次改动后及回滚后
+        将缓存的载重剖面与从零重算结果对比，并抽查O(1)插入判断与逐点模拟是否一致
+        """
+        print("  📦 测试载重剖面...")
+        iterations = iterations or max(1, self.test_iterations // 5)
+        dyn_opt = self.dyn_opt
+        destroy_operators = ['random_removal', 'worst_distance_removal', 'shaw_removal', 'string_removal']
+        repair_operators = ['cheapest_distance_insertion', 'regret_distance_insertion', 'drone_priority_insertion']
+        results = {'mutations': 0, 'checks': 0, 'failures': 0}
+
+        def _check(stage):
+            results['checks'] += 1
+            # 先填充所有车辆对的剖面缓存，使缓存失效遗漏能被发现
+            for truck_id in range(len(dyn_opt.TRUCK_Routes)):
+                dyn_opt.get_load_profile(truck_id)
+            with contextlib.redirect_stdout(io.StringIO()):
+                consistent = dyn_opt.validate_load_profiles()
+            if not consistent:
+                results['failures'] += 1
+                print(f"    ❌ {stage}后载重剖面不一致")
+
+        _check('初始')
+        for _ in range(iterations):
+            truck_id = random.randint(0, len(dyn_opt.TRUCK_Routes) - 1)
+            checkpoint = dyn_opt.checkpoint_vehicle(truck_id)
+            try:
+                for truck in range(len(dyn_opt.TRUCK_Routes)):
+                    dyn_opt.get_load_profile(truck)
+                destroy_operator = random.choice(destroy_operators)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    removed_customers = getattr(dyn_opt.destroy_ops, destroy_operator)(truck_id, -1)
+                results['mutations'] += 1
+                _check(destroy_operator)
+                if removed_customers:
+                    repair_operator = random.choice(repair_operators)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        getattr(dyn_opt.repair_ops, repair_operator)(truck_id, removed_customers)
+                    results['mutations'] += 1
+                    _check(repair_operator)
+            except Exception as e:
+                print(f"    ⚠️ 路径改动异常: {e}")
+            dyn_opt.rollback_vehicle(checkpoint)
+            _check('回滚')
+
+        results['passed'] = results['failures'] == 0
+        status = "✅ 通过" if results['passed'] else "❌ 失败"
+        print(f"    路径改动: {results['mutations']}次, 剖面对比: {results['checks']}次, "
+              f"不一致: {results['failures']}次 {status}")
+        return results
+
     def validate_replanning_strategies(self):
         """验证重规划策略效果"""
         print("  🔄 测试重规划策略...")
@@ -522,6 +735,7 @@ class OperatorValidator:
             for attr in ['success', 'service_by', 'arrive_truck', 'departure_truck', 'arrive_drone', 'departure_drone']:
                 if hasattr(customer_backup, attr):
                     setattr(original_customer, attr, getattr(customer_backup, attr))
+        self.dyn_opt._notify_route_mutation(truck_id)
 
     def _check_constraint_violations(self, truck_id):
         """检查约束违反"""